@@ -0,0 +1,62 @@
+"""Compare SurrealDB request latency with Basic auth vs a cached Bearer token.
+
+Runs the same small query repeatedly from several threads under each auth
+mode against the database configured in ``.env`` and prints latency
+percentiles and throughput.
+
+Usage::
+
+    python benchmarks/bench_db_auth.py [requests_per_mode] [threads]
+"""
+
+from __future__ import annotations
+
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from hkex_scraper import db
+
+QUERY = "RETURN 1;"
+
+
+def _timed_query(_i: int) -> float:
+    started = time.perf_counter()
+    result = db.surreal_query(QUERY, timeout=30)
+    if isinstance(result, dict) and result.get("error"):
+        raise RuntimeError(result["error"])
+    return time.perf_counter() - started
+
+
+def run_mode(mode: str, requests: int, threads: int) -> dict:
+    db.set_auth_mode(mode)
+    _timed_query(0)  # warm up: open a connection and, for tokens, sign in
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(_timed_query, range(requests)))
+    wall = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "mean": statistics.fmean(latencies) * 1000,
+        "rps": requests / wall,
+    }
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"{requests} x {QUERY!r} per mode, {threads} threads")
+    print(f"{'mode':<6} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'req/s':>8}")
+    for mode in ("basic", "token"):
+        r = run_mode(mode, requests, threads)
+        print(
+            f"{r['mode']:<6} {r['p50']:>8.2f} {r['p95']:>8.2f} "
+            f"{r['mean']:>8.2f} {r['rps']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
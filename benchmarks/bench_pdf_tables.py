@@ -0,0 +1,162 @@
+"""Compare PDF table extraction with PyMuPDF's table finder, camelot and both.
+
+Builds a corpus of HKEx-style disclosure forms (ruled shareholding tables,
+some with merged header cells, plus narrative pages) and times each table
+engine on it, or uses the PDFs in a directory instead.  For the generated
+corpus, recall is the share of expected cell values found in the tables.
+The ``pymupdf`` row only counts tables that pass the quality check; ``auto``
+adds camelot's tables for the pages that failed it.
+
+Needs PyMuPDF and camelot-py.
+
+Usage::
+
+    python benchmarks/bench_pdf_tables.py [documents] [pdf_dir]
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+import pymupdf
+
+from hkex_scraper import extractor
+
+HEADERS = ["Name of holder", "Capacity", "Number of shares", "% of issued shares"]
+CAPACITIES = ["Beneficial owner", "Interest of spouse", "Trustee", "Controlled corporation"]
+NARRATIVE = (
+    "The Board announces that the Company has been notified of the following "
+    "changes in the interests of its substantial shareholders. "
+)
+
+
+def _draw_table(page, top: float, rows: List[List[str]], merged_header: bool) -> float:
+    """Draw a ruled table at *top*; return its bottom edge.
+
+    With *merged_header* the first two header cells share one box (no
+    ruling between them), like the "Holder" spans on FF301 forms.
+    """
+    xs = [40, 200, 320, 430, 555]
+    height = 22
+    bottom = top + height * len(rows)
+    for i in range(len(rows) + 1):
+        page.draw_line((xs[0], top + i * height), (xs[-1], top + i * height))
+    for j, x in enumerate(xs):
+        if merged_header and j == 1:
+            page.draw_line((x, top + height), (x, bottom))
+        else:
+            page.draw_line((x, top), (x, bottom))
+    for i, row in enumerate(rows):
+        for j, cell in enumerate(row):
+            if merged_header and i == 0 and j == 1:
+                continue
+            page.insert_text((xs[j] + 4, top + i * height + 15), cell, fontsize=8)
+    return bottom
+
+
+def build_form(path: str, rng: random.Random) -> List[str]:
+    """Write one generated form to *path*; return the cell values it contains."""
+    doc = pymupdf.open()
+    expected: List[str] = []
+    for page_no in range(rng.randint(2, 6)):
+        page = doc.new_page(width=595, height=842)
+        if page_no % 3 == 2:
+            for line in range(30):
+                text = NARRATIVE[: rng.randint(60, 120)]
+                page.insert_text((40, 60 + line * 18), text, fontsize=9)
+            page.draw_line((40, 620), (300, 620))  # signature line, not a table
+            continue
+        top = 60.0
+        for _ in range(rng.randint(1, 2)):
+            rows = [list(HEADERS)]
+            for _ in range(rng.randint(3, 12)):
+                rows.append([
+                    f"Holder {rng.randint(1, 999)} Limited",
+                    rng.choice(CAPACITIES),
+                    f"{rng.randint(1, 500) * 1000:,}",
+                    f"{rng.uniform(0.1, 30):.2f}",
+                ])
+            merged = rng.random() < 0.3
+            top = _draw_table(page, top, rows, merged) + 40
+            expected.extend(cell for row in rows[1:] for cell in row)
+    doc.save(path)
+    doc.close()
+    return expected
+
+
+def _engines(path: str) -> dict:
+    """Tables and seconds per engine for one PDF."""
+    doc = pymupdf.open(path)
+    started = time.perf_counter()
+    pages = extractor._ruled_table_pages(doc) or []
+    prescan = time.perf_counter() - started
+
+    started = time.perf_counter()
+    fast, fallback = extractor._extract_tables_with_pymupdf(doc, pages)
+    fast_time = time.perf_counter() - started
+    doc.close()
+
+    started = time.perf_counter()
+    camelot = extractor._extract_tables_with_camelot(b"", path, pages)
+    camelot_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rest = extractor._extract_tables_with_camelot(b"", path, fallback)
+    tiered_time = fast_time + time.perf_counter() - started
+    return {
+        "prescan": ([], prescan),
+        "pymupdf": (fast, fast_time),
+        "camelot": (camelot, camelot_time),
+        "auto": (fast + rest, tiered_time),
+    }
+
+
+def _recall(tables: List[dict], expected: List[str]) -> float:
+    if not expected:
+        return 1.0
+    text = "\n".join(t["markdown"] for t in tables)
+    return sum(cell in text for cell in expected) / len(expected)
+
+
+def main() -> None:
+    documents = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    pdf_dir = sys.argv[2] if len(sys.argv) > 2 else ""
+    extractor.log = lambda *a, **k: None  # keep per-document log lines out of the table
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus: List[Tuple[str, List[str] | None]] = []
+        if pdf_dir:
+            names = sorted(n for n in os.listdir(pdf_dir) if n.lower().endswith(".pdf"))
+            corpus = [(os.path.join(pdf_dir, n), None) for n in names[:documents]]
+        else:
+            rng = random.Random(301)
+            for i in range(documents):
+                path = os.path.join(tmp, f"form_{i}.pdf")
+                corpus.append((path, build_form(path, rng)))
+
+        totals = {name: [0, 0.0, 0.0] for name in ("prescan", "pymupdf", "camelot", "auto")}
+        for path, expected in corpus:
+            for name, (tables, seconds) in _engines(path).items():
+                totals[name][0] += len(tables)
+                totals[name][1] += seconds
+                if expected is not None:
+                    totals[name][2] += _recall(tables, expected)
+
+    print(f"{len(corpus)} documents ({pdf_dir or 'generated HKEx-style forms'})")
+    print(f"{'engine':<8} {'tables':>7} {'total s':>8} {'ms/doc':>8} {'recall':>7}")
+    for name, (n_tables, seconds, recall) in totals.items():
+        scored = not pdf_dir and name != "prescan"
+        shown = f"{recall / len(corpus):>7.1%}" if scored else f"{'-':>7}"
+        print(
+            f"{name:<8} {n_tables:>7} {seconds:>8.2f} "
+            f"{seconds / max(1, len(corpus)) * 1000:>8.1f} {shown}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Asyncio document fetcher (stdlib only) for high-concurrency Phase 2 downloads.
+
+The threaded download stage runs one blocking download per thread, so the
+number of transfers in flight is capped by the thread count.  This fetcher
+runs every transfer as a coroutine on one event loop instead, so hundreds
+of downloads can be in flight at a small cost per request.  It speaks
+plain HTTP/1.1 over ``asyncio`` streams and keeps idle keep-alive
+connections per host for reuse.  Response handling matches
+:class:`~hkex_scraper.downloader.DocumentDownloader`: redirects, gzip for
+HTML, a size cap enforced while reading, an incremental MD5 and
+connect / ttfb / transfer timings.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ssl
+import time
+import urllib.parse
+from typing import Dict, List, Tuple
+
+from .config import MAX_DOWNLOAD_SIZE
+from .downloader import (
+    DOWNLOAD_CHUNK_SIZE,
+    MAX_REDIRECTS,
+    REDIRECTS,
+    CappedBody,
+    DownloadStats,
+    request_headers,
+)
+from .httppool import HttpError
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+# Final responses that never carry a body (RFC 9112, section 6.3)
+NO_BODY_STATUSES = frozenset({204, 304})
+
+
+class _Response:
+    def __init__(self, status: int, headers: Dict[str, str], keep_alive: bool) -> None:
+        self.status = status
+        self.headers = headers
+        self.keep_alive = keep_alive
+
+
+class AsyncDocumentFetcher(DownloadStats):
+    """Fetch documents as coroutines, with at most *concurrency* in flight.
+
+    Must be used from a single event loop.  Idle connections are kept per
+    host (up to *concurrency* of them) and reused by later requests.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 200,
+        timeout: float = 60,
+        max_size: int = MAX_DOWNLOAD_SIZE,
+    ) -> None:
+        super().__init__()
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_size = max_size
+        self._idle: Dict[Tuple[str, str, int], List[_Connection]] = {}
+        self._slots: asyncio.Semaphore | None = None
+        self._ssl = ssl.create_default_context()
+        self._counters.update(
+            {"connections_opened": 0, "connections_reused": 0, "retries": 0, "errors": 0}
+        )
+
+    # --- connections -------------------------------------------------------
+
+    async def _connect(self, key: Tuple[str, str, int], timings: dict) -> Tuple[_Connection, bool]:
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                self._counters["connections_reused"] += 1
+                return (reader, writer), True
+            writer.close()
+        scheme, host, port = key
+        started = time.monotonic()
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl if scheme == "https" else None,
+            server_hostname=host if scheme == "https" else None,
+        )
+        timings["connect"] += time.monotonic() - started
+        self._counters["connections_opened"] += 1
+        return (reader, writer), False
+
+    def _release(self, key, conn: _Connection, keep: bool) -> None:
+        idle = self._idle.setdefault(key, [])
+        if keep and len(idle) < self.concurrency:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def aclose(self) -> None:
+        """Close every idle connection."""
+        for idle in self._idle.values():
+            for _reader, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+    # --- HTTP/1.1 ----------------------------------------------------------
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> _Response:
+        status_line = (await reader.readline()).decode("latin-1")
+        if not status_line:
+            raise ConnectionResetError("connection closed before response")
+        version, status = status_line.split(" ", 2)[:2]
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+        return _Response(int(status), headers, keep_alive)
+
+    async def _read_body(self, reader, resp: _Response, body: CappedBody | None) -> bool:
+        """Feed the body to *body* (or discard it); False once over the cap."""
+        if resp.status < 200 or resp.status in NO_BODY_STATUSES:
+            return True  # never has a body, whatever the headers say
+        length = resp.headers.get("content-length", "")
+        if "chunked" in resp.headers.get("transfer-encoding", "").lower():
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await reader.readline()).strip():
+                        pass  # trailers
+                    return True
+                chunk = await reader.readexactly(size)
+                await reader.readexactly(2)
+                if body is not None and not body.feed(chunk):
+                    return False
+        if length.isdigit():
+            remaining = int(length)
+            if body is not None and body.decoder is None and remaining > self.max_size:
+                return False
+            while remaining:
+                chunk = await reader.readexactly(min(remaining, DOWNLOAD_CHUNK_SIZE))
+                remaining -= len(chunk)
+                if body is not None and not body.feed(chunk):
+                    return False
+            return True
+        resp.keep_alive = False  # body runs to EOF
+        while True:
+            chunk = await reader.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                return True
+            if body is not None and not body.feed(chunk):
+                return False
+
+    async def _get(
+        self, url: str, timings: dict, hold=None
+    ) -> Tuple[_Response, bytes | bytearray, str, str]:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = request_headers(parts.path)
+        headers["Host"] = parts.netloc
+        request = f"GET {path} HTTP/1.1\r\n" + "".join(
+            f"{k}: {v}\r\n" for k, v in headers.items()
+        ) + "\r\n"
+
+        timeout = self.timeout
+        conn, reused = await asyncio.wait_for(self._connect(key, timings), timeout)
+        keep = False
+        try:
+            try:
+                sent = time.monotonic()
+                resp = await asyncio.wait_for(self._send(conn, request), timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not reused:
+                    raise
+                # The server closed the idle keep-alive connection; retry once fresh
+                conn[1].close()
+                self._counters["retries"] += 1
+                conn, reused = await asyncio.wait_for(self._connect(key, timings), timeout)
+                sent = time.monotonic()
+                resp = await asyncio.wait_for(self._send(conn, request), timeout)
+            timings["ttfb"] += time.monotonic() - sent
+
+            started = time.monotonic()
+            try:
+                if not 200 <= resp.status < 300:
+                    await asyncio.wait_for(self._read_body(conn[0], resp, None), timeout)
+                    keep = resp.keep_alive
+                    return resp, b"", "", ""
+                gzipped = resp.headers.get("content-encoding", "").lower() == "gzip"
+                if hold is not None:
+                    # Charge the body before reading it: its length when known,
+                    # otherwise it is charged as it arrives
+                    length = resp.headers.get("content-length", "")
+                    expected = int(length) if length.isdigit() and not gzipped else 0
+                    if expected <= self.max_size:
+                        hold.grow(expected)
+                body = CappedBody(self.max_size, gzipped, hold.grow if hold is not None else None)
+                if not await asyncio.wait_for(self._read_body(conn[0], resp, body), timeout):
+                    return resp, b"", "", "too_large"
+                keep = resp.keep_alive
+                return (resp, *body.result(), "")
+            finally:
+                timings["transfer"] += time.monotonic() - started
+        finally:
+            # Closed unless the body was read to the end
+            self._release(key, conn, keep)
+
+    async def _send(self, conn: _Connection, request: str) -> _Response:
+        conn[1].write(request.encode("latin-1"))
+        await conn[1].drain()
+        resp = await self._read_head(conn[0])
+        while 100 <= resp.status < 200:  # interim (e.g. 100 Continue): no body
+            resp = await self._read_head(conn[0])
+        return resp
+
+    async def fetch(self, url: str, hold=None) -> Tuple[bytes | bytearray, str, str, dict]:
+        """Download *url*; return ``(content, md5_hex, skip_reason, timings)``.
+
+        Same contract as :meth:`DocumentDownloader.fetch`: redirects are
+        followed, :class:`HttpError` is raised for a non-2xx response and
+        transport errors (including timeouts) propagate.  The timeout
+        applies to connecting, the response head and the body separately.
+        The body is charged to *hold* as in :func:`~hkex_scraper.downloader.read_capped`.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        timings = {"connect": 0.0, "ttfb": 0.0, "transfer": 0.0}
+        async with self._slots:
+            for _ in range(MAX_REDIRECTS + 1):
+                resp, content, doc_hash, skip_reason = await self._get(url, timings, hold)
+                if resp.status in REDIRECTS and resp.headers.get("location"):
+                    url = urllib.parse.urljoin(url, resp.headers["location"])
+                    continue
+                if not 200 <= resp.status < 300:
+                    self._counters["errors"] += 1
+                    raise HttpError(resp.status, b"", resp.headers)
+                gzipped = resp.headers.get("content-encoding", "").lower() == "gzip"
+                self._record(timings, len(content), gzipped)
+                return content, doc_hash, skip_reason, timings
+        raise HttpError(310, b"too many redirects")
+
+    def stats(self) -> dict:
+        with self._lock:
+            snap = dict(self._counters)
+        snap["hosts"] = len(self._idle)
+        return snap
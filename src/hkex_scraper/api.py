@@ -1,13 +1,23 @@
-"""HKEx JSON API: session management, form POST, record fetching, monthly chunking."""
+"""HKEx JSON API: session management, form POST, record fetching, date chunking."""
 
 from __future__ import annotations
 
+import json
 import re
+import time
 from calendar import monthrange
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Tuple
 
-from .config import HKEX_API_ENDPOINT, HKEX_BASE_URL, HKEX_SEARCH_PAGE
+from .config import (
+    HKEX_API_ENDPOINT,
+    HKEX_BASE_URL,
+    HKEX_SEARCH_PAGE,
+    HKEX_SEARCH_SLOW_SECONDS,
+    HKEX_TARGET_RECORDS,
+    HKEX_TARGET_SECONDS,
+)
+from .ratelimit import HKEX_LIMITER, parse_retry_after
 from .utils import log, squash_ws
 
 # ---------------------------------------------------------------------------
@@ -25,6 +35,44 @@ try:
 except ImportError:
     _BS4_AVAILABLE = False
 
+# ---------------------------------------------------------------------------
+# Session
+# ---------------------------------------------------------------------------
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+def _hkex_request(send, *args, **kwargs):
+    """Call ``session.get``/``session.post`` (*send*) under the shared HKEx limiter.
+
+    The limiter sees the status, time to first byte and ``Retry-After`` of
+    every response; a request that raises counts as a failure.  Search pages
+    only count as slow above ``HKEX_SEARCH_SLOW_SECONDS``: the adaptive
+    planner sizes them to take up to ``HKEX_TARGET_SECONDS`` on purpose.
+    """
+    with HKEX_LIMITER.slot() as slot:
+        resp = send(*args, **kwargs)
+        slot.observe(
+            resp.status_code,
+            resp.elapsed.total_seconds(),
+            parse_retry_after(resp.headers.get("Retry-After")),
+            slow_after=HKEX_SEARCH_SLOW_SECONDS,
+        )
+    return resp
+
+
+def new_session():
+    """Create a ``requests.Session`` for the HKEx title search.
+
+    The search form stores the selected date range in server-side session
+    state, so a session must only ever run one search (``fetch_chunk_*``
+    call) at a time.  Concurrent fetchers each need their own session.
+    """
+    session = _requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
 # ---------------------------------------------------------------------------
 # Record parsing
 # ---------------------------------------------------------------------------
@@ -148,22 +196,17 @@ def generate_monthly_chunks(
 # API fetch (single chunk)
 # ---------------------------------------------------------------------------
 
-def fetch_chunk_via_api(
-    session,
-    date_from_yyyymmdd: str,
-    date_to_yyyymmdd: str,
-    max_records: int = 0,
-) -> list:
-    """Fetch all filings for a date range chunk using the HKEx JSON API.
+# First request per chunk: small enough to be cheap, but it still carries
+# TOTAL_COUNT so the rest of the chunk can be fetched in one request.
+PROBE_ROWS = 100
 
-    Steps:
-        1. POST the JSF form with from/to dates to set the session's date range.
-        2. Call the JSON API with increasing ``rowRange`` to paginate through all records.
-    """
-    import json
+_JSON_DECODER = json.JSONDecoder()
 
-    # Step 1: POST the form to set the date range on the server session
-    page_resp = session.get(
+
+def _open_search(session, date_from_yyyymmdd: str, date_to_yyyymmdd: str) -> None:
+    """GET the search page and POST the JSF form to set the session's date range."""
+    page_resp = _hkex_request(
+        session.get,
         HKEX_SEARCH_PAGE,
         params={
             "sortDir": "0",
@@ -201,7 +244,8 @@ def fetch_chunk_via_api(
         if form_action.startswith("/")
         else form_action
     )
-    session.post(
+    _hkex_request(
+        session.post,
         submit_url,
         data={
             "j_idt10": "j_idt10",
@@ -213,66 +257,279 @@ def fetch_chunk_via_api(
         timeout=30,
     )
 
-    # Step 2: Fetch records via the JSON API
+
+def _fetch_api_page(
+    session, date_from_yyyymmdd: str, date_to_yyyymmdd: str, row_range: int
+) -> Tuple[str, bool, int]:
+    """Request the first *row_range* records of a date range from the JSON API.
+
+    The servlet always returns the whole prefix ``[0, row_range)``.
+
+    Returns ``(raw_result, has_next_row, response_bytes)`` where *raw_result*
+    is the still-encoded JSON array string (``""`` when there are no rows).
+    """
+    api_resp = _hkex_request(
+        session.get,
+        HKEX_API_ENDPOINT,
+        params={
+            "sortDir": "0",
+            "sortByOptions": "DateTime",
+            "category": "0",
+            "market": "SEHK",
+            "stockId": "-1",
+            "documentType": "-1",
+            "fromDate": date_from_yyyymmdd,
+            "toDate": date_to_yyyymmdd,
+            "title": "",
+            "searchType": "0",
+            "t1code": "-2",
+            "t2Gcode": "-2",
+            "t2code": "-2",
+            "rowRange": str(row_range),
+            "lang": "E",
+        },
+        headers={
+            "Accept": "application/json, text/javascript, */*; q=0.01",
+            "Referer": HKEX_SEARCH_PAGE,
+            "X-Requested-With": "XMLHttpRequest",
+        },
+        timeout=120,
+    )
+    api_resp.raise_for_status()
+
+    data = api_resp.json()
+    raw_result = data.get("result", "null")
+    if not raw_result or raw_result == "null":
+        raw_result = ""
+    return raw_result, bool(data.get("hasNextRow", False)), len(api_resp.content)
+
+
+def _iter_json_array(raw: str, skip: int = 0):
+    """Yield ``(index, record)`` for elements of a JSON array string from *skip* on.
+
+    Elements are decoded one at a time, so the caller never holds a second
+    full copy of the array.  Elements before *skip* are still scanned (JSON
+    has no random access) but are not converted by the caller.
+    """
+    end = len(raw)
+    idx = raw.find("[")
+    if idx == -1:
+        return
+    idx += 1
+    i = 0
+    while idx < end:
+        while idx < end and raw[idx] in " \t\r\n,":
+            idx += 1
+        if idx >= end or raw[idx] == "]":
+            return
+        value, idx = _JSON_DECODER.raw_decode(raw, idx)
+        if i >= skip:
+            yield i, value
+        i += 1
+
+
+def plan_next_row_range(
+    fetched: int, api_total: int | None, max_records: int = 0, page_cap: int = 0
+) -> int:
+    """Return the ``rowRange`` for the next request of a chunk.
+
+    The servlet re-sends the whole prefix on every call, so the cheapest
+    sequence is one small probe followed by a single request for everything
+    that is left.  *page_cap* is the largest number of new rows the server
+    has been seen to return at once; once known, requests step by that.
+    """
+    if api_total is None:
+        target = PROBE_ROWS
+        if max_records > 0:
+            target = min(target, max_records)
+        return target
+    target = api_total
+    if max_records > 0:
+        target = min(target, max_records)
+    if page_cap > 0:
+        target = min(target, fetched + page_cap)
+    return target
+
+
+def _fetch_window(
+    session,
+    date_from_yyyymmdd: str,
+    date_to_yyyymmdd: str,
+    max_records: int,
+    counters: dict,
+    split_above: int = 0,
+) -> Tuple[list | None, int]:
+    """Fetch one search window: form POST, probe, then the remainder.
+
+    If *split_above* is set and the probe's ``TOTAL_COUNT`` exceeds it, the
+    remainder is not fetched and ``(None, total)`` is returned so the caller
+    can retry with a narrower window.  Otherwise returns ``(records, total)``.
+
+    *counters* accumulates ``requests``, ``bytes`` and ``seconds`` (time
+    spent in the API requests).
+    """
+    _open_search(session, date_from_yyyymmdd, date_to_yyyymmdd)
+
     all_records: list = []
-    API_CHUNK = 5000
     fetched = 0
     api_total = None
+    page_cap = 0
 
     while True:
-        if max_records > 0 and len(all_records) >= max_records:
+        if max_records > 0 and fetched >= max_records:
             break
-        chunk_size = API_CHUNK
-        if max_records > 0:
-            chunk_size = min(chunk_size, max_records - len(all_records))
-        row_range = fetched + chunk_size
-
-        api_resp = session.get(
-            HKEX_API_ENDPOINT,
-            params={
-                "sortDir": "0",
-                "sortByOptions": "DateTime",
-                "category": "0",
-                "market": "SEHK",
-                "stockId": "-1",
-                "documentType": "-1",
-                "fromDate": date_from_yyyymmdd,
-                "toDate": date_to_yyyymmdd,
-                "title": "",
-                "searchType": "0",
-                "t1code": "-2",
-                "t2Gcode": "-2",
-                "t2code": "-2",
-                "rowRange": str(row_range),
-                "lang": "E",
-            },
-            headers={
-                "Accept": "application/json, text/javascript, */*; q=0.01",
-                "Referer": HKEX_SEARCH_PAGE,
-                "X-Requested-With": "XMLHttpRequest",
-            },
-            timeout=120,
-        )
-        api_resp.raise_for_status()
-
-        data = api_resp.json()
-        raw_result = data.get("result", "null")
-        if not raw_result or raw_result == "null":
+        row_range = plan_next_row_range(fetched, api_total, max_records, page_cap)
+        if row_range <= fetched:
             break
 
-        records = json.loads(raw_result)
-        if api_total is None and records:
-            api_total = int(records[0].get("TOTAL_COUNT", "0"))
+        started = time.monotonic()
+        raw_result, has_next, resp_bytes = _fetch_api_page(
+            session, date_from_yyyymmdd, date_to_yyyymmdd, row_range
+        )
+        counters["requests"] = counters.get("requests", 0) + 1
+        counters["bytes"] = counters.get("bytes", 0) + resp_bytes
+        if not raw_result:
+            counters["seconds"] = counters.get("seconds", 0.0) + time.monotonic() - started
+            break
 
-        new_records = records[fetched:]
-        for rec in new_records:
+        returned = fetched
+        for i, rec in _iter_json_array(raw_result, skip=fetched):
+            if api_total is None:
+                api_total = int(rec.get("TOTAL_COUNT", "0") or 0)
             all_records.append(_parse_api_record(rec))
+            returned = i + 1
+        del raw_result
+        counters["seconds"] = counters.get("seconds", 0.0) + time.monotonic() - started
+
+        if split_above > 0 and api_total and api_total > split_above and has_next:
+            return None, api_total
 
-        fetched = len(records)
-        has_next = data.get("hasNextRow", False)
+        if returned < row_range and has_next and returned > fetched:
+            # The server capped the page; step by that size from now on
+            page_cap = returned - fetched
+        if returned <= fetched:
+            break
+        fetched = returned
         if not has_next:
             break
         if api_total and fetched >= api_total:
             break
 
+    return all_records, api_total or len(all_records)
+
+
+def _fill_fetch_stats(stats: dict | None, counters: dict, n_records: int) -> None:
+    if stats is None:
+        return
+    stats.update(counters)
+    stats["requests"] = counters.get("requests", 0)
+    stats["bytes"] = counters.get("bytes", 0)
+    stats["records"] = n_records
+    stats["bytes_per_record"] = (
+        round(stats["bytes"] / n_records, 1) if n_records else 0.0
+    )
+
+
+def fetch_chunk_via_api(
+    session,
+    date_from_yyyymmdd: str,
+    date_to_yyyymmdd: str,
+    max_records: int = 0,
+    stats: dict | None = None,
+) -> list:
+    """Fetch all filings for a date range chunk using the HKEx JSON API.
+
+    Steps:
+        1. POST the JSF form with from/to dates to set the session's date range.
+        2. Probe the JSON API with a small ``rowRange`` to learn ``TOTAL_COUNT``.
+        3. Fetch the remainder in one request sized from ``TOTAL_COUNT`` and
+           decode only the records after the probe.
+
+    If *stats* is given it is filled with ``requests``, ``bytes``,
+    ``records`` and ``bytes_per_record`` for the chunk.
+    """
+    counters: dict = {}
+    records, _ = _fetch_window(
+        session, date_from_yyyymmdd, date_to_yyyymmdd, max_records, counters
+    )
+    records = records or []
+    _fill_fetch_stats(stats, counters, len(records))
+    return records
+
+
+# ---------------------------------------------------------------------------
+# Adaptive windows (split heavy periods within a month)
+# ---------------------------------------------------------------------------
+
+def fetch_chunk_adaptive(
+    session,
+    chunk_from: datetime,
+    chunk_to: datetime,
+    max_records: int = 0,
+    target_records: int = HKEX_TARGET_RECORDS,
+    target_seconds: float = HKEX_TARGET_SECONDS,
+    stats: dict | None = None,
+) -> list:
+    """Fetch a chunk in date windows sized to stay inside a per-request budget.
+
+    Walks the chunk newest first.  Each window's length in days comes from
+    the records-per-day rate seen so far: busy periods (results season) get
+    split into weeks or single days, and once the rate drops again the
+    windows grow back, up to the rest of the chunk.  A window whose probe
+    ``TOTAL_COUNT`` exceeds the budget is narrowed and re-probed before its
+    remainder is downloaded.  If a
+    request takes longer than *target_seconds* the record budget shrinks in
+    proportion for the rest of the chunk.
+
+    Windows never extend beyond the chunk, so the HKEx one-month search
+    limit still holds; quiet months cannot be merged into one window, and
+    each chunk costs at least one search session (:func:`_open_search`)
+    plus a probe.  Records are returned in newest-first order.  *stats*
+    gets the same keys as :func:`fetch_chunk_via_api` plus ``windows``.
+    """
+    counters: dict = {}
+    all_records: list = []
+    budget = max(PROBE_ROWS, target_records)
+    rate: float | None = None  # records per day
+    windows = 0
+    win_end = chunk_to
+
+    while win_end >= chunk_from:
+        remaining_days = (win_end - chunk_from).days + 1
+        win_days = remaining_days
+        if rate is not None and rate > 0:
+            win_days = max(1, min(remaining_days, int(budget / rate)))
+        win_start = win_end - timedelta(days=win_days - 1)
+
+        remaining = max_records - len(all_records) if max_records > 0 else 0
+        if max_records > 0 and remaining <= 0:
+            break
+        seconds_before = counters.get("seconds", 0.0)
+        records, total = _fetch_window(
+            session,
+            win_start.strftime("%Y%m%d"),
+            win_end.strftime("%Y%m%d"),
+            remaining,
+            counters,
+            split_above=budget if win_days > 1 else 0,
+        )
+        rate = max(total, 1) / win_days
+        if records is None:
+            log(
+                f"    {win_start.strftime('%Y-%m-%d')}..{win_end.strftime('%Y-%m-%d')}: "
+                f"{total} records over budget {budget}, narrowing to "
+                f"~{max(1, int(budget / rate))} day window"
+            )
+            continue
+
+        windows += 1
+        all_records.extend(records)
+        elapsed = counters.get("seconds", 0.0) - seconds_before
+        if target_seconds > 0 and elapsed > target_seconds and len(records) > PROBE_ROWS:
+            budget = max(PROBE_ROWS, int(budget * target_seconds / elapsed))
+            log(f"    Window took {elapsed:.0f}s, lowering record budget to {budget}")
+        win_end = win_start - timedelta(days=1)
+
+    counters["windows"] = windows
+    _fill_fetch_stats(stats, counters, len(all_records))
     return all_records
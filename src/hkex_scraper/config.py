@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import os
+import socket
 from pathlib import Path
 
 # ---------------------------------------------------------------------------
@@ -29,6 +30,16 @@ SURREAL_NS: str = os.environ.get("SURREAL_NAMESPACE", "default")
 SURREAL_DB: str = os.environ.get("SURREAL_DATABASE", "default")
 SURREAL_USER: str = os.environ.get("SURREAL_USERNAME", "root")
 SURREAL_PASS: str = os.environ.get("SURREAL_PASSWORD", "")
+# "token": sign in once via /signin and send the JWT (falls back to Basic auth
+# if sign-in fails); "basic": send the password with every request.
+SURREAL_AUTH: str = os.environ.get("SURREAL_AUTH", "token").lower()
+# Assumed token lifetime when the JWT carries no "exp" claim.
+SURREAL_TOKEN_TTL: int = int(os.environ.get("SURREAL_TOKEN_TTL", "3600"))
+# Transport for /rpc calls: "http" (pooled POSTs) or "ws" (one multiplexed
+# WebSocket with many requests in flight).
+SURREAL_TRANSPORT: str = os.environ.get("SURREAL_TRANSPORT", "http").lower()
+# Keep-alive connections to SurrealDB shared by all threads (max concurrent requests).
+SURREAL_POOL_SIZE: int = int(os.environ.get("SURREAL_POOL_SIZE", "16"))
 
 # ---------------------------------------------------------------------------
 # Graph linking (optional)
@@ -52,6 +63,61 @@ LOG_DIR: Path = Path.cwd() / "logs"
 # ---------------------------------------------------------------------------
 BATCH_SIZE: int = 100
 MAX_DOWNLOAD_WORKERS: int = int(os.environ.get("MAX_DOWNLOAD_WORKERS", "15"))
+# Keep-alive connections per document host (downloads beyond this wait for one).
+DOWNLOAD_CONNECTIONS_PER_HOST: int = int(os.environ.get("DOWNLOAD_CONNECTIONS_PER_HOST", "16"))
+# Concurrent HKEx search sessions in Phase 1 (each fetches one date chunk at a time).
+# Keep this small to stay polite to hkexnews.hk.
+MAX_CHUNK_WORKERS: int = int(os.environ.get("MAX_CHUNK_WORKERS", "4"))
+# Phase 2 documents extracted at once.  With the extraction sandbox on
+# (EXTRACT_TIMEOUT_SECONDS > 0, the default) this is the number of sandbox
+# children (0 = one); with it off, the size of the extraction process pool
+# (0 = extract on a thread in the main process).
+# Separate from MAX_DOWNLOAD_WORKERS: extraction is CPU-bound, downloads are I/O-bound.
+MAX_EXTRACT_WORKERS: int = int(os.environ.get("MAX_EXTRACT_WORKERS", "0"))
+# Directory the download stage writes each document to for extraction; RAM-backed
+# where available.
+EXTRACT_TMP_DIR: str = os.environ.get(
+    "EXTRACT_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else ""
+)
+# PDF tables: "auto" reads them with PyMuPDF's table finder and re-reads pages
+# that fail its quality check with camelot; "camelot" uses camelot only.
+PDF_TABLE_ENGINE: str = os.environ.get("PDF_TABLE_ENGINE", "auto").lower()
+# Per-document extraction sandbox: each document is extracted in a supervised
+# child process that is killed past these limits (EXTRACT_TIMEOUT_SECONDS=0
+# disables the sandbox).  Killed PDFs are retried once in text-only mode
+# unless EXTRACT_DEGRADED_RETRY=false.
+EXTRACT_TIMEOUT_SECONDS: float = float(os.environ.get("EXTRACT_TIMEOUT_SECONDS", "300"))
+EXTRACT_MAX_RSS_MB: int = int(os.environ.get("EXTRACT_MAX_RSS_MB", "2048"))
+EXTRACT_CPU_SECONDS: int = int(os.environ.get("EXTRACT_CPU_SECONDS", "600"))
+EXTRACT_DEGRADED_RETRY: bool = os.environ.get(
+    "EXTRACT_DEGRADED_RETRY", "true"
+).lower() not in ("0", "false", "no")
+# Phase 2 work claiming: each node claims filings under its worker ID and holds
+# a lease that it renews while working; leases of a crashed node expire and
+# are taken over by other nodes.  Keep the lease well above the extraction
+# timeout plus download time.
+PHASE2_WORKER_ID: str = os.environ.get(
+    "PHASE2_WORKER_ID", f"{socket.gethostname()}-{os.getpid()}"
+)
+PHASE2_LEASE_SECONDS: int = int(os.environ.get("PHASE2_LEASE_SECONDS", "900"))
+PHASE2_REPORT_SECONDS: float = float(os.environ.get("PHASE2_REPORT_SECONDS", "30"))
+# The Phase 2 DB writer packs status updates and document saves into
+# multi-statement requests; a partly filled request is sent after this delay.
+PHASE2_WRITE_FLUSH_SECONDS: float = float(os.environ.get("PHASE2_WRITE_FLUSH_SECONDS", "1.0"))
+# Transient Phase 2 failures (timeouts, HTTP 429/5xx, failed saves) are
+# retried with exponential backoff: the n-th retry is due after
+# PHASE2_RETRY_BASE_SECONDS * 2**(n-1), capped at PHASE2_RETRY_MAX_SECONDS.
+# After PHASE2_MAX_ATTEMPTS attempts the failure is recorded as final.
+PHASE2_MAX_ATTEMPTS: int = int(os.environ.get("PHASE2_MAX_ATTEMPTS", "5"))
+PHASE2_RETRY_BASE_SECONDS: int = int(os.environ.get("PHASE2_RETRY_BASE_SECONDS", "300"))
+PHASE2_RETRY_MAX_SECONDS: int = int(os.environ.get("PHASE2_RETRY_MAX_SECONDS", "86400"))
+# Downloaded documents waiting for or under extraction may hold at most
+# PHASE2_MEMORY_BUDGET_MB in memory; new downloads wait for room.  Documents over
+# PHASE2_SPILL_MB are written to a temp file in PHASE2_SPILL_DIR (default: the
+# system temp dir, which unlike /dev/shm is disk-backed) and never count.
+PHASE2_MEMORY_BUDGET_MB: int = int(os.environ.get("PHASE2_MEMORY_BUDGET_MB", "256"))
+PHASE2_SPILL_MB: int = int(os.environ.get("PHASE2_SPILL_MB", "8"))
+PHASE2_SPILL_DIR: str = os.environ.get("PHASE2_SPILL_DIR", "")
 MAX_DOWNLOAD_SIZE: int = 25 * 1024 * 1024  # 25 MB
 MAX_SQL_BODY_SIZE: int = 900 * 1024          # ~900 KB text limit (SurrealDB /sql endpoint = 1 MiB)
 MAX_RPC_BODY_SIZE: int = 3_800_000           # ~3.8 MB safe limit (SurrealDB /rpc endpoint = 4 MiB)
@@ -62,3 +128,24 @@ MAX_RPC_BODY_SIZE: int = 3_800_000           # ~3.8 MB safe limit (SurrealDB /rp
 HKEX_BASE_URL: str = "https://www1.hkexnews.hk"
 HKEX_SEARCH_PAGE: str = f"{HKEX_BASE_URL}/search/titlesearch.xhtml"
 HKEX_API_ENDPOINT: str = f"{HKEX_BASE_URL}/search/titleSearchServlet.do"
+
+# Per-request budget for adaptive date windows: busy months are split until a
+# window returns at most this many records, and the budget shrinks when a
+# single request takes longer than HKEX_TARGET_SECONDS.
+HKEX_TARGET_RECORDS: int = int(os.environ.get("HKEX_TARGET_RECORDS", "5000"))
+HKEX_TARGET_SECONDS: float = float(os.environ.get("HKEX_TARGET_SECONDS", "30"))
+
+# Shared AIMD limiter for every request to hkexnews.hk (Phase 1 search and
+# Phase 2 downloads).  The concurrency window starts at HKEX_INITIAL_CONCURRENCY,
+# grows by one per window of healthy responses and halves on 429/5xx,
+# connection errors, or a time to first byte above HKEX_SLOW_SECONDS.
+HKEX_INITIAL_CONCURRENCY: int = int(os.environ.get("HKEX_INITIAL_CONCURRENCY", "8"))
+HKEX_MIN_CONCURRENCY: int = int(os.environ.get("HKEX_MIN_CONCURRENCY", "1"))
+HKEX_MAX_CONCURRENCY: int = int(os.environ.get("HKEX_MAX_CONCURRENCY", "64"))
+HKEX_SLOW_SECONDS: float = float(os.environ.get("HKEX_SLOW_SECONDS", "10"))
+# Search pages are sized by the adaptive planner to take up to
+# HKEX_TARGET_SECONDS, so they only count as slow above this (at least that).
+HKEX_SEARCH_SLOW_SECONDS: float = max(
+    float(os.environ.get("HKEX_SEARCH_SLOW_SECONDS", str(2 * HKEX_TARGET_SECONDS))),
+    HKEX_TARGET_SECONDS,
+)
@@ -3,61 +3,277 @@
 from __future__ import annotations
 
 import base64
+import functools
 import json
-import urllib.error
-import urllib.request
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
-from typing import List
+from typing import Iterable, Iterator, List, Tuple
 
 from .config import (
     COMPANY_TABLE,
     LOG_DIR,
+    SURREAL_AUTH,
     SURREAL_DB,
     SURREAL_ENDPOINT,
     SURREAL_NS,
     SURREAL_PASS,
+    SURREAL_POOL_SIZE,
+    SURREAL_TOKEN_TTL,
+    SURREAL_TRANSPORT,
     SURREAL_USER,
 )
+from .httppool import HttpConnectionPool, HttpError
 from .utils import log
+from .ws import WebSocketRpcClient
 
 # ---------------------------------------------------------------------------
 # Auth
 # ---------------------------------------------------------------------------
 
+# With token auth the client signs in once via ``/signin`` and sends the JWT
+# as a Bearer token, so SurrealDB does not re-verify the password hash on
+# every request.  If sign-in fails the client falls back to Basic auth for
+# the rest of the run.
+
+TOKEN_REFRESH_MARGIN = 60  # seconds before expiry to fetch a new token
+
+_auth_mode = SURREAL_AUTH
+_token_lock = threading.Lock()
+_token = ""
+_token_expires = 0.0
+
+
+@functools.lru_cache(maxsize=1)
 def _get_auth_header() -> str:
     creds = f"{SURREAL_USER}:{SURREAL_PASS}".encode()
     return base64.b64encode(creds).decode()
 
 
+def set_auth_mode(mode: str) -> None:
+    """Switch between ``'token'`` and ``'basic'`` auth (drops any cached token)."""
+    global _auth_mode, _token, _token_expires
+    with _token_lock:
+        _auth_mode = mode
+        _token = ""
+        _token_expires = 0.0
+
+
+def _jwt_expiry(token: str) -> float | None:
+    """Return the ``exp`` claim of a JWT as a Unix timestamp, if present."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except (IndexError, ValueError, TypeError):
+        return None
+
+
+def _signin_attempts() -> Tuple[dict, ...]:
+    """Credentials to try in order: root user, then database user."""
+    return (
+        {"user": SURREAL_USER, "pass": SURREAL_PASS},
+        {"ns": SURREAL_NS, "db": SURREAL_DB, "user": SURREAL_USER, "pass": SURREAL_PASS},
+    )
+
+
+def _signin() -> Tuple[str, float] | None:
+    """Sign in as a root user, then as a database user; return ``(token, expiry)``."""
+    last_error = ""
+    for creds in _signin_attempts():
+        try:
+            data = _get_pool().request(
+                "POST",
+                "/signin",
+                body=json.dumps(creds).encode("utf-8"),
+                headers={"Content-Type": "application/json", "Accept": "application/json"},
+                timeout=30,
+            )
+            token = json.loads(data.decode("utf-8")).get("token")
+        except HttpError as e:
+            last_error = f"HTTP {e.status}: {e.body.decode('utf-8', errors='replace')[:200]}"
+            continue
+        except Exception as e:
+            last_error = str(e)
+            continue
+        if token:
+            return token, _jwt_expiry(token) or time.time() + SURREAL_TOKEN_TTL
+    log(f"  SurrealDB /signin failed ({last_error}); falling back to Basic auth")
+    return None
+
+
+def _authorization(rejected: str = "") -> str:
+    """Return the ``Authorization`` header value, signing in when needed.
+
+    *rejected* is a header value the server just answered with 401; a new
+    token is fetched unless another thread already replaced it.
+    """
+    global _auth_mode, _token, _token_expires
+    if _auth_mode != "token":
+        return f"Basic {_get_auth_header()}"
+    with _token_lock:
+        stale = bool(rejected) and rejected == f"Bearer {_token}"
+        if stale or not _token or time.time() > _token_expires - TOKEN_REFRESH_MARGIN:
+            signed_in = _signin()
+            if signed_in is None:
+                _auth_mode = "basic"
+                return f"Basic {_get_auth_header()}"
+            _token, _token_expires = signed_in
+        return f"Bearer {_token}"
+
+
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+_pool: HttpConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> HttpConnectionPool:
+    """Return the process-wide keep-alive pool for ``SURREAL_ENDPOINT``."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HttpConnectionPool(SURREAL_ENDPOINT, size=SURREAL_POOL_SIZE)
+    return _pool
+
+
+def get_http_stats() -> dict:
+    """Return request/latency counters for SurrealDB calls made so far.
+
+    WebSocket counters, when that transport was used, are under ``ws``.
+    """
+    stats = _pool.stats() if _pool is not None else {}
+    if _ws is not None:
+        stats["ws"] = _ws.stats()
+    return stats
+
+
+def format_http_stats(stats: dict) -> str:
+    """One-line summary of :func:`get_http_stats` for the run log."""
+    parts = []
+    if stats.get("requests"):
+        parts.append(
+            f"{stats['requests']} requests, {stats['errors']} errors, "
+            f"avg {stats['latency_avg'] * 1000:.1f} ms, max {stats['latency_max'] * 1000:.0f} ms, "
+            f"{stats['connections_opened']} connections opened, "
+            f"{stats['connections_reused']} reused"
+        )
+    ws = stats.get("ws")
+    if ws and ws.get("requests"):
+        parts.append(
+            f"WebSocket: {ws['requests']} RPCs, max {ws['max_in_flight']} in flight, "
+            f"{ws['connects']} connects"
+        )
+    return "; ".join(parts) or "no requests"
+
+
+# ---------------------------------------------------------------------------
+# WebSocket transport (optional)
+# ---------------------------------------------------------------------------
+# With SURREAL_TRANSPORT=ws, RPC calls share one multiplexed WebSocket, so
+# many small statements can be in flight at once (see surreal_query_many).
+_transport = SURREAL_TRANSPORT
+_ws: WebSocketRpcClient | None = None
+
+
+def _ws_url() -> str:
+    parts = urllib.parse.urlsplit(SURREAL_ENDPOINT)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return urllib.parse.urlunsplit((scheme, parts.netloc, parts.path.rstrip("/") + "/rpc", "", ""))
+
+
+def _ws_setup(client: WebSocketRpcClient) -> None:
+    """Authenticate a new WebSocket connection and select the namespace/database."""
+    error = ""
+    for creds in _signin_attempts():
+        body = client.call("signin", [creds], timeout=30)
+        error = body.get("error")
+        if not error:
+            break
+    if error:
+        raise ConnectionError(f"WebSocket signin failed: {error}")
+    body = client.call("use", [SURREAL_NS, SURREAL_DB], timeout=30)
+    if body.get("error"):
+        raise ConnectionError(f"WebSocket use failed: {body['error']}")
+
+
+def _get_ws() -> WebSocketRpcClient:
+    global _ws
+    if _ws is None:
+        with _pool_lock:
+            if _ws is None:
+                _ws = WebSocketRpcClient(_ws_url(), setup=_ws_setup)
+    return _ws
+
+
+def set_transport(transport: str) -> None:
+    """Switch RPC calls between ``'http'`` and ``'ws'``."""
+    global _transport
+    _transport = transport
+
+
 # ---------------------------------------------------------------------------
 # Query
 # ---------------------------------------------------------------------------
 
-def surreal_query(sql: str, timeout: int = 120) -> dict:
-    """Send SurrealQL to the ``/sql`` endpoint. Returns parsed JSON response."""
-    url = f"{SURREAL_ENDPOINT}/sql"
-    auth = _get_auth_header()
-    req = urllib.request.Request(
-        url,
-        data=sql.encode("utf-8"),
-        headers={
-            "Content-Type": "text/plain",
+def _post(path: str, body: bytes, content_type: str, timeout: int) -> bytes:
+    """POST to SurrealDB over the shared keep-alive connection pool.
+
+    A 401 on a Bearer token (expired or revoked early) triggers one fresh
+    sign-in and retry.
+    """
+    def _send(authorization: str) -> bytes:
+        headers = {
+            "Content-Type": content_type,
             "Accept": "application/json",
-            "Authorization": f"Basic {auth}",
+            "Authorization": authorization,
             "Surreal-NS": SURREAL_NS,
             "Surreal-DB": SURREAL_DB,
-        },
-    )
+        }
+        return _get_pool().request("POST", path, body=body, headers=headers, timeout=timeout)
+
+    authorization = _authorization()
+    try:
+        return _send(authorization)
+    except HttpError as e:
+        if e.status != 401 or not authorization.startswith("Bearer "):
+            raise
+    return _send(_authorization(rejected=authorization))
+
+
+def surreal_query(sql: str, timeout: int = 120) -> dict:
+    """Send SurrealQL to the ``/sql`` endpoint. Returns parsed JSON response."""
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8") if e.fp else ""
-        return {"error": f"HTTP {e.code}: {body[:500]}"}
+        data = _post("/sql", sql.encode("utf-8"), "text/plain", timeout)
+        return json.loads(data.decode("utf-8"))
+    except HttpError as e:
+        body = e.body.decode("utf-8", errors="replace")
+        return {"error": f"HTTP {e.status}: {body[:500]}"}
     except Exception as e:
         return {"error": str(e)}
 
 
+def _rpc_result(body: dict) -> dict:
+    """Normalise an RPC response: ``{'error': ...}`` on any failure, else *body*."""
+    # RPC responses have {id, result, error} format
+    if body.get("error"):
+        return {"error": str(body["error"])}
+    # Also check for ERR status inside the result array
+    # (query-level errors are returned as {result: [{status: "ERR", result: "..."}]})
+    results = body.get("result", [])
+    if isinstance(results, list):
+        for r in results:
+            if isinstance(r, dict) and r.get("status") == "ERR":
+                return {"error": str(r.get("result", "Unknown query error"))}
+    return body
+
+
 def surreal_rpc(method: str, params: list, timeout: int = 120) -> dict:
     """Send a JSON-RPC request to the ``/rpc`` endpoint.
 
@@ -73,42 +289,98 @@ def surreal_rpc(method: str, params: list, timeout: int = 120) -> dict:
     Returns:
         Parsed JSON response dict, or ``{'error': '...'}`` on failure.
     """
-    url = f"{SURREAL_ENDPOINT}/rpc"
-    auth = _get_auth_header()
+    body = _rpc_call(method, params, timeout)
+    return body if body.get("error") else _rpc_result(body)
+
+
+def _rpc_call(method: str, params: list, timeout: int) -> dict:
+    """Send one RPC request; return the raw response body or ``{'error': ...}``."""
+    if _transport == "ws":
+        try:
+            body = _get_ws().call(method, params, timeout=timeout)
+        except Exception as e:
+            return {"error": str(e)}
+        return {"error": str(body["error"])} if body.get("error") else body
     payload = json.dumps(
         {"id": 1, "method": method, "params": params},
         ensure_ascii=False,
     )
-    req = urllib.request.Request(
-        url,
-        data=payload.encode("utf-8"),
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": f"Basic {auth}",
-            "Surreal-NS": SURREAL_NS,
-            "Surreal-DB": SURREAL_DB,
-        },
-    )
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            body = json.loads(resp.read().decode("utf-8"))
-            # RPC responses have {id, result, error} format
-            if body.get("error"):
-                return {"error": str(body["error"])}
-            # Also check for ERR status inside the result array
-            # (query-level errors are returned as {result: [{status: "ERR", result: "..."}]})
-            results = body.get("result", [])
-            if isinstance(results, list):
-                for r in results:
-                    if isinstance(r, dict) and r.get("status") == "ERR":
-                        return {"error": str(r.get("result", "Unknown query error"))}
-            return body
-    except urllib.error.HTTPError as e:
-        body_text = e.read().decode("utf-8") if e.fp else ""
-        return {"error": f"HTTP {e.code}: {body_text[:500]}"}
+        data = _post("/rpc", payload.encode("utf-8"), "application/json", timeout)
+        body = json.loads(data.decode("utf-8"))
+    except HttpError as e:
+        body_text = e.body.decode("utf-8", errors="replace")
+        return {"error": f"HTTP {e.status}: {body_text[:500]}"}
     except Exception as e:
         return {"error": str(e)}
+    return {"error": str(body["error"])} if body.get("error") else body
+
+
+def surreal_query_statements(sql: str, vars: dict | None = None, timeout: int = 120) -> list | dict:
+    """Run a multi-statement parameterised query over ``/rpc``.
+
+    Unlike :func:`surreal_rpc`, one failed statement does not turn the whole
+    response into an error: the result list has one ``{status, result}``
+    entry per statement, so callers can tell which statements failed.
+    Returns ``{'error': ...}`` only if the request as a whole failed.
+    """
+    body = _rpc_call("query", [sql, vars or {}], timeout)
+    if body.get("error"):
+        return body
+    results = body.get("result")
+    if not isinstance(results, list):
+        return {"error": f"unexpected query response: {str(results)[:200]}"}
+    return results
+
+
+def surreal_query_async(sql: str, timeout: int = 120) -> Future:
+    """Submit SurrealQL without waiting; the future resolves like :func:`surreal_query`.
+
+    Over the WebSocket transport the query is pipelined on the shared
+    socket.  Over HTTP it runs synchronously and the future is already done.
+    """
+    out: Future = Future()
+    if _transport != "ws":
+        out.set_result(surreal_query(sql, timeout=timeout))
+        return out
+
+    def _resolve(fut: Future) -> None:
+        try:
+            result = _rpc_result(fut.result())
+        except Exception as e:
+            result = {"error": str(e)}
+        out.set_result(result if result.get("error") else result.get("result", []))
+
+    try:
+        _get_ws().call_async("query", [sql]).add_done_callback(_resolve)
+    except Exception as e:
+        out.set_result({"error": str(e)})
+    return out
+
+
+def surreal_query_many(
+    statements: Iterable[str], timeout: int = 120, window: int = 64
+) -> Iterator[dict | list]:
+    """Run independent SurrealQL requests, keeping up to *window* in flight.
+
+    Yields one result per statement, in order, each shaped like the return
+    value of :func:`surreal_query`.  Over HTTP this is the same as calling
+    :func:`surreal_query` in a loop.
+    """
+    pending: deque = deque()
+    for sql in statements:
+        pending.append(surreal_query_async(sql, timeout=timeout))
+        if len(pending) >= window:
+            yield _wait(pending.popleft(), timeout)
+    while pending:
+        yield _wait(pending.popleft(), timeout)
+
+
+def _wait(fut: Future, timeout: int) -> dict | list:
+    try:
+        return fut.result(timeout=timeout)
+    except Exception as e:
+        return {"error": str(e) or "request timed out"}
 
 
 # ---------------------------------------------------------------------------
@@ -150,6 +422,32 @@ def upsert_batch_with_retry(
     return len(statements)
 
 
+def rpc_rows_with_retry(
+    sql: str, rows: list, depth: int = 0, max_depth: int = 6
+) -> Tuple[int, list]:
+    """Run a parameterised query over ``/rpc`` with *rows* bound to ``$rows``.
+
+    On error the batch is split in half and retried recursively, like
+    :func:`upsert_batch_with_retry`.  Rows that still fail on their own are
+    returned so the caller can try another path for just those.
+
+    Returns ``(saved_count, failed_rows)``.
+    """
+    if not rows:
+        return 0, []
+    res = surreal_rpc("query", [sql, {"rows": rows}], timeout=240)
+    if isinstance(res, dict) and res.get("error"):
+        if depth >= max_depth or len(rows) == 1:
+            err_txt = res.get("error", "")
+            log(f"  RPC batch failed (depth {depth}, size {len(rows)}): {err_txt[:300]}")
+            return 0, list(rows)
+        mid = len(rows) // 2
+        left_saved, left_failed = rpc_rows_with_retry(sql, rows[:mid], depth + 1, max_depth)
+        right_saved, right_failed = rpc_rows_with_retry(sql, rows[mid:], depth + 1, max_depth)
+        return left_saved + right_saved, left_failed + right_failed
+    return len(rows), []
+
+
 # ---------------------------------------------------------------------------
 # Schema initialisation
 # ---------------------------------------------------------------------------
@@ -185,16 +483,29 @@ DEFINE FIELD IF NOT EXISTS documentHash         ON TABLE exchange_filing TYPE op
 DEFINE FIELD IF NOT EXISTS documentText         ON TABLE exchange_filing TYPE option<string>;
 DEFINE FIELD IF NOT EXISTS documentTextLen      ON TABLE exchange_filing TYPE option<int>;
 DEFINE FIELD IF NOT EXISTS documentTables       ON TABLE exchange_filing TYPE option<array<object>>;
-DEFINE FIELD IF NOT EXISTS documentTables[*]             ON TABLE exchange_filing TYPE object;
-DEFINE FIELD IF NOT EXISTS documentTables[*].tableIndex  ON TABLE exchange_filing TYPE option<int>;
-DEFINE FIELD IF NOT EXISTS documentTables[*].sheetName   ON TABLE exchange_filing TYPE option<string>;
-DEFINE FIELD IF NOT EXISTS documentTables[*].pageNumber  ON TABLE exchange_filing TYPE option<int>;
-DEFINE FIELD IF NOT EXISTS documentTables[*].headers     ON TABLE exchange_filing TYPE option<array<string>>;
-DEFINE FIELD IF NOT EXISTS documentTables[*].rowCount    ON TABLE exchange_filing TYPE option<int>;
-DEFINE FIELD IF NOT EXISTS documentTables[*].markdown    ON TABLE exchange_filing TYPE option<string>;
+DEFINE FIELD IF NOT EXISTS documentTables[*] ON TABLE exchange_filing
+    TYPE object;
+DEFINE FIELD IF NOT EXISTS documentTables[*].tableIndex ON TABLE exchange_filing
+    TYPE option<int>;
+DEFINE FIELD IF NOT EXISTS documentTables[*].sheetName ON TABLE exchange_filing
+    TYPE option<string>;
+DEFINE FIELD IF NOT EXISTS documentTables[*].pageNumber ON TABLE exchange_filing
+    TYPE option<int>;
+DEFINE FIELD IF NOT EXISTS documentTables[*].headers ON TABLE exchange_filing
+    TYPE option<array<string>>;
+DEFINE FIELD IF NOT EXISTS documentTables[*].rowCount ON TABLE exchange_filing
+    TYPE option<int>;
+DEFINE FIELD IF NOT EXISTS documentTables[*].markdown ON TABLE exchange_filing
+    TYPE option<string>;
+DEFINE FIELD IF NOT EXISTS documentTables[*].engine ON TABLE exchange_filing
+    TYPE option<string>;
 DEFINE FIELD IF NOT EXISTS documentTableCnt     ON TABLE exchange_filing TYPE option<int>;
 DEFINE FIELD IF NOT EXISTS documentStatus       ON TABLE exchange_filing TYPE option<string>;
 DEFINE FIELD IF NOT EXISTS documentStatusReason ON TABLE exchange_filing TYPE option<string>;
+DEFINE FIELD IF NOT EXISTS claimedBy            ON TABLE exchange_filing TYPE option<string>;
+DEFINE FIELD IF NOT EXISTS leaseExpiresAt       ON TABLE exchange_filing TYPE option<datetime>;
+DEFINE FIELD IF NOT EXISTS documentAttempts     ON TABLE exchange_filing TYPE option<int>;
+DEFINE FIELD IF NOT EXISTS nextAttemptAt        ON TABLE exchange_filing TYPE option<datetime>;
 
 -- Indexes
 DEFINE INDEX IF NOT EXISTS idx_ef_ticker    ON TABLE exchange_filing COLUMNS companyTicker;
@@ -204,16 +515,42 @@ DEFINE INDEX IF NOT EXISTS idx_ef_type      ON TABLE exchange_filing COLUMNS fil
 DEFINE INDEX IF NOT EXISTS idx_ef_source    ON TABLE exchange_filing COLUMNS source;
 DEFINE INDEX IF NOT EXISTS idx_ef_docstatus ON TABLE exchange_filing COLUMNS documentStatus;
 DEFINE INDEX IF NOT EXISTS idx_ef_category  ON TABLE exchange_filing COLUMNS filingCategory;
+-- Phase 2 work queue: unprocessed rows newest first; pages are filingDate
+-- ranges (served by idx_ef_date), this index covers the full sort key
+DEFINE INDEX IF NOT EXISTS idx_ef_queue_key ON TABLE exchange_filing
+    COLUMNS documentStatus, filingDate, id;
+-- Phase 2 claims: expired-lease takeover and per-worker renewal/release
+DEFINE INDEX IF NOT EXISTS idx_ef_lease ON TABLE exchange_filing
+    COLUMNS documentStatus, leaseExpiresAt;
+DEFINE INDEX IF NOT EXISTS idx_ef_claimedby ON TABLE exchange_filing COLUMNS claimedBy;
+-- Phase 2 retries: transient failures waiting for nextAttemptAt
+DEFINE INDEX IF NOT EXISTS idx_ef_retry ON TABLE exchange_filing
+    COLUMNS documentStatus, nextAttemptAt;
+
+-- Phase 1 checkpoints: one record per scraped date window
+DEFINE TABLE IF NOT EXISTS scrape_state SCHEMAFULL;
+DEFINE FIELD IF NOT EXISTS windowFrom  ON TABLE scrape_state TYPE datetime;
+DEFINE FIELD IF NOT EXISTS windowTo    ON TABLE scrape_state TYPE datetime;
+DEFINE FIELD IF NOT EXISTS status      ON TABLE scrape_state TYPE string;
+DEFINE FIELD IF NOT EXISTS kind        ON TABLE scrape_state TYPE option<string>;
+DEFINE FIELD IF NOT EXISTS recordCount ON TABLE scrape_state TYPE int;
+DEFINE FIELD IF NOT EXISTS savedCount  ON TABLE scrape_state TYPE int;
+DEFINE FIELD IF NOT EXISTS error       ON TABLE scrape_state TYPE option<string>;
+DEFINE FIELD IF NOT EXISTS updatedAt   ON TABLE scrape_state TYPE datetime;
+DEFINE INDEX IF NOT EXISTS idx_ss_status ON TABLE scrape_state COLUMNS status;
+DEFINE INDEX IF NOT EXISTS idx_ss_to     ON TABLE scrape_state COLUMNS windowTo;
 """
     if COMPANY_TABLE:
         base += f"""
 -- Edge table: company -> filing (graph relation)
-DEFINE TABLE IF NOT EXISTS has_filing SCHEMAFULL TYPE RELATION IN {COMPANY_TABLE} OUT exchange_filing;
+DEFINE TABLE IF NOT EXISTS has_filing SCHEMAFULL
+    TYPE RELATION IN {COMPANY_TABLE} OUT exchange_filing;
 DEFINE FIELD IF NOT EXISTS createdAt ON TABLE has_filing TYPE datetime;
 DEFINE INDEX IF NOT EXISTS idx_hf_unique ON TABLE has_filing COLUMNS in, out UNIQUE;
 
 -- Edge table: filing -> referenced company (graph relation)
-DEFINE TABLE IF NOT EXISTS references_filing SCHEMAFULL TYPE RELATION IN exchange_filing OUT {COMPANY_TABLE};
+DEFINE TABLE IF NOT EXISTS references_filing SCHEMAFULL
+    TYPE RELATION IN exchange_filing OUT {COMPANY_TABLE};
 DEFINE FIELD IF NOT EXISTS createdAt ON TABLE references_filing TYPE datetime;
 DEFINE FIELD IF NOT EXISTS source    ON TABLE references_filing TYPE option<string>;
 DEFINE INDEX IF NOT EXISTS idx_rf_unique ON TABLE references_filing COLUMNS in, out UNIQUE;
@@ -250,4 +587,12 @@ def initialize_schema() -> bool:
         )
     else:
         log("  Migration: documentContent field removed (no longer storing blobs)")
+
+    # Migration: the queue index without id was replaced by idx_ef_queue_key
+    mig_result = surreal_query(
+        "REMOVE INDEX IF EXISTS idx_ef_queue ON TABLE exchange_filing;",
+        timeout=30,
+    )
+    if isinstance(mig_result, dict) and mig_result.get("error"):
+        log(f"  Migration note: could not remove idx_ef_queue: {mig_result['error'][:200]}")
     return True
@@ -0,0 +1,142 @@
+"""Coalescing SurrealDB writer for small independent row updates.
+
+Phase 2 finishes filings one at a time, and writing each one as its own
+request makes the database writer a chain of sequential round trips.
+:class:`CoalescingWriter` buffers the statements instead and sends them as
+one multi-statement ``query`` RPC, packed up to the ``/rpc`` body budget.
+The buffer is flushed when it is full or when the oldest statement has
+waited ``max_delay`` seconds.
+
+SurrealDB runs the statements of a request independently (no transaction),
+so each row gets its own result.  Rows whose statement failed, or every row
+of a request that failed as a whole, are retried through their own
+*fallback*, which writes the row by itself with whatever special handling
+the single-row path has (truncation, ``/sql`` fallback, ...).
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Callable, List, Tuple
+
+from .config import MAX_RPC_BODY_SIZE, PHASE2_WRITE_FLUSH_SECONDS
+from .db import surreal_query_statements
+from .utils import log
+
+# (ok, error_code) for one row, as returned by the single-row write helpers
+WriteResult = Tuple[bool, str]
+
+# Bytes allowed per statement for the JSON-RPC envelope and separators
+_STATEMENT_OVERHEAD = 64
+
+
+class CoalescingWriter:
+    """Buffer row writes and send them as multi-statement ``/rpc`` queries.
+
+    Not thread-safe: the Phase 2 pipeline owns one writer on its DB-writer
+    thread.  Variable names in *vars* must be unique across the rows of one
+    request, so callers prefix them per row (e.g. with the filing ID); a
+    repeated name just forces a flush before the row is added.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = MAX_RPC_BODY_SIZE,
+        max_delay: float = PHASE2_WRITE_FLUSH_SECONDS,
+        max_statements: int = 200,
+        timeout: int = 120,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.max_statements = max_statements
+        self.timeout = timeout
+        self._rows: List[tuple] = []
+        self._vars: dict = {}
+        self._bytes = 0
+        self._oldest = 0.0
+        self.counters = {"requests": 0, "rows": 0, "row_failures": 0, "request_failures": 0}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(
+        self,
+        key: str,
+        sql: str,
+        vars: dict | None,
+        fallback: Callable[[], WriteResult],
+        on_done: Callable[[WriteResult], None],
+    ) -> None:
+        """Queue one statement; *on_done* is called with its result after the flush.
+
+        *key* identifies the row in log messages.  *fallback* writes the row
+        by itself and is only used if the batched statement fails.
+        """
+        vars = vars or {}
+        size = len(sql.encode("utf-8")) + _STATEMENT_OVERHEAD
+        if vars:
+            size += len(json.dumps(vars, ensure_ascii=False).encode("utf-8"))
+        if self._rows and (
+            self._bytes + size > self.max_bytes
+            or len(self._rows) >= self.max_statements
+            or any(name in self._vars for name in vars)
+        ):
+            self.flush()
+        if not self._rows:
+            self._oldest = time.monotonic()
+        self._rows.append((key, sql, fallback, on_done))
+        self._vars.update(vars)
+        self._bytes += size
+
+    def seconds_until_due(self) -> float | None:
+        """Seconds until the buffered rows must be flushed, or None if empty."""
+        if not self._rows:
+            return None
+        return max(0.0, self._oldest + self.max_delay - time.monotonic())
+
+    def flush(self) -> None:
+        """Send every buffered row and report each result to its *on_done*.
+
+        Rows added by the callbacks themselves (e.g. a ``failed`` status
+        after a save that failed) are sent before this returns.
+        """
+        while self._rows:
+            rows, vars = self._rows, self._vars
+            self._rows, self._vars, self._bytes = [], {}, 0
+            self._send(rows, vars)
+
+    def _send(self, rows: List[tuple], vars: dict) -> None:
+        self.counters["requests"] += 1
+        self.counters["rows"] += len(rows)
+        if len(rows) == 1:
+            rows[0][3](self._single(rows[0]))
+            return
+
+        sql = "\n".join(row[1] for row in rows)
+        results = surreal_query_statements(sql, vars, timeout=self.timeout)
+        if not isinstance(results, list) or len(results) != len(rows):
+            error = results.get("error") if isinstance(results, dict) else "result count mismatch"
+            self.counters["request_failures"] += 1
+            log(
+                f"  Batched write of {len(rows)} rows failed ({str(error)[:200]}); "
+                f"writing them one by one"
+            )
+            for row in rows:
+                row[3](self._single(row))
+            return
+
+        for row, result in zip(rows, results):
+            if isinstance(result, dict) and result.get("status") == "ERR":
+                self.counters["row_failures"] += 1
+                log(f"  Batched write failed for {row[0]}: {str(result.get('result', ''))[:200]}")
+                row[3](self._single(row))
+            else:
+                row[3]((True, ""))
+
+    def _single(self, row: tuple) -> WriteResult:
+        try:
+            return row[2]()
+        except Exception as e:
+            log(f"  Write failed for {row[0]}: {e}")
+            return False, f"save_error:{str(e)[:100]}"
@@ -0,0 +1,264 @@
+"""Pooled keep-alive downloader for filing documents.
+
+Phase 2 fetches thousands of documents a day from the same host
+(``www1.hkexnews.hk``).  Opening a new ``urllib`` connection for each one
+pays DNS, TCP and TLS setup every time, so downloads share one
+:class:`~hkex_scraper.httppool.HttpConnectionPool` per host instead, with at
+most ``DOWNLOAD_CONNECTIONS_PER_HOST`` connections to each.
+
+Bodies are streamed with :func:`read_capped`: the size cap is enforced
+while reading and the MD5 is computed as chunks arrive.  HTML is requested
+with ``Accept-Encoding: gzip`` and decoded on the fly.  Every download is
+timed as connect / time to first byte / transfer, and the totals are
+available from :meth:`DocumentDownloader.stats`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import http.client
+import threading
+import urllib.parse
+import zlib
+from typing import Dict, Tuple
+
+from .config import DOWNLOAD_CONNECTIONS_PER_HOST, MAX_DOWNLOAD_SIZE
+from .httppool import HttpConnectionPool, HttpError
+
+# Read size for streamed downloads; each chunk is hashed as it arrives
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+REDIRECTS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": (
+        "application/pdf,text/html,"
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet,"
+        "*/*;q=0.8"
+    ),
+}
+
+
+class DownloadAborted(Exception):
+    """The download waited for room in the memory budget and the run stopped."""
+
+
+class CappedBody:
+    """Accumulates a response body, hashing it and enforcing a size cap.
+
+    With *gzipped* the chunks are decompressed as they are fed; the cap and
+    the MD5 apply to the decoded bytes.  *on_grow* is called with the size
+    held so far after every chunk (e.g. ``BudgetHold.grow``).
+    """
+
+    def __init__(self, max_size: int, gzipped: bool = False, on_grow=None) -> None:
+        self.max_size = max_size
+        self.digest = hashlib.md5()
+        self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        self.buf = bytearray()
+        self.on_grow = on_grow
+
+    def feed(self, chunk: bytes) -> bool:
+        """Add a chunk; return False once the body is over the cap."""
+        if self.decoder is not None:
+            # Bounded so a small compressed chunk cannot expand past the cap
+            chunk = self.decoder.decompress(chunk, self.max_size - len(self.buf) + 1)
+            if self.decoder.unconsumed_tail:
+                return False
+        if len(self.buf) + len(chunk) > self.max_size:
+            return False
+        self.digest.update(chunk)
+        self.buf += chunk
+        if self.on_grow is not None:
+            self.on_grow(len(self.buf))
+        return True
+
+    def result(self) -> Tuple[bytearray, str]:
+        """The body and its MD5; the buffer is returned as is, not copied."""
+        return self.buf, self.digest.hexdigest()
+
+
+def read_capped(
+    response, max_size: int, gzipped: bool = False, hold=None
+) -> Tuple[bytes | bytearray, str, str]:
+    """Stream a response body, hashing it as it arrives.
+
+    Returns ``(content, md5_hex, skip_reason)``.  Reading stops with
+    ``too_large`` as soon as the body passes *max_size*, so a server that
+    sends no ``Content-Length`` cannot push more than that.  When the length
+    is known the buffer is allocated once and filled in place.  With
+    *gzipped* the body is decompressed as it is read; the cap and the hash
+    apply to the decoded bytes.  The content is the read buffer itself (a
+    ``bytearray``), so a document is never copied after it arrives.
+
+    With a *hold* (:class:`~hkex_scraper.stages.BudgetHold`) a known length
+    is charged before the body is read, and a body of unknown length as it
+    arrives.  Neither waits: the caller waits for room in the budget before
+    it sends the request.
+    """
+    length = response.headers.get("Content-Length")
+    if length and length.strip().isdigit() and not gzipped:
+        expected = int(length)
+        if expected > max_size:
+            return b"", "", "too_large"
+        if hold is not None:
+            hold.grow(expected)
+        digest = hashlib.md5()
+        buf = bytearray(expected)
+        view = memoryview(buf)
+        pos = 0
+        while pos < expected:
+            n = response.readinto(view[pos:pos + DOWNLOAD_CHUNK_SIZE])
+            if not n:
+                raise http.client.IncompleteRead(bytes(view[:pos]), expected - pos)
+            digest.update(view[pos:pos + n])
+            pos += n
+        view.release()
+        return buf, digest.hexdigest(), ""
+
+    body = CappedBody(max_size, gzipped, hold.grow if hold is not None else None)
+    while True:
+        chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        if not body.feed(chunk):
+            return b"", "", "too_large"
+    return (*body.result(), "")
+
+
+def request_headers(path: str) -> Dict[str, str]:
+    """Request headers for a document path; HTML may come back gzipped."""
+    headers = dict(_HEADERS)
+    if path.lower().endswith((".htm", ".html")):
+        headers["Accept-Encoding"] = "gzip"
+    return headers
+
+
+class DownloadStats:
+    """Download counters and connect / ttfb / transfer timing totals."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters = {
+            "downloads": 0,
+            "bytes": 0,
+            "gzipped": 0,
+            "connect_total": 0.0,
+            "ttfb_total": 0.0,
+            "transfer_total": 0.0,
+            "connect_max": 0.0,
+            "ttfb_max": 0.0,
+            "transfer_max": 0.0,
+        }
+
+    def _record(self, timings: dict, size: int, gzipped: bool) -> None:
+        with self._lock:
+            c = self._counters
+            c["downloads"] += 1
+            c["bytes"] += size
+            c["gzipped"] += int(gzipped)
+            for k, v in timings.items():
+                c[f"{k}_total"] += v
+                c[f"{k}_max"] = max(c[f"{k}_max"], v)
+
+
+class DocumentDownloader(DownloadStats):
+    """Thread-safe document fetcher with one keep-alive pool per host."""
+
+    def __init__(
+        self,
+        per_host: int = DOWNLOAD_CONNECTIONS_PER_HOST,
+        timeout: float = 60,
+        max_size: int = MAX_DOWNLOAD_SIZE,
+    ) -> None:
+        super().__init__()
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_size = max_size
+        self._pools: Dict[str, HttpConnectionPool] = {}
+
+    def _pool(self, scheme: str, netloc: str) -> HttpConnectionPool:
+        key = f"{scheme}://{netloc}"
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = HttpConnectionPool(
+                    key, size=self.per_host, timeout=self.timeout
+                )
+            return pool
+
+    def fetch(self, url: str, hold=None) -> Tuple[bytes | bytearray, str, str, dict]:
+        """Download *url*; return ``(content, md5_hex, skip_reason, timings)``.
+
+        Redirects are followed.  Raises :class:`HttpError` for a non-2xx
+        response and the socket/``http.client`` exception on transport
+        failure.  *timings* has ``connect``, ``ttfb`` and ``transfer`` in
+        seconds, summed over redirects.  The final body's bytes are
+        charged to *hold* as it is read (see :func:`read_capped`).
+        """
+        total = {"connect": 0.0, "ttfb": 0.0, "transfer": 0.0}
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            headers = request_headers(parts.path)
+            location = ""
+            pool = self._pool(parts.scheme, parts.netloc)
+            with pool.stream("GET", path, headers=headers) as (resp, timings):
+                if resp.status in REDIRECTS and resp.getheader("Location"):
+                    resp.read()
+                    location = urllib.parse.urljoin(url, resp.getheader("Location"))
+                elif not 200 <= resp.status < 300:
+                    raise HttpError(
+                        resp.status, resp.read(64 * 1024),
+                        {k.lower(): v for k, v in resp.getheaders()},
+                    )
+                else:
+                    gzipped = (resp.getheader("Content-Encoding") or "").lower() == "gzip"
+                    content, doc_hash, skip_reason = read_capped(
+                        resp, self.max_size, gzipped, hold
+                    )
+            for k in total:
+                total[k] += timings[k]
+            if location:
+                url = location
+                continue
+            self._record(total, len(content), gzipped)
+            return content, doc_hash, skip_reason, total
+        raise HttpError(310, b"too many redirects")
+
+    def stats(self) -> dict:
+        """Timing totals plus connection counters summed over every host pool."""
+        with self._lock:
+            snap = dict(self._counters)
+            pools = list(self._pools.values())
+        snap["hosts"] = len(pools)
+        for key in ("connections_opened", "connections_reused", "retries", "errors"):
+            snap[key] = sum(p.stats()[key] for p in pools)
+        return snap
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+
+
+def format_download_stats(stats: dict) -> str:
+    """One-line summary of :meth:`DocumentDownloader.stats`."""
+    n = stats["downloads"]
+    if not n:
+        return "no downloads"
+
+    def avg_ms(key: str) -> str:
+        return f"{stats[f'{key}_total'] / n * 1000:.0f}"
+
+    return (
+        f"{n} downloads, {stats['bytes'] / 1_048_576:.1f} MB, "
+        f"{stats['connections_opened']} connections opened / "
+        f"{stats['connections_reused']} reused; avg connect {avg_ms('connect')} ms, "
+        f"ttfb {avg_ms('ttfb')} ms, transfer {avg_ms('transfer')} ms"
+    )
@@ -1,8 +1,9 @@
 """Document text and table extraction for PDF, HTML, and Excel files.
 
 Outputs clean, structured Markdown suitable for LLM consumption and human reading.
-Uses pymupdf4llm for PDF text extraction (headings, bold, lists) and camelot-py
-for accurate table extraction (handles merged cells in HKEx regulatory forms).
+Uses pymupdf4llm for PDF text extraction (headings, bold, lists), PyMuPDF's table
+finder for PDF tables and camelot-py where that result looks wrong (camelot
+handles merged cells in HKEx regulatory forms).
 Applies post-processing to remove page headers/footers, normalize bullets, and
 fix spacing.
 """
@@ -13,8 +14,10 @@ import io
 import os
 import re
 import tempfile
+import time
 from typing import List, Tuple
 
+from .config import PDF_TABLE_ENGINE
 from .utils import log, squash_ws
 
 # ---------------------------------------------------------------------------
@@ -201,71 +204,266 @@ def _extract_tables_from_md(md_text: str) -> List[dict]:
     return tables
 
 
+# ---------------------------------------------------------------------------
+# Ruled-table pre-scan (PyMuPDF vector drawings)
+# ---------------------------------------------------------------------------
+
+# A page is a lattice candidate when its drawings contain at least this many
+# horizontal and this many vertical rulings
+_MIN_RULINGS = 2
+# Rulings are at least this long (points) and at most this thick
+_MIN_RULING_LENGTH = 10.0
+_MAX_RULING_WIDTH = 2.0
+
+
+def _ruling_segments(drawings: list) -> Tuple[List[tuple], List[tuple]]:
+    """Horizontal and vertical ruling lines in ``page.get_drawings()``.
+
+    Each segment is ``(x0, y0, x1, y1)``.  Rulings are stroked lines, thin
+    filled bars drawn as lines, and the edges of stroked cell rectangles.
+    """
+    horizontal: List[tuple] = []
+    vertical: List[tuple] = []
+
+    def add(x0: float, y0: float, x1: float, y1: float) -> None:
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        if y1 - y0 <= _MAX_RULING_WIDTH and x1 - x0 >= _MIN_RULING_LENGTH:
+            horizontal.append((x0, y0, x1, y1))
+        elif x1 - x0 <= _MAX_RULING_WIDTH and y1 - y0 >= _MIN_RULING_LENGTH:
+            vertical.append((x0, y0, x1, y1))
+
+    for drawing in drawings:
+        for item in drawing.get("items", ()):
+            if item[0] == "l":
+                add(item[1].x, item[1].y, item[2].x, item[2].y)
+            elif item[0] == "re":
+                r = item[1]
+                if min(r.width, r.height) <= _MAX_RULING_WIDTH:
+                    add(r.x0, r.y0, r.x1, r.y1)
+                elif drawing.get("color") is not None:
+                    # Stroked cell border (a filled one is just shading)
+                    add(r.x0, r.y0, r.x1, r.y0)
+                    add(r.x0, r.y1, r.x1, r.y1)
+                    add(r.x0, r.y0, r.x0, r.y1)
+                    add(r.x1, r.y0, r.x1, r.y1)
+    return horizontal, vertical
+
+
+def _count_rulings(drawings: list) -> Tuple[int, int]:
+    """Count horizontal and vertical ruling lines in ``page.get_drawings()``."""
+    horizontal, vertical = _ruling_segments(drawings)
+    return len(horizontal), len(vertical)
+
+
+def _ruled_table_pages(doc) -> List[int] | None:
+    """Return the 1-based numbers of pages that may hold bordered tables.
+
+    Camelot's lattice mode rasterises every page it is given to find cell
+    borders, which takes minutes on a long annual report.  Reading the
+    vector drawings with PyMuPDF is far cheaper, and a page without
+    horizontal *and* vertical rulings cannot hold a lattice table.
+    Returns None if the pre-scan fails, meaning every page is a candidate.
+    """
+    started = time.monotonic()
+    pages: List[int] = []
+    try:
+        for page in doc:
+            horizontal, vertical = _count_rulings(page.get_drawings())
+            if horizontal >= _MIN_RULINGS and vertical >= _MIN_RULINGS:
+                pages.append(page.number + 1)
+    except Exception as e:
+        log(f"    Table page pre-scan failed ({e}); camelot will scan every page")
+        return None
+    log(
+        f"    Pre-scan: {len(pages)}/{len(doc)} pages have ruled tables "
+        f"({time.monotonic() - started:.2f}s)"
+    )
+    return pages
+
+
+def _table_from_rows(rows: List[list], page_number: int, engine: str) -> dict | None:
+    """Build a ``documentTables`` entry from cell rows (the first is the header).
+
+    Returns None when there is no non-empty data row.
+    """
+    if len(rows) < 2:
+        return None
+
+    # First row is typically the header
+    raw_headers = [squash_ws(str(c or "")) for c in rows[0]]
+
+    # Clean up empty headers — replace blanks with positional names
+    headers = [h if h.strip() else f"Col{i + 1}" for i, h in enumerate(raw_headers)]
+
+    # Data rows (skip header row)
+    data_rows: list = []
+    for row in rows[1:]:
+        cells = [squash_ws(str(c)) if c is not None and str(c).strip() else "" for c in row]
+        # Skip rows that are completely empty
+        if any(cell.strip() for cell in cells):
+            data_rows.append(cells)
+
+    if not data_rows:
+        return None
+
+    return {
+        "pageNumber": page_number,
+        "engine": engine,
+        "headers": headers,
+        "rowCount": len(data_rows),
+        "markdown": _table_to_markdown(headers, data_rows),
+    }
+
+
+# ---------------------------------------------------------------------------
+# PyMuPDF table finder (fast path; camelot re-reads pages that fail the check)
+# ---------------------------------------------------------------------------
+
+# Page.find_tables() ships with PyMuPDF >= 1.23
+FIND_TABLES_AVAILABLE = PYMUPDF_AVAILABLE and hasattr(pymupdf.Page, "find_tables")
+
+# A table whose cells are more than this share None (covered by a merged
+# cell) goes to camelot, which fills merged cells in properly
+_MAX_MERGED_CELL_SHARE = 0.1
+
+
+def _table_quality_issue(rows: List[list], bbox: tuple, vertical: List[tuple]) -> str:
+    """Why a PyMuPDF table should be re-read by camelot, or ``""`` if it looks right.
+
+    * ``too_small``: fewer than two rows or two columns;
+    * ``merged_cells``: a None cell in the header row, or more than
+      ``_MAX_MERGED_CELL_SHARE`` of all cells None (merged-cell artifacts);
+    * ``column_mismatch``: the column count is not one less than the number
+      of distinct vertical rulings (*vertical*) crossing the table's *bbox*.
+    """
+    col_count = max((len(row) for row in rows), default=0)
+    if len(rows) < 2 or col_count < 2:
+        return "too_small"
+
+    cells = [c for row in rows for c in row]
+    if any(c is None for c in rows[0]) or (
+        sum(c is None for c in cells) > _MAX_MERGED_CELL_SHARE * len(cells)
+    ):
+        return "merged_cells"
+
+    x0, y0, x1, y1 = bbox
+    tol = _MAX_RULING_WIDTH + 1
+    xs = sorted(
+        (sx0 + sx1) / 2
+        for sx0, sy0, sx1, sy1 in vertical
+        if x0 - tol <= (sx0 + sx1) / 2 <= x1 + tol and sy0 < y1 - tol and sy1 > y0 + tol
+    )
+    boundaries = sum(1 for i, x in enumerate(xs) if i == 0 or x - xs[i - 1] > tol)
+    if boundaries >= 2 and boundaries - 1 != col_count:
+        return "column_mismatch"
+    return ""
+
+
+def _extract_tables_with_pymupdf(doc, pages: List[int]) -> Tuple[List[dict], List[int]]:
+    """Read the tables on *pages* (1-based) with PyMuPDF's native table finder.
+
+    Much cheaper than camelot's lattice pass: it works on the vector
+    drawings instead of rasterising the page.  A page where the finder
+    finds nothing, or where any table fails :func:`_table_quality_issue`,
+    is left to camelot as a whole.
+
+    Returns ``(tables, pages_for_camelot)``.
+    """
+    started = time.monotonic()
+    tables: List[dict] = []
+    fallback: List[int] = []
+    reasons: dict = {}
+    for number in pages:
+        page_tables: List[dict] = []
+        issue = "no_tables"
+        try:
+            page = doc[number - 1]
+            found = page.find_tables(strategy="lines").tables
+            vertical = _ruling_segments(page.get_drawings())[1] if found else []
+            for tab in found:
+                rows = tab.extract()
+                issue = _table_quality_issue(rows, tuple(tab.bbox), vertical)
+                if issue:
+                    break
+                table = _table_from_rows(rows, number, "pymupdf")
+                if table:
+                    page_tables.append(table)
+        except Exception as e:
+            issue = f"error:{type(e).__name__}"
+        if issue:
+            fallback.append(number)
+            reasons[issue] = reasons.get(issue, 0) + 1
+        else:
+            tables.extend(page_tables)
+    detail = ", ".join(f"{n} {reason}" for reason, n in reasons.items())
+    log(
+        f"    PyMuPDF found {len(tables)} tables on {len(pages) - len(fallback)}/"
+        f"{len(pages)} pages in {time.monotonic() - started:.2f}s"
+        + (f"; {len(fallback)} pages left to camelot ({detail})" if fallback else "")
+    )
+    return tables, fallback
+
+
 # ---------------------------------------------------------------------------
 # Camelot-based PDF table extraction (handles merged cells correctly)
 # ---------------------------------------------------------------------------
 
-def _extract_tables_with_camelot(raw_bytes: bytes) -> List[dict]:
-    """Extract tables from PDF bytes using camelot-py lattice mode.
+def _extract_tables_with_camelot(
+    raw_bytes: bytes, path: str = "", pages: List[int] | None = None
+) -> List[dict]:
+    """Extract tables from a PDF using camelot-py lattice mode.
 
     Camelot's lattice mode detects tables by looking for cell borders/lines,
     which is ideal for HKEx regulatory forms (FF301, FF305, etc.) that use
     bordered tables with merged cells.
 
-    Returns a list of table dicts with headers, rows, accuracy, and Markdown.
-    Falls back to an empty list on any error.
+    Camelot reads from a file: *path* is used when the PDF is already on
+    disk, otherwise *raw_bytes* are written to a temp file first.
+
+    *pages* limits the lattice pass to those 1-based page numbers (from
+    :func:`_ruled_table_pages`); None scans every page.  All of them go to
+    one ``read_pdf`` call, which opens and splits the PDF once.
+
+    Returns a list of table dicts with headers, rows, accuracy, and Markdown
+    (``engine`` is ``camelot``).  Falls back to an empty list on any error.
     """
-    if not CAMELOT_AVAILABLE:
+    if not CAMELOT_AVAILABLE or pages == []:
         return []
 
-    # Camelot requires a file path, so write to a temp file
-    fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+    tmp_path = ""
     try:
-        os.write(fd, raw_bytes)
-        os.close(fd)
-
-        tables = camelot.read_pdf(tmp_path, pages="all", flavor="lattice")
-        log(f"    Camelot extracted {len(tables)} tables (lattice mode)")
+        if not path:
+            fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(raw_bytes)
+
+        page_spec = ",".join(str(p) for p in pages) if pages is not None else "all"
+        started = time.monotonic()
+        tables = camelot.read_pdf(path or tmp_path, pages=page_spec, flavor="lattice")
+        elapsed = time.monotonic() - started
+        per_page: dict = {}
+        for tbl in tables:
+            page = tbl.parsing_report.get("page", tbl.page)
+            per_page[page] = per_page.get(page, 0) + 1
+        busiest = ", ".join(
+            f"p{page} x{n}" for page, n in sorted(per_page.items(), key=lambda c: -c[1])[:5]
+        )
+        scanned = f"{len(pages)} pages" if pages is not None else "all pages"
+        cost = f", {elapsed / len(pages):.2f}s/page" if pages else ""
+        log(
+            f"    Camelot extracted {len(tables)} tables (lattice mode) from "
+            f"{scanned} in {elapsed:.1f}s{cost}" + (f" (most tables: {busiest})" if busiest else "")
+        )
 
         result: List[dict] = []
         for idx, tbl in enumerate(tables, start=1):
-            df = tbl.df
-            if df.empty or df.shape[0] < 2:
+            table = _table_from_rows(tbl.df.values.tolist(), int(tbl.page), "camelot")
+            if table is None:
                 continue
-
-            # First row is typically the header
-            raw_headers = [squash_ws(str(c)) for c in list(df.iloc[0])]
-
-            # Clean up empty headers — replace blanks with positional names
-            headers = []
-            for i, h in enumerate(raw_headers):
-                if h.strip():
-                    headers.append(h)
-                else:
-                    headers.append(f"Col{i + 1}")
-
-            # Data rows (skip header row)
-            data_rows: list = []
-            for row_idx in range(1, len(df)):
-                row = [squash_ws(str(c)) if str(c).strip() else "" for c in list(df.iloc[row_idx])]
-                # Skip rows that are completely empty
-                if any(cell.strip() for cell in row):
-                    data_rows.append(row)
-
-            if not data_rows:
-                continue
-
-            # Build Markdown table
-            md = _table_to_markdown(headers, data_rows)
-
-            result.append({
-                "tableIndex": idx,
-                "page": tbl.page,
-                "headers": headers,
-                "rowCount": len(data_rows),
-                "accuracy": round(tbl.accuracy, 1),
-                "markdown": md,
-            })
+            table["tableIndex"] = idx
+            table["accuracy"] = round(tbl.accuracy, 1)
+            result.append(table)
 
         return result
 
@@ -273,10 +471,11 @@ def _extract_tables_with_camelot(raw_bytes: bytes) -> List[dict]:
         log(f"    Camelot table extraction error: {e}")
         return []
     finally:
-        try:
-            os.unlink(tmp_path)
-        except OSError:
-            pass
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
 
 
 # ---------------------------------------------------------------------------
@@ -381,26 +580,48 @@ def _substitute_tables(md_text: str, camelot_tables: List[dict]) -> str:
 # PDF extraction (pymupdf4llm for text + camelot for tables)
 # ---------------------------------------------------------------------------
 
-def extract_pdf_content(raw_bytes: bytes) -> Tuple[str, list]:
+def extract_pdf_content(
+    raw_bytes: bytes, text_only: bool = False, path: str = ""
+) -> Tuple[str, list]:
     """Extract text and structured tables from PDF bytes as clean Markdown.
 
     Uses a two-pass approach:
     1. pymupdf4llm.to_markdown() for high-quality text extraction that
        preserves headings, bold/italic, and lists.
-    2. camelot-py (lattice mode) for accurate table extraction that
-       correctly handles merged cells in HKEx regulatory forms.
+    2. Tables, on the pages the ruling pre-scan flags: PyMuPDF's native
+       table finder first, then camelot-py (lattice mode) for the pages
+       whose fast result fails the quality check (merged-cell artifacts,
+       columns not matching the rulings).  Each table records its
+       ``engine``.  ``PDF_TABLE_ENGINE=camelot`` skips the fast path.
 
     Falls back gracefully: pymupdf4llm -> basic PyMuPDF for text,
-    camelot -> pymupdf4llm inline tables for table extraction.
+    PyMuPDF/camelot -> pymupdf4llm inline tables for table extraction.
+
+    With *text_only* both passes are skipped in favour of plain PyMuPDF
+    page text and no tables; this is the degraded mode used to retry
+    documents that exceeded the extraction sandbox limits.
+
+    When *path* is given, both passes read the PDF from that file (Phase 2
+    writes each document once to a RAM-backed file) and *raw_bytes* is
+    ignored, so the document is neither copied nor written out again.
     """
     if not PYMUPDF_AVAILABLE:
         return "", []
 
     try:
         # --- Pass 1: Text extraction via pymupdf4llm ---
-        doc = pymupdf.open(stream=raw_bytes, filetype="pdf")
-
-        if PYMUPDF4LLM_AVAILABLE:
+        if path:
+            doc = pymupdf.open(path, filetype="pdf")
+        else:
+            doc = pymupdf.open(stream=raw_bytes, filetype="pdf")
+        table_pages = None
+        fast_tables: List[dict] = []
+        if not text_only and (CAMELOT_AVAILABLE or FIND_TABLES_AVAILABLE):
+            table_pages = _ruled_table_pages(doc)
+            if table_pages and FIND_TABLES_AVAILABLE and PDF_TABLE_ENGINE != "camelot":
+                fast_tables, table_pages = _extract_tables_with_pymupdf(doc, table_pages)
+
+        if PYMUPDF4LLM_AVAILABLE and not text_only:
             md_text = pymupdf4llm.to_markdown(doc)
             doc.close()
             log(f"    pymupdf4llm extracted {len(md_text)} chars")
@@ -416,22 +637,30 @@ def extract_pdf_content(raw_bytes: bytes) -> Tuple[str, list]:
 
         # Post-process: clean headers/footers, normalize formatting
         md_text = _clean_markdown(md_text)
+        if text_only:
+            return md_text, []
 
-        # --- Pass 2: Table extraction via camelot (preferred) ---
-        tables_json = _extract_tables_with_camelot(raw_bytes)
+        # --- Pass 2: camelot for the pages the fast path left over ---
+        tables_json = fast_tables + _extract_tables_with_camelot(raw_bytes, path, table_pages)
 
         if tables_json:
-            log(f"    Using {len(tables_json)} camelot tables "
-                f"(accuracy: {', '.join(str(t['accuracy']) + '%' for t in tables_json)})")
-            # Substitute pymupdf4llm inline tables with cleaner camelot tables
+            tables_json.sort(key=lambda t: t.get("pageNumber") or 0)
+            for idx, table in enumerate(tables_json, start=1):
+                table["tableIndex"] = idx
+            n_camelot = sum(t["engine"] == "camelot" for t in tables_json)
+            log(f"    Using {len(tables_json)} tables "
+                f"({len(tables_json) - n_camelot} PyMuPDF, {n_camelot} camelot)")
+            # Substitute pymupdf4llm inline tables with the cleaner tables
             md_text = _substitute_tables(md_text, tables_json)
             md_text = _clean_markdown(md_text)  # Re-clean after substitution
-            log(f"    Substituted inline tables with camelot output")
+            log(f"    Substituted inline tables with table engine output")
         else:
             # Fallback: extract table metadata from pymupdf4llm Markdown
             tables_json = _extract_tables_from_md(md_text)
+            for table in tables_json:
+                table["engine"] = "pymupdf4llm"
             if tables_json:
-                log(f"    Camelot unavailable/empty, using {len(tables_json)} "
+                log(f"    Table engines unavailable/empty, using {len(tables_json)} "
                     f"pymupdf4llm inline tables (may have merged-cell artifacts)")
             else:
                 log(f"    No tables found in PDF")
@@ -670,14 +899,56 @@ def extract_excel_content(raw_bytes: bytes) -> Tuple[str, list]:
 # ---------------------------------------------------------------------------
 
 def extract_content_with_tables(
-    raw_bytes: bytes, doc_url: str
+    raw_bytes: bytes, doc_url: str, text_only: bool = False, path: str = ""
 ) -> Tuple[str, list]:
-    """Route to the appropriate extractor based on file extension."""
+    """Route to the appropriate extractor based on file extension.
+
+    *path* is an on-disk copy of a PDF for the PDF extractor to read
+    instead of *raw_bytes*.
+    """
     u = doc_url.lower().split("?")[0].split("#")[0]
     if u.endswith(".pdf"):
-        return extract_pdf_content(raw_bytes)
+        return extract_pdf_content(raw_bytes, text_only=text_only, path=path)
     if u.endswith(".htm") or u.endswith(".html"):
         return extract_html_content(raw_bytes)
     if u.endswith(".xlsx") or u.endswith(".xls"):
         return extract_excel_content(raw_bytes)
     return "", []
+
+
+# ---------------------------------------------------------------------------
+# Process-pool / sandbox entry point
+# ---------------------------------------------------------------------------
+
+def extract_file_with_tables(
+    path: str, doc_url: str, text_only: bool = False
+) -> Tuple[str, list]:
+    """Extract a document stored at *path*; used by every Phase 2 extraction mode.
+
+    Workers receive a file path (normally on a RAM-backed filesystem) rather
+    than pickled bytes, so only the path crosses the process boundary on the
+    way in and only ``(text, tables)`` on the way out.  PDFs are not read
+    into memory here: PyMuPDF and camelot both open *path* themselves.
+    Library noise on stderr is left alone: this also runs on the pipeline's
+    extractor threads, where swapping ``sys.stderr`` would hide every other
+    thread's output too.  Child processes call :func:`silence_stderr`.
+    """
+    raw_bytes = b""
+    if not doc_url.lower().split("?")[0].split("#")[0].endswith(".pdf"):
+        with open(path, "rb") as fh:
+            raw_bytes = fh.read()
+    return extract_content_with_tables(raw_bytes, doc_url, text_only=text_only, path=path)
+
+
+def silence_stderr() -> None:
+    """Point this process's stderr (fd 2) at ``/dev/null``.
+
+    For extraction child processes (sandbox children and pool workers)
+    only: at the file descriptor level it also silences the C libraries
+    under PyMuPDF and camelot, and it applies to the whole process.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 2)
+    finally:
+        os.close(devnull)
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from .config import COMPANY_ID_PATTERN, COMPANY_TABLE
-from .db import surreal_query
+from .db import surreal_query, surreal_query_many
 from .utils import escape_sql, extract_referenced_tickers, log
 
 # ---------------------------------------------------------------------------
@@ -85,8 +85,12 @@ def link_filings_to_companies(ticker_set: set | None = None) -> int:
     LINK_BATCH_SIZE = 50
     linked = 0
     errors = 0
-    for batch_start in range(0, len(valid_tickers), LINK_BATCH_SIZE):
-        batch = valid_tickers[batch_start : batch_start + LINK_BATCH_SIZE]
+    batches = [
+        valid_tickers[i : i + LINK_BATCH_SIZE]
+        for i in range(0, len(valid_tickers), LINK_BATCH_SIZE)
+    ]
+    batch_sqls: list[str] = []
+    for batch in batches:
         sql_parts: list[str] = []
         for ticker in batch:
             safe_ticker = escape_sql(ticker)
@@ -100,14 +104,17 @@ def link_filings_to_companies(ticker_set: set | None = None) -> int:
                 f"    RETURN NONE;\n"
                 f"}};\n"
             )
-        batch_sql = "\n".join(sql_parts)
-        result = surreal_query(batch_sql, timeout=300)
+        batch_sqls.append("\n".join(sql_parts))
+    # Batches are independent: over the WebSocket transport they are pipelined
+    results = surreal_query_many(batch_sqls, timeout=300)
+    processed = 0
+    for batch, result in zip(batches, results):
         if isinstance(result, dict) and result.get("error"):
-            log(f"  Batch error at offset {batch_start}: {result['error'][:200]}")
+            log(f"  Batch error at offset {processed}: {result['error'][:200]}")
             errors += len(batch)
         else:
             linked += len(batch)
-        processed = batch_start + len(batch)
+        processed += len(batch)
         if processed % 200 == 0 or processed == len(valid_tickers):
             log(
                 f"  Processed {processed}/{len(valid_tickers)} tickers "
@@ -211,8 +218,12 @@ def cross_reference_filings(ticker_set: set | None = None) -> int:
     XREF_BATCH_SIZE = 100
     created = 0
     errors = 0
-    for batch_start in range(0, len(valid_xrefs), XREF_BATCH_SIZE):
-        batch = valid_xrefs[batch_start : batch_start + XREF_BATCH_SIZE]
+    batches = [
+        valid_xrefs[i : i + XREF_BATCH_SIZE]
+        for i in range(0, len(valid_xrefs), XREF_BATCH_SIZE)
+    ]
+    batch_sqls: list[str] = []
+    for batch in batches:
         sql_parts: list[str] = []
         for filing_id, record_id in batch:
             sql_parts.append(
@@ -220,14 +231,16 @@ def cross_reference_filings(ticker_set: set | None = None) -> int:
                 f" SET createdAt = time::now(), source = 'title_extraction'"
                 f" RETURN NONE;"
             )
-        batch_sql = "\n".join(sql_parts)
-        result = surreal_query(batch_sql, timeout=120)
+        batch_sqls.append("\n".join(sql_parts))
+    results = surreal_query_many(batch_sqls, timeout=120)
+    processed = 0
+    for batch, result in zip(batches, results):
         if isinstance(result, dict) and result.get("error"):
-            log(f"  Batch error at offset {batch_start}: {result['error'][:200]}")
+            log(f"  Batch error at offset {processed}: {result['error'][:200]}")
             errors += len(batch)
         else:
             created += len(batch)
-        processed = batch_start + len(batch)
+        processed += len(batch)
         if processed % 500 == 0 or processed == len(valid_xrefs):
             log(
                 f"  Processed {processed}/{len(valid_xrefs)} cross-refs "
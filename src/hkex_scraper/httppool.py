@@ -0,0 +1,236 @@
+"""Thread-safe keep-alive HTTP connection pool (stdlib ``http.client`` only).
+
+``urllib.request`` opens a new TCP (and TLS) connection for every call.  The
+scraper talks to one SurrealDB host thousands of times per run, so
+connections are kept open and reused across threads instead.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import http.client
+import queue
+import threading
+import time
+import urllib.parse
+from typing import Dict, Iterator, Tuple
+
+# Errors that mean a reused keep-alive connection was closed by the server
+# while idle; the request is retried once on a fresh connection.
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class HttpError(Exception):
+    """Non-2xx response; ``status``, ``body`` and ``headers`` (lower-case names)."""
+
+    def __init__(self, status: int, body: bytes, headers: Dict[str, str] | None = None) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+class HttpConnectionPool:
+    """Pool of persistent connections to a single ``http(s)://host:port``.
+
+    At most *size* requests are in flight at once; idle connections are
+    kept for reuse.  ``stats()`` reports request counts and latency.
+    """
+
+    def __init__(self, base_url: str, size: int = 8, timeout: float = 120) -> None:
+        parts = urllib.parse.urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "errors": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+            "retries": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "latency_total": 0.0,
+            "latency_max": 0.0,
+        }
+
+    # --- connections -------------------------------------------------------
+
+    def _new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        cls = (
+            http.client.HTTPSConnection if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        with self._lock:
+            self._counters["connections_opened"] += 1
+        return cls(self.host, self.port, timeout=timeout)
+
+    def _checkout(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection(timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # --- requests ----------------------------------------------------------
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes | None = None,
+        headers: Dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> bytes:
+        """Send a request and return the response body.
+
+        Raises :class:`HttpError` for non-2xx responses and the underlying
+        socket/``http.client`` exception on transport failure.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        self._slots.acquire()
+        try:
+            conn, reused = self._checkout(timeout)
+            try:
+                status, data, keep = self._send(conn, method, path, body, headers)
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                with self._lock:
+                    self._counters["retries"] += 1
+                conn, reused = self._new_connection(timeout), False
+                try:
+                    status, data, keep = self._send(conn, method, path, body, headers)
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            if keep:
+                self._idle.put(conn)
+            else:
+                conn.close()
+        except Exception:
+            self._record(started, len(body or b""), 0, reused=False, error=True)
+            raise
+        finally:
+            self._slots.release()
+        self._record(started, len(body or b""), len(data), reused=reused,
+                     error=not 200 <= status < 300)
+        if not 200 <= status < 300:
+            raise HttpError(status, data)
+        return data
+
+    @contextlib.contextmanager
+    def stream(
+        self,
+        method: str,
+        path: str,
+        headers: Dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> Iterator[Tuple[http.client.HTTPResponse, dict]]:
+        """Send a request and yield ``(response, timings)`` to read the body incrementally.
+
+        The response is yielded whatever its status.  The connection goes
+        back to the pool only if the body was read to the end; otherwise it
+        is closed.  *timings* holds ``connect`` (0 on a reused connection)
+        and ``ttfb`` (request sent to headers received) when yielded, and
+        ``transfer`` (time spent in the ``with`` body) afterwards.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        timings = {"connect": 0.0, "ttfb": 0.0, "transfer": 0.0}
+        self._slots.acquire()
+        conn = None
+        reused = False
+        try:
+            conn, reused = self._checkout(timeout)
+            try:
+                resp = self._open(conn, method, path, headers, timings)
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                with self._lock:
+                    self._counters["retries"] += 1
+                conn, reused = self._new_connection(timeout), False
+                resp = self._open(conn, method, path, headers, timings)
+            body_started = time.monotonic()
+            try:
+                yield resp, timings
+            finally:
+                timings["transfer"] = time.monotonic() - body_started
+            if resp.isclosed() and not resp.will_close:
+                self._idle.put(conn)
+                conn = None
+        except Exception:
+            self._record(started, 0, 0, reused=False, error=True)
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
+            self._slots.release()
+        self._record(started, 0, 0, reused=reused, error=not 200 <= resp.status < 300)
+
+    def _open(self, conn, method, path, headers, timings: dict) -> http.client.HTTPResponse:
+        if conn.sock is None:
+            connect_started = time.monotonic()
+            conn.connect()
+            timings["connect"] = time.monotonic() - connect_started
+        sent = time.monotonic()
+        conn.request(method, self.base_path + path, headers=headers or {})
+        resp = conn.getresponse()
+        timings["ttfb"] = time.monotonic() - sent
+        return resp
+
+    def _send(self, conn, method, path, body, headers) -> Tuple[int, bytes, bool]:
+        conn.request(method, self.base_path + path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        data = resp.read()
+        return resp.status, data, not resp.will_close
+
+    def _record(self, started: float, sent: int, received: int, reused: bool, error: bool) -> None:
+        elapsed = time.monotonic() - started
+        with self._lock:
+            c = self._counters
+            c["requests"] += 1
+            c["errors"] += int(error)
+            c["connections_reused"] += int(reused)
+            c["bytes_sent"] += sent
+            c["bytes_received"] += received
+            c["latency_total"] += elapsed
+            c["latency_max"] = max(c["latency_max"], elapsed)
+
+    def stats(self) -> dict:
+        """Return a copy of the counters plus ``latency_avg`` (seconds)."""
+        with self._lock:
+            snap = dict(self._counters)
+        snap["latency_avg"] = snap["latency_total"] / snap["requests"] if snap["requests"] else 0.0
+        snap["idle_connections"] = self._idle.qsize()
+        return snap
@@ -6,8 +6,16 @@ import argparse
 import sys
 from datetime import datetime
 
-from .config import LOG_DIR, MAX_DOWNLOAD_WORKERS, SURREAL_ENDPOINT, SURREAL_PASS
-from .db import initialize_schema
+from .config import (
+    EXTRACT_TIMEOUT_SECONDS,
+    LOG_DIR,
+    MAX_CHUNK_WORKERS,
+    MAX_DOWNLOAD_WORKERS,
+    MAX_EXTRACT_WORKERS,
+    SURREAL_ENDPOINT,
+    SURREAL_PASS,
+)
+from .db import format_http_stats, get_http_stats, initialize_schema
 from .extractor import check_dependencies
 from .graph import cross_reference_filings, link_filings_to_companies
 from .pipeline import run_phase1, run_phase2
@@ -53,7 +61,7 @@ def _build_parser() -> argparse.ArgumentParser:
         type=str,
         default="",
         metavar="DD/MM/YYYY",
-        help="Start date for scraping (default: ~2 months ago)",
+        help="Start date for scraping (default: last watermark, or ~2 months ago)",
     )
     parser.add_argument(
         "--to-date",
@@ -69,6 +77,67 @@ def _build_parser() -> argparse.ArgumentParser:
         metavar="N",
         help="Limit the number of filings to process (0 = unlimited)",
     )
+    parser.add_argument(
+        "--ignore-checkpoints",
+        action="store_true",
+        help=(
+            "Do not resume from scrape_state: re-fetch completed chunks and use the "
+            "fixed ~2 month window instead of the last watermark"
+        ),
+    )
+    parser.add_argument(
+        "--refresh-metadata",
+        action="store_true",
+        help="Re-write every fetched filing, even ones already stored unchanged",
+    )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=MAX_CHUNK_WORKERS,
+        metavar="N",
+        help=f"Parallel HKEx search sessions for Phase 1 (default: {MAX_CHUNK_WORKERS})",
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=MAX_EXTRACT_WORKERS,
+        metavar="N",
+        help=(
+            "Documents extracted at once in Phase 2: sandbox children while "
+            "--extract-timeout > 0, otherwise a process pool "
+            f"(default: {MAX_EXTRACT_WORKERS}; 0 = one at a time / in-process)"
+        ),
+    )
+    parser.add_argument(
+        "--extract-timeout",
+        type=float,
+        default=EXTRACT_TIMEOUT_SECONDS,
+        metavar="SECONDS",
+        help=(
+            "Kill a document's extraction process after this many seconds "
+            f"(default: {EXTRACT_TIMEOUT_SECONDS:.0f}; 0 = no sandbox, use the "
+            "--extract-workers process pool)"
+        ),
+    )
+    parser.add_argument(
+        "--async-downloads",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Download Phase 2 documents on one asyncio event loop with up to N "
+            "transfers in flight, instead of MAX_DOWNLOAD_WORKERS threads; the HKEx "
+            "limiter's window opens up to N as responses stay healthy (default: 0 = threads)"
+        ),
+    )
+    parser.add_argument(
+        "--count-backlog",
+        action="store_true",
+        help=(
+            "Count unprocessed filings before Phase 2 (full scan) to report progress "
+            "as a percentage"
+        ),
+    )
     parser.add_argument(
         "--metadata-only",
         action="store_true",
@@ -117,6 +186,10 @@ def main() -> None:
                 batch_size=50,
                 max_workers=MAX_DOWNLOAD_WORKERS,
                 limit=args.limit,
+                extract_workers=args.extract_workers,
+                extract_timeout=args.extract_timeout,
+                count_backlog=args.count_backlog,
+                async_downloads=args.async_downloads,
             )
         elif args.link_only:
             log("=" * 60)
@@ -135,6 +208,9 @@ def main() -> None:
                 date_from=args.from_date,
                 date_to=args.to_date,
                 full_history=args.full_history,
+                max_workers=args.chunk_workers,
+                resume=not args.ignore_checkpoints,
+                refresh_metadata=args.refresh_metadata,
             )
             if not args.dry_run and total > 0:
                 log("")
@@ -145,6 +221,9 @@ def main() -> None:
                 log(f"Created {xref_count} cross-reference edges")
                 log("")
 
+            # Phase 2 runs even without new filings: earlier transient
+            # failures may be due for a retry
+            if not args.dry_run:
                 # Phase 2: download documents (default unless --metadata-only)
                 if not args.metadata_only:
                     log("Proceeding to Phase 2: Document download & text extraction...")
@@ -153,6 +232,10 @@ def main() -> None:
                         batch_size=50,
                         max_workers=MAX_DOWNLOAD_WORKERS,
                         limit=args.limit,
+                        extract_workers=args.extract_workers,
+                        extract_timeout=args.extract_timeout,
+                        count_backlog=args.count_backlog,
+                        async_downloads=args.async_downloads,
                     )
                 else:
                     log("Skipping document downloads (--metadata-only)")
@@ -162,6 +245,7 @@ def main() -> None:
         log("=" * 60)
         log("COMPLETE")
         log("=" * 60)
+        log(f"SurrealDB HTTP: {format_http_stats(get_http_stats())}")
         log(f"Log: {log_path}")
     finally:
         close_log_file()
@@ -2,20 +2,80 @@
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
-import io
 import json
-import sys
-import urllib.error
-import urllib.request
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
-from typing import List, Tuple
-
-from .api import REQUESTS_AVAILABLE, fetch_chunk_via_api, generate_monthly_chunks
-from .config import HKEX_BASE_URL, MAX_DOWNLOAD_SIZE, MAX_DOWNLOAD_WORKERS, MAX_RPC_BODY_SIZE, MAX_SQL_BODY_SIZE
-from .db import surreal_query, surreal_rpc, upsert_batch_with_retry
-from .extractor import extract_content_with_tables
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+from .aiodownloader import AsyncDocumentFetcher
+from .api import REQUESTS_AVAILABLE, fetch_chunk_adaptive, generate_monthly_chunks, new_session
+from .config import (
+    EXTRACT_DEGRADED_RETRY,
+    EXTRACT_TIMEOUT_SECONDS,
+    EXTRACT_TMP_DIR,
+    HKEX_BASE_URL,
+    MAX_CHUNK_WORKERS,
+    MAX_DOWNLOAD_WORKERS,
+    MAX_EXTRACT_WORKERS,
+    MAX_RPC_BODY_SIZE,
+    MAX_SQL_BODY_SIZE,
+    PHASE2_LEASE_SECONDS,
+    PHASE2_MAX_ATTEMPTS,
+    PHASE2_MEMORY_BUDGET_MB,
+    PHASE2_REPORT_SECONDS,
+    PHASE2_RETRY_BASE_SECONDS,
+    PHASE2_RETRY_MAX_SECONDS,
+    PHASE2_SPILL_DIR,
+    PHASE2_SPILL_MB,
+    PHASE2_WORKER_ID,
+)
+from .db import (
+    rpc_rows_with_retry,
+    surreal_query,
+    surreal_rpc,
+    upsert_batch_with_retry,
+)
+from .dbwriter import CoalescingWriter
+from .downloader import DocumentDownloader, DownloadAborted, format_download_stats
+from .extractor import extract_file_with_tables, silence_stderr
+from .httppool import HttpError
+from .ratelimit import HKEX_LIMITER, LimiterSlot, parse_retry_after
+from .sandbox import LIMIT_REASONS, read_rss_bytes, run_sandboxed_extraction
+from .stages import (
+    DONE,
+    BudgetHold,
+    ByteBudget,
+    StageStats,
+    format_memory_report,
+    format_stage_report,
+    get_until,
+    peak_rss_bytes,
+    put_until,
+)
+from .state import (
+    KIND_FULL_HISTORY,
+    KIND_RANGE,
+    KIND_ROUTINE,
+    STATUS_COMPLETE,
+    STATUS_FAILED,
+    STATUS_PARTIAL,
+    is_window_covered,
+    load_completed_windows,
+    load_incomplete_windows,
+    load_watermark,
+    record_window,
+)
 from .utils import (
     classify_filing,
     escape_sql,
@@ -36,154 +96,262 @@ SUPPORTED_EXTENSIONS = (".pdf", ".htm", ".html", ".xlsx", ".xls", ".doc", ".docx
 # Document download helpers
 # ---------------------------------------------------------------------------
 
-def _download_document(url: str, filing_id: str) -> Tuple[bytes, int, str]:
-    """Download a document if <= MAX_DOWNLOAD_SIZE.
+_downloader: DocumentDownloader | None = None
+_downloader_lock = threading.Lock()
 
-    Returns ``(raw_bytes, size_bytes, skip_reason)``.
-    """
+
+def _get_downloader() -> DocumentDownloader:
+    """Shared pooled downloader, created on first use."""
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = DocumentDownloader()
+        return _downloader
+
+
+def _download_skip_reason(url: str) -> str:
+    """Reason not to download *url* at all, or ``""``."""
     if not url:
-        return b"", 0, "no_url"
+        return "no_url"
     u = url.lower().split("?")[0].split("#")[0]
     if not any(u.endswith(ext) for ext in SUPPORTED_EXTENSIONS):
-        return b"", 0, "unsupported_type"
+        return "unsupported_type"
+    return ""
+
+
+def _observe_http_error(slot: LimiterSlot, e: HttpError) -> None:
+    """Report an HTTP error response to the HKEx limiter."""
+    slot.observe(e.status, retry_after=parse_retry_after(e.headers.get("retry-after")))
+
+
+def _download_error_reason(filing_id: str, e: Exception) -> str:
+    """Log a failed download and return its ``documentStatusReason``."""
+    if isinstance(e, HttpError):
+        log(f"  Download error for {filing_id}: HTTP {e.status}")
+        return f"http_{e.status}"
+    log(f"  Download error for {filing_id}: {type(e).__name__}: {e}")
+    return f"error:{type(e).__name__}"
+
+
+def _download_document(url: str, filing_id: str, hold=None) -> Tuple[bytes, int, str, str]:
+    """Download a document if <= MAX_DOWNLOAD_SIZE.
+
+    Returns ``(raw_bytes, size_bytes, md5_hex, skip_reason)``.  Connections
+    to the document host are pooled and kept alive between downloads.  The
+    download waits for room in *hold*'s budget (a
+    :class:`~hkex_scraper.stages.BudgetHold`) before it takes a limiter slot
+    and a connection, and its body is charged to *hold* as it is read.
+    """
+    skip_reason = _download_skip_reason(url)
+    if skip_reason:
+        return b"", 0, "", skip_reason
     try:
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Accept": (
-                    "application/pdf,text/html,"
-                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet,"
-                    "*/*;q=0.8"
-                ),
-            },
-        )
-        with urllib.request.urlopen(req, timeout=60) as response:
-            content_length = response.headers.get("Content-Length")
-            if content_length and int(content_length) > MAX_DOWNLOAD_SIZE:
-                return b"", 0, "too_large"
-            content = response.read()
-            if len(content) > MAX_DOWNLOAD_SIZE:
-                return b"", 0, "too_large"
-            return content, len(content), ""
-    except urllib.error.HTTPError as e:
-        log(f"  Download error for {filing_id}: HTTP {e.code}")
-        return b"", 0, f"http_{e.code}"
+        if hold is not None and not hold.wait_for_room():
+            raise DownloadAborted(url)
+        with HKEX_LIMITER.slot() as slot:
+            try:
+                content, doc_hash, skip_reason, timings = _get_downloader().fetch(url, hold)
+            except HttpError as e:
+                _observe_http_error(slot, e)
+                raise
+            slot.observe(200, timings["ttfb"])
+        return content, len(content), doc_hash, skip_reason
     except Exception as e:
-        log(f"  Download error for {filing_id}: {type(e).__name__}: {e}")
-        return b"", 0, f"error:{type(e).__name__}"
+        return b"", 0, "", _download_error_reason(filing_id, e)
 
 
-def _download_worker(args: Tuple[str, str]) -> Tuple[str, str, bytes, int, str]:
+def _download_worker(
+    args: Tuple[str, str], hold=None
+) -> Tuple[str, str, bytes, int, str, str]:
     """Thread-safe wrapper for ``_download_document``."""
     fid, url = args
-    raw_bytes, size_bytes, skip_reason = _download_document(url, fid)
-    return fid, url, raw_bytes, size_bytes, skip_reason
+    raw_bytes, size_bytes, doc_hash, skip_reason = _download_document(url, fid, hold)
+    return fid, url, raw_bytes, size_bytes, doc_hash, skip_reason
 
 
 # ---------------------------------------------------------------------------
 # Save helpers
 # ---------------------------------------------------------------------------
 
-def _save_filings_batch_metadata(filings: list, dry_run: bool = False) -> int:
-    """Save filing metadata in batches. Phase 1 operation."""
-    if not filings:
+# Phase 1 bulk upsert: one parameterised /rpc query per batch.  Values travel
+# as native JSON in $rows, so nothing is SQL-escaped.  Absent keys read as
+# NONE (SCHEMAFULL rejects JSON null for option<T> fields over /rpc).
+METADATA_UPSERT_SQL = """FOR $r IN $rows {
+    UPSERT type::thing('exchange_filing', $r.rid) SET
+        filingId          = $r.filingId,
+        companyTicker     = $r.companyTicker,
+        stockCode         = $r.stockCode,
+        stockName         = $r.stockName,
+        exchange          = 'HK',
+        filingType        = $r.filingType,
+        filingSubtype     = $r.filingSubtype,
+        filingCategory    = $r.filingCategory,
+        title             = $r.title,
+        filingDate        = IF $r.filingDate THEN <datetime> $r.filingDate ELSE NONE END,
+        documentUrl       = $r.documentUrl,
+        referencedTickers = $r.referencedTickers,
+        source            = 'HKEx',
+        updatedAt         = time::now()
+    RETURN NONE;
+};"""
+
+# Bytes reserved for the JSON-RPC envelope and the SQL template
+_METADATA_RPC_OVERHEAD = 4096
+
+
+def _filing_to_row(f: dict) -> dict:
+    """Transform a parsed filing into an ``exchange_filing`` row for ``$rows``."""
+    fid = _filing_id(f)
+    title_str = f.get("title", "")
+    ft, fs = classify_filing(title_str)
+    filing_date = ""
+    date_str = f.get("date", "")
+    if date_str:
+        try:
+            dd, mm, yyyy = date_str.split("/")
+            filing_date = f"{yyyy}-{mm}-{dd}T00:00:00Z"
+        except Exception:
+            filing_date = ""
+
+    raw_code = str(f["stockCode"]).lstrip("0") or "0"
+
+    # Detect derivative issuer filings (empty stock code + matching title)
+    filing_category = "LISTED_COMPANY"  # default
+    if (not f["stockCode"].strip()) and is_derivative_issuer_filing(title_str):
+        issuer_short = extract_issuer_name(title_str)
+        ticker = f"{issuer_short}_DERIV.HK"
+        filing_category = "DERIVATIVE_ISSUER"
+    elif not f["stockCode"].strip():
+        ticker = "UNKNOWN.HK"
+        filing_category = "UNKNOWN"
+    else:
+        ticker = f"{raw_code.zfill(4)}.HK"
+
+    row = {
+        # All-digit IDs parse as integer record IDs in SurrealQL
+        # (exchange_filing:123), so keep them numeric to address the same record.
+        "rid": int(fid) if fid.isdigit() else fid,
+        "filingId": fid,
+        "companyTicker": ticker,
+        "stockCode": str(f["stockCode"]),
+        "stockName": squash_ws(f.get("stockName", "")),
+        "filingType": ft,
+        "filingSubtype": fs,
+        "filingCategory": filing_category,
+        "title": squash_ws(title_str),
+        "documentUrl": f.get("link", ""),
+        "referencedTickers": extract_referenced_tickers(title_str, str(f["stockCode"])),
+    }
+    if filing_date:
+        row["filingDate"] = filing_date
+    return row
+
+
+def _filing_upsert_sql(row: dict) -> str:
+    """Build the ``/sql`` UPSERT statement for one row (fallback path)."""
+    filing_date_expr = "NULL"
+    if row.get("filingDate"):
+        filing_date_expr = f"d'{row['filingDate'][:10]}'"
+    return (
+        "UPSERT exchange_filing:{fid} SET\n"
+        "  filingId       = '{fid}',\n"
+        "  companyTicker  = '{ticker}',\n"
+        "  stockCode      = '{stockCode}',\n"
+        "  stockName      = '{stockName}',\n"
+        "  exchange       = 'HK',\n"
+        "  filingType     = '{ft}',\n"
+        "  filingSubtype  = '{fs}',\n"
+        "  filingCategory = '{filingCategory}',\n"
+        "  title          = '{title}',\n"
+        "  filingDate     = {filingDateExpr},\n"
+        "  documentUrl    = '{docUrl}',\n"
+        "  referencedTickers = {refTickers},\n"
+        "  source         = 'HKEx',\n"
+        "  updatedAt      = time::now()\n"
+        "RETURN NONE;\n".format(
+            fid=row["filingId"],
+            ticker=escape_sql(row["companyTicker"]),
+            stockCode=escape_sql(row["stockCode"]),
+            stockName=escape_sql(row.get("stockName", "")),
+            ft=row["filingType"],
+            fs=escape_sql(row["filingSubtype"]),
+            filingCategory=row["filingCategory"],
+            title=escape_sql(row.get("title", "")),
+            filingDateExpr=filing_date_expr,
+            docUrl=escape_sql(row.get("documentUrl", "")),
+            refTickers=json.dumps(row.get("referencedTickers", [])),
+        )
+    )
+
+
+def _batched_by_bytes(rows, max_bytes: int) -> Iterator[list]:
+    """Group rows into lists whose JSON encoding stays under *max_bytes*."""
+    batch: list = []
+    batch_bytes = 2  # '[]'
+    for row in rows:
+        row_bytes = len(json.dumps(row, ensure_ascii=False).encode("utf-8")) + 1
+        if batch and batch_bytes + row_bytes > max_bytes:
+            yield batch
+            batch, batch_bytes = [], 2
+        batch.append(row)
+        batch_bytes += row_bytes
+    if batch:
+        yield batch
+
+
+def _save_metadata_rows(rows: list, dry_run: bool = False) -> int:
+    """UPSERT a batch of rows with one ``/rpc`` query.
+
+    Failing batches are split in half and retried; single rows that still
+    fail over ``/rpc`` are retried once through the escaped ``/sql`` path.
+    """
+    if not rows:
         return 0
     if dry_run:
-        log(f" [DRY-RUN] Would save {len(filings)} filings (metadata)")
-        return len(filings)
-
-    sql_statements: List[str] = []
-    for f in filings:
-        fid = hashlib.md5(
-            f"{f['stockCode']}{f['date']}{f.get('title', '')}".encode()
-        ).hexdigest()[:16]
-
-        title_str = f.get("title", "")
-        ft, fs = classify_filing(title_str)
-        date_str = f.get("date", "")
-        filing_date_expr = "NULL"
-        if date_str:
-            try:
-                dd, mm, yyyy = date_str.split("/")
-                filing_date_expr = f"d'{yyyy}-{mm}-{dd}'"
-            except Exception:
-                filing_date_expr = "NULL"
-
-        raw_code = str(f["stockCode"]).lstrip("0") or "0"
-
-        # Detect derivative issuer filings (empty stock code + matching title)
-        filing_category = "LISTED_COMPANY"  # default
-        if (not f["stockCode"].strip()) and is_derivative_issuer_filing(title_str):
-            issuer_short = extract_issuer_name(title_str)
-            ticker = f"{issuer_short}_DERIV.HK"
-            filing_category = "DERIVATIVE_ISSUER"
-        elif not f["stockCode"].strip():
-            ticker = "UNKNOWN.HK"
-            filing_category = "UNKNOWN"
-        else:
-            ticker = f"{raw_code.zfill(4)}.HK"
-
-        doc_url = f.get("link", "")
-
-        ref_tickers = extract_referenced_tickers(title_str, str(f["stockCode"]))
-        ref_tickers_json = json.dumps(ref_tickers)
-
-        sql_statements.append(
-            "UPSERT exchange_filing:{fid} SET\n"
-            "  filingId       = '{fid}',\n"
-            "  companyTicker  = '{ticker}',\n"
-            "  stockCode      = '{stockCode}',\n"
-            "  stockName      = '{stockName}',\n"
-            "  exchange       = 'HK',\n"
-            "  filingType     = '{ft}',\n"
-            "  filingSubtype  = '{fs}',\n"
-            "  filingCategory = '{filingCategory}',\n"
-            "  title          = '{title}',\n"
-            "  filingDate     = {filingDateExpr},\n"
-            "  documentUrl    = '{docUrl}',\n"
-            "  referencedTickers = {refTickers},\n"
-            "  source         = 'HKEx',\n"
-            "  updatedAt      = time::now()\n"
-            "RETURN NONE;\n".format(
-                fid=fid,
-                ticker=ticker,
-                stockCode=escape_sql(f["stockCode"]),
-                stockName=escape_sql(squash_ws(f.get("stockName", ""))),
-                ft=ft,
-                fs=escape_sql(fs),
-                filingCategory=filing_category,
-                title=escape_sql(squash_ws(title_str)),
-                filingDateExpr=filing_date_expr,
-                docUrl=escape_sql(doc_url),
-                refTickers=ref_tickers_json,
-            )
+        log(f" [DRY-RUN] Would save {len(rows)} filings (metadata)")
+        return len(rows)
+
+    saved_count, failed_rows = rpc_rows_with_retry(METADATA_UPSERT_SQL, rows)
+    if failed_rows:
+        log(f"  Retrying {len(failed_rows)} filings via /sql after /rpc errors")
+        saved_count += upsert_batch_with_retry(
+            [_filing_upsert_sql(r) for r in failed_rows]
         )
-
-    saved_count = upsert_batch_with_retry(sql_statements)
-    if saved_count < len(sql_statements):
-        log(f"  Saved {saved_count} / {len(sql_statements)} filings after retries")
+    if saved_count < len(rows):
+        log(f"  Saved {saved_count} / {len(rows)} filings after retries")
     return saved_count
 
 
-def _save_document_to_filing(
+def _save_filings_batch_metadata(filings, dry_run: bool = False) -> int:
+    """Save filing metadata as parameterised bulk upserts. Phase 1 operation.
+
+    Accepts any iterable of parsed filings; rows are sent in batches sized
+    to the ``/rpc`` body budget rather than a fixed count.
+    """
+    saved = 0
+    budget = MAX_RPC_BODY_SIZE - _METADATA_RPC_OVERHEAD
+    for batch in _batched_by_bytes((_filing_to_row(f) for f in filings), budget):
+        saved += _save_metadata_rows(batch, dry_run)
+    return saved
+
+
+def _prepare_document_save(
     fid: str,
     raw_bytes: bytes,
     size_bytes: int,
     doc_url: str,
     extracted_text: str = "",
     tables_json: list | None = None,
-) -> Tuple[bool, str]:
-    """Save extracted text + metadata to an existing filing record.
-
-    Uses the SurrealDB ``/rpc`` endpoint with parameterised queries.  This
-    gives us a 4 MiB body limit (vs 1 MiB for ``/sql``) AND eliminates SQL
-    string escaping overhead entirely — document text and tables are passed
-    as native JSON values in the RPC vars, not embedded inside a SQL string
-    literal.
+    status_reason: str = "",
+    doc_hash: str = "",
+) -> dict:
+    """Build the ``$vars`` for a document save, pre-truncated to the RPC body limit.
 
-    For the rare case where a document still exceeds the 4 MiB RPC limit,
-    we fall back to pre-truncation.
+    The /rpc endpoint has a 4 MiB body limit.  Text and tables are passed as
+    native JSON values, so the payload size is estimated from their JSON
+    encoding and the text (then, if needed, the tables) is cut to fit.
+    *doc_hash* is the MD5 computed while downloading; it is only recomputed
+    from *raw_bytes* when not given.
     """
     ext = doc_url.lower().split("?")[0].split("#")[0]
     if ext.endswith(".pdf"):
@@ -197,7 +365,8 @@ def _save_document_to_filing(
     else:
         doc_type = "unknown"
 
-    doc_hash = hashlib.md5(raw_bytes).hexdigest() if raw_bytes else ""
+    if not doc_hash and raw_bytes:
+        doc_hash = hashlib.md5(raw_bytes).hexdigest()
     # Sanitise tables: strip None values from each table dict.
     # SurrealDB SCHEMAFULL rejects JSON null for option<T> fields via /rpc,
     # but accepts the field being omitted entirely.
@@ -265,32 +434,10 @@ def _save_document_to_filing(
                 f"tables {len(tables_json or [])} -> {tables_count}"
             )
 
-    # --- Build the parameterised RPC query ---
-    # The SQL uses $variables which are bound to the vars dict.
-    # This means text and tables are NEVER embedded in the SQL string.
-    # The filing ID is embedded directly in the SQL (it's small and safe).
-    # Only the large payloads (text, tables) are parameterised via $vars.
-    # Note: type::thing('exchange_filing', $fid) requires $fid to be an int,
-    # but our IDs are numeric strings — so we use the direct record syntax.
-    sql_template = (
-        f"UPDATE exchange_filing:{fid} SET "
-        "documentSize = $doc_size, "
-        "documentType = $doc_type, "
-        "documentHash = $doc_hash, "
-        "documentText = $doc_text, "
-        "documentTextLen = $doc_text_len, "
-        "documentTables = $doc_tables, "
-        "documentTableCnt = $doc_table_cnt, "
-        "documentStatus = $doc_status, "
-        "documentStatusReason = $doc_reason, "
-        "updatedAt = time::now() "
-        "RETURN NONE;"
-    )
-
     status = "processed"
-    reason = f"truncated_from_{original_text_len}" if was_truncated else ""
+    reason = f"truncated_from_{original_text_len}" if was_truncated else status_reason
 
-    vars_dict = {
+    return {
         "doc_size": size_bytes,
         "doc_type": doc_type,
         "doc_hash": doc_hash,
@@ -302,6 +449,69 @@ def _save_document_to_filing(
         "doc_reason": reason,
     }
 
+
+def _document_update_sql(fid: str, var_prefix: str = "") -> str:
+    """``UPDATE`` for a document save, reading its values from ``$vars``.
+
+    The SQL uses $variables which are bound to the vars dict, so text and
+    tables are NEVER embedded in the SQL string.  *var_prefix* is prepended
+    to every variable name so several saves can share one request.  The
+    filing ID is embedded directly (it's small and safe):
+    type::thing('exchange_filing', $fid) requires $fid to be an int, but our
+    IDs are numeric strings — so we use the direct record syntax.
+    """
+    v = "$" + var_prefix
+    return (
+        f"UPDATE exchange_filing:{fid} SET "
+        f"documentSize = {v}doc_size, "
+        f"documentType = {v}doc_type, "
+        f"documentHash = {v}doc_hash, "
+        f"documentText = {v}doc_text, "
+        f"documentTextLen = {v}doc_text_len, "
+        f"documentTables = {v}doc_tables, "
+        f"documentTableCnt = {v}doc_table_cnt, "
+        f"documentStatus = {v}doc_status, "
+        f"documentStatusReason = {v}doc_reason, "
+        f"updatedAt = time::now() "
+        f"RETURN NONE;"
+    )
+
+
+def _save_document_to_filing(
+    fid: str,
+    raw_bytes: bytes,
+    size_bytes: int,
+    doc_url: str,
+    extracted_text: str = "",
+    tables_json: list | None = None,
+    status_reason: str = "",
+    doc_hash: str = "",
+) -> Tuple[bool, str]:
+    """Save extracted text + metadata to an existing filing record.
+
+    *status_reason* is stored as ``documentStatusReason`` unless the text
+    has to be truncated (e.g. ``text_only_after_extract_timeout`` for a
+    document extracted in degraded mode).
+
+    Uses the SurrealDB ``/rpc`` endpoint with parameterised queries.  This
+    gives us a 4 MiB body limit (vs 1 MiB for ``/sql``) AND eliminates SQL
+    string escaping overhead entirely — document text and tables are passed
+    as native JSON values in the RPC vars, not embedded inside a SQL string
+    literal.
+
+    For the rare case where a document still exceeds the 4 MiB RPC limit,
+    we fall back to pre-truncation.
+    """
+    vars_dict = _prepare_document_save(
+        fid, raw_bytes, size_bytes, doc_url, extracted_text, tables_json, status_reason,
+        doc_hash,
+    )
+    sql_template = _document_update_sql(fid)
+    doc_type, doc_hash = vars_dict["doc_type"], vars_dict["doc_hash"]
+    text_to_save, tables_list = vars_dict["doc_text"], vars_dict["doc_tables"]
+    status, reason = vars_dict["doc_status"], vars_dict["doc_reason"]
+    original_text_len = len(extracted_text)
+
     def _is_body_too_large(result: dict) -> bool:
         """Detect body-too-large errors including connection resets."""
         if not isinstance(result, dict):
@@ -451,136 +661,395 @@ def _save_document_to_filing(
     return False, error_code
 
 
-def _mark_filing_status(fid: str, status: str, reason: str = "") -> bool:
-    """Mark a filing with a ``documentStatus`` (e.g. ``skipped``, ``failed``)."""
+def _filing_status_sql(fid: str, status: str, reason: str = "") -> str:
     safe_reason = escape_sql(reason[:200]) if reason else ""
-    sql = (
+    return (
         "UPDATE exchange_filing:{fid} SET\n"
         "  documentStatus = '{status}',\n"
         "  documentStatusReason = '{reason}',\n"
         "  updatedAt = time::now()\n"
         "RETURN NONE;\n"
     ).format(fid=fid, status=escape_sql(status), reason=safe_reason)
-    result = surreal_query(sql, timeout=30)
-    return not (isinstance(result, dict) and result.get("error"))
+
+
+# ---------------------------------------------------------------------------
+# Phase 1: Concurrent chunk fetching
+# ---------------------------------------------------------------------------
+
+_chunk_local = threading.local()
+
+
+def _chunk_session():
+    """Return this thread's HKEx session, creating it on first use.
+
+    Each fetcher thread owns one session so the server-side date range set
+    by the search form POST is never shared between concurrent chunks.
+    """
+    session = getattr(_chunk_local, "session", None)
+    if session is None:
+        session = new_session()
+        _chunk_local.session = session
+    return session
+
+
+def _fetch_chunk_worker(args: Tuple[datetime, datetime, int]) -> Tuple[list, str, dict]:
+    """Thread-safe wrapper for ``fetch_chunk_adaptive``.
+
+    Returns ``(filings, error, fetch_stats)``; *error* is empty on success.
+    """
+    chunk_from, chunk_to, max_records = args
+    fetch_stats: dict = {}
+    try:
+        filings = fetch_chunk_adaptive(
+            _chunk_session(),
+            chunk_from,
+            chunk_to,
+            max_records=max_records,
+            stats=fetch_stats,
+        )
+        return filings, "", fetch_stats
+    except Exception as e:
+        return [], str(e), fetch_stats
+
+
+def _iter_fetched_chunks(
+    chunks: List[Tuple[datetime, datetime]],
+    max_workers: int,
+    max_records: int = 0,
+) -> Iterator[Tuple[int, datetime, datetime, list, str, dict]]:
+    """Fetch chunks on a bounded pool and yield results in chunk order (newest first).
+
+    At most *max_workers* chunks are in flight (or finished but not yet
+    consumed) at any time.  Stopping iteration early cancels pending work.
+
+    Yields ``(chunk_idx, chunk_from, chunk_to, filings, error, fetch_stats)``.
+    """
+    workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hkex-chunk") as executor:
+        pending: deque = deque()
+        chunk_iter = iter(enumerate(chunks, 1))
+        try:
+            while True:
+                while len(pending) < workers:
+                    nxt = next(chunk_iter, None)
+                    if nxt is None:
+                        break
+                    chunk_idx, (chunk_from, chunk_to) = nxt
+                    future = executor.submit(
+                        _fetch_chunk_worker, (chunk_from, chunk_to, max_records)
+                    )
+                    pending.append((chunk_idx, chunk_from, chunk_to, future))
+                if not pending:
+                    return
+                chunk_idx, chunk_from, chunk_to, future = pending.popleft()
+                filings, error, fetch_stats = future.result()
+                yield chunk_idx, chunk_from, chunk_to, filings, error, fetch_stats
+        finally:
+            for *_, future in pending:
+                future.cancel()
+
+
+def _filing_id(f: dict) -> str:
+    """Return the deterministic record ID for a parsed filing."""
+    return hashlib.md5(
+        f"{f['stockCode']}{f['date']}{f.get('title', '')}".encode()
+    ).hexdigest()[:16]
+
+
+def _iter_unique_filings(filings: list, seen: set[str], limit: int = 0) -> Iterator[dict]:
+    """Yield at most *limit* filings from one chunk whose ID is not in *seen*.
+
+    *seen* holds the IDs of the whole run and is updated in place: retry
+    windows and adaptive splits can overlap other chunks of the same run.
+    """
+    yielded = 0
+    for f in filings:
+        if limit > 0 and yielded >= limit:
+            return
+        fid = _filing_id(f)
+        if fid not in seen:
+            seen.add(fid)
+            yielded += 1
+            yield f
+
+
+def _url_signature(url: str) -> int:
+    return zlib.crc32((url or "").encode("utf-8"))
+
+
+def _load_known_filings(window_from: datetime, window_to: datetime) -> dict | None:
+    """Load ``{filingId: url_signature}`` for filings already stored in a date window.
+
+    The filing ID already hashes the stock code, date and title, so only the
+    document URL needs comparing; it is kept as a 32-bit CRC to keep the index
+    small.  Returns None if the lookup fails (callers then save everything).
+    """
+    result = surreal_query(
+        f"SELECT filingId, documentUrl FROM exchange_filing "
+        f"WHERE filingDate >= d'{window_from.strftime('%Y-%m-%d')}' "
+        f"AND filingDate <= d'{window_to.strftime('%Y-%m-%d')}';",
+        timeout=120,
+    )
+    if isinstance(result, dict) and result.get("error"):
+        log(f"  Known-filing lookup failed, saving all rows: {result['error'][:200]}")
+        return None
+    known: dict = {}
+    if isinstance(result, list) and len(result) > 0:
+        for row in result[0].get("result", []) or []:
+            fid = row.get("filingId")
+            if fid:
+                known[fid] = _url_signature(row.get("documentUrl") or "")
+    return known
+
+
+def _iter_changed_filings(filings, known: dict | None, counts: dict) -> Iterator[dict]:
+    """Yield filings that are new or whose document URL changed.
+
+    *counts* is updated in place with ``unique`` (filings seen) and
+    ``unchanged`` (filings skipped).
+    """
+    for f in filings:
+        counts["unique"] += 1
+        if known is not None:
+            sig = known.get(_filing_id(f))
+            if sig is not None and sig == _url_signature(f.get("link", "")):
+                counts["unchanged"] += 1
+                continue
+        yield f
+
+
+def _batched(items, size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most *size* items."""
+    batch: list = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 # ---------------------------------------------------------------------------
 # Phase 1: Metadata scrape
 # ---------------------------------------------------------------------------
 
+def _plan_phase1_windows(
+    today: datetime,
+    date_from: str = "",
+    date_to: str = "",
+    full_history: bool = False,
+    resume: bool = True,
+) -> Tuple[datetime, datetime, List[Tuple[datetime, datetime]], int, datetime | None, list]:
+    """Work out the date range Phase 1 covers and the chunks it still has to fetch.
+
+    Full-history runs start in April 1999, explicit ``dd/mm/yyyy`` dates are
+    used as given, and routine runs continue from the checkpoint watermark
+    (the newest window completed by a routine or full-history run),
+    re-fetching older failed or partial windows, or, with no watermark,
+    cover the previous and current month.  With *resume*, chunks inside a
+    completed window are dropped.
+
+    Returns ``(dt_from, dt_to, chunks, skipped, watermark, retry_windows)``
+    where *skipped* counts the chunks dropped as already complete.
+    """
+    completed: List[Tuple[datetime, datetime]] = []
+    retry_windows: List[Tuple[datetime, datetime]] = []
+    watermark = None
+    if full_history:
+        dt_from = datetime(1999, 4, 1)
+        dt_to = today
+        if resume:
+            completed = load_completed_windows()
+    elif date_from and date_to:
+        dt_from = datetime.strptime(date_from, "%d/%m/%Y")
+        dt_to = datetime.strptime(date_to, "%d/%m/%Y")
+    else:
+        dt_to = today
+        if resume:
+            completed = load_completed_windows()
+            # Windows from explicit --from-date/--to-date runs don't count
+            watermark = load_watermark()
+        if watermark is not None:
+            dt_from = min(watermark, today)
+            retry_windows = [w for w in load_incomplete_windows() if w[1] < dt_from]
+        else:
+            dt_from = today.replace(day=1)
+            if dt_from.month == 1:
+                dt_from = dt_from.replace(year=dt_from.year - 1, month=12)
+            else:
+                dt_from = dt_from.replace(month=dt_from.month - 1)
+
+    chunks = generate_monthly_chunks(dt_from, dt_to) + retry_windows
+    planned = len(chunks)
+    if completed:
+        chunks = [c for c in chunks if not is_window_covered(c, completed)]
+    return dt_from, dt_to, chunks, planned - len(chunks), watermark, retry_windows
+
+
+def _window_checkpoint(
+    chunk_from: datetime,
+    chunk_to: datetime,
+    today: datetime,
+    truncated: bool,
+    save_errors: bool,
+) -> Tuple[str, datetime]:
+    """Return the ``(status, window_to)`` to checkpoint for a fetched chunk."""
+    if save_errors:
+        return STATUS_FAILED, chunk_to
+    if truncated:
+        return STATUS_PARTIAL, chunk_to
+    if chunk_to >= today:
+        # Today is still open; everything before it is final
+        status = STATUS_COMPLETE if chunk_from < today else STATUS_PARTIAL
+        return status, max(chunk_from, today - timedelta(days=1))
+    return STATUS_COMPLETE, chunk_to
+
+
 def run_phase1(
     max_filings: int = 0,
     dry_run: bool = False,
     date_from: str = "",
     date_to: str = "",
     full_history: bool = False,
+    max_workers: int = MAX_CHUNK_WORKERS,
+    resume: bool = True,
+    refresh_metadata: bool = False,
 ) -> Tuple[int, set]:
-    """Scrape HKEx filings using the JSON API (no browser needed)."""
+    """Scrape HKEx filings using the JSON API (no browser needed).
+
+    Runs as a streaming pipeline: date chunks are fetched concurrently on up
+    to *max_workers* independent HKEx sessions, consumed in newest-first
+    order, de-duplicated and upserted in ``/rpc``-sized batches before the
+    next chunk is taken.  Peak memory is bounded by the chunks in flight, and every
+    finished chunk is already durable if the run is interrupted.
+
+    Each chunk's outcome is checkpointed in ``scrape_state``.  With *resume*
+    (the default), full-history runs skip chunks that already completed, and
+    runs without explicit dates continue from the newest completed window
+    and re-fetch older failed or partial windows.
+
+    Filings already stored with the same ID and document URL are not
+    re-written (unless *refresh_metadata*), so routine runs only upsert new
+    or changed rows.  The returned ticker set covers the saved rows only.
+    """
     if not REQUESTS_AVAILABLE:
         log("ERROR: 'requests' library not installed. Run: pip install requests")
         return 0, set()
 
-    import requests as _requests
-
-    today = datetime.now()
+    now = datetime.now()
+    today = datetime(now.year, now.month, now.day)
+    dt_from, dt_to, chunks, skipped, watermark, retry_windows = _plan_phase1_windows(
+        today, date_from, date_to, full_history, resume
+    )
     if full_history:
-        dt_from = datetime(1999, 4, 1)
-        dt_to = today
+        run_kind = KIND_FULL_HISTORY
     elif date_from and date_to:
-        dt_from = datetime.strptime(date_from, "%d/%m/%Y")
-        dt_to = datetime.strptime(date_to, "%d/%m/%Y")
+        run_kind = KIND_RANGE
     else:
-        dt_to = today
-        dt_from = datetime(today.year, today.month, today.day).replace(day=1)
-        if dt_from.month == 1:
-            dt_from = dt_from.replace(year=dt_from.year - 1, month=12)
-        else:
-            dt_from = dt_from.replace(month=dt_from.month - 1)
-
-    chunks = generate_monthly_chunks(dt_from, dt_to)
+        run_kind = KIND_ROUTINE
 
     log("=" * 60)
     log("PHASE 1: METADATA SCRAPE")
     log("=" * 60)
     log(f"Date range: {dt_from.strftime('%Y-%m-%d')} to {dt_to.strftime('%Y-%m-%d')}")
-    log(f"Monthly chunks: {len(chunks)}")
+    if watermark is not None:
+        log(
+            f"Resuming from watermark {watermark.strftime('%Y-%m-%d')} "
+            f"(+{len(retry_windows)} failed/partial windows to retry)"
+        )
+    if skipped:
+        log(f"Skipping {skipped} chunks already completed in earlier runs")
+    log(f"Chunks: {len(chunks)}, Chunk workers: {max_workers}")
     log(f"Max filings: {'unlimited' if max_filings <= 0 else max_filings}")
     log("")
 
-    session = _requests.Session()
-    session.headers.update(
-        {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    )
-
-    all_filings: list = []
-    saved_ids: set[str] = set()
+    total_unique = 0
+    total_saved = 0
+    total_unchanged = 0
     ingested_tickers: set[str] = set()
+    seen_ids: set[str] = set()
+    save_budget = MAX_RPC_BODY_SIZE - _METADATA_RPC_OVERHEAD
 
-    for chunk_idx, (chunk_from, chunk_to) in enumerate(chunks, 1):
-        if max_filings > 0 and len(saved_ids) >= max_filings:
-            log(f"Reached --limit {max_filings}, stopping.")
-            break
-
-        from_str = chunk_from.strftime("%Y%m%d")
-        to_str = chunk_to.strftime("%Y%m%d")
+    total_bytes = 0
+    for chunk_idx, chunk_from, chunk_to, chunk_filings, error, fetch_stats in (
+        _iter_fetched_chunks(chunks, max_workers, max_records=max_filings)
+    ):
         log(
             f"--- CHUNK {chunk_idx}/{len(chunks)}: "
             f"{chunk_from.strftime('%Y-%m-%d')} to {chunk_to.strftime('%Y-%m-%d')} ---"
         )
-
-        remaining = 0
-        if max_filings > 0:
-            remaining = max_filings - len(saved_ids)
-
-        try:
-            chunk_filings = fetch_chunk_via_api(
-                session, from_str, to_str, max_records=remaining
-            )
-        except Exception as e:
-            log(f"  ERROR: {e}")
+        if error:
+            log(f"  ERROR: {error}")
             log("  Skipping chunk, will retry on next run.")
+            if not dry_run:
+                record_window(chunk_from, chunk_to, STATUS_FAILED, error=error, kind=run_kind)
             continue
 
-        chunk_new = 0
-        for f in chunk_filings:
-            fid = hashlib.md5(
-                f"{f['stockCode']}{f['date']}{f.get('title', '')}".encode()
-            ).hexdigest()[:16]
-            if fid not in saved_ids:
-                saved_ids.add(fid)
-                all_filings.append(f)
-                chunk_new += 1
-                raw_code = str(f["stockCode"]).lstrip("0") or "0"
+        remaining = max_filings - total_unique if max_filings > 0 else 0
+        known = None if refresh_metadata else _load_known_filings(chunk_from, chunk_to)
+        counts = {"unique": 0, "unchanged": 0}
+        chunk_changed = 0
+        chunk_saved = 0
+        rows = (
+            _filing_to_row(f)
+            for f in _iter_changed_filings(
+                _iter_unique_filings(chunk_filings, seen_ids, remaining), known, counts
+            )
+        )
+        for batch in _batched_by_bytes(rows, save_budget):
+            for row in batch:
+                raw_code = row["stockCode"].lstrip("0") or "0"
                 ingested_tickers.add(f"{raw_code.zfill(4)}.HK")
+            chunk_changed += len(batch)
+            chunk_saved += _save_metadata_rows(batch, dry_run)
+        chunk_new = counts["unique"]
+        total_unique += chunk_new
+        total_saved += chunk_saved
+        total_unchanged += counts["unchanged"]
+
+        if not dry_run:
+            truncated = max_filings > 0 and (
+                len(chunk_filings) >= max_filings or chunk_new >= remaining
+            )
+            status, window_to = _window_checkpoint(
+                chunk_from, chunk_to, today, truncated, chunk_saved < chunk_changed
+            )
+            record_window(
+                chunk_from, window_to, status,
+                record_count=len(chunk_filings),
+                saved_count=chunk_saved,
+                error="save_errors" if status == STATUS_FAILED else "",
+                kind=run_kind,
+            )
 
+        total_bytes += fetch_stats.get("bytes", 0)
         log(
-            f"  Fetched {len(chunk_filings)} records, {chunk_new} new "
-            f"(total unique: {len(saved_ids)})"
+            f"  Fetched {len(chunk_filings)} records, {chunk_new} unique, "
+            f"{counts['unchanged']} unchanged, {chunk_saved} saved "
+            f"(total unique: {total_unique}, total saved: {total_saved})"
+        )
+        log(
+            f"  API: {fetch_stats.get('windows', 0)} windows, "
+            f"{fetch_stats.get('requests', 0)} requests, "
+            f"{fetch_stats.get('bytes', 0) / 1024:.0f} KB, "
+            f"{fetch_stats.get('bytes_per_record', 0)} bytes/record"
         )
 
-    log("")
-    log(f"Total unique filings fetched: {len(all_filings)}")
-
-    if not all_filings:
-        log("No filings to save.")
-        return 0, ingested_tickers
-
-    log("Saving filings to SurrealDB...")
-    total_saved = 0
-    SAVE_BATCH = 50
-    for i in range(0, len(all_filings), SAVE_BATCH):
-        batch = all_filings[i : i + SAVE_BATCH]
-        count = _save_filings_batch_metadata(batch, dry_run)
-        total_saved += count
-        if (i + SAVE_BATCH) % 500 == 0 or i + SAVE_BATCH >= len(all_filings):
-            log(
-                f"  Progress: {min(i + SAVE_BATCH, len(all_filings))}/{len(all_filings)} "
-                f"({total_saved} saved)"
-            )
+        if max_filings > 0 and total_unique >= max_filings:
+            log(f"Reached --limit {max_filings}, stopping.")
+            break
 
     log("")
-    log(f"Complete: {total_saved} filings saved to database ({len(saved_ids)} unique IDs)")
+    if total_unique:
+        log(
+            f"API transfer: {total_bytes / (1024 * 1024):.1f} MB, "
+            f"{total_bytes / total_unique:.0f} bytes per unique filing"
+        )
+    log(
+        f"Complete: {total_saved} filings saved to database ({total_unique} unique IDs, "
+        f"{total_unchanged} already up to date)"
+    )
     return total_saved, ingested_tickers
 
 
@@ -588,12 +1057,364 @@ def run_phase1(
 # Phase 2: Document backfill
 # ---------------------------------------------------------------------------
 
+# ---------------------------------------------------------------------------
+# Phase 2 work queue (date windows + lease-based claiming)
+# ---------------------------------------------------------------------------
+#
+# Several nodes can run Phase 2 against the same database.  A node claims a
+# page of filings by setting ``documentStatus = 'claimed'`` together with
+# ``claimedBy`` (its worker ID) and ``leaseExpiresAt``.  The claim UPDATE
+# re-checks the row status per record, so concurrent claims never hand the
+# same filing to two nodes.  Leases are renewed while the node works and
+# released on exit; if a node dies, its leases expire and the rows are
+# reclaimed by whoever asks next.
+
+QUEUE_WHERE = "documentStatus IS NONE AND documentUrl IS NOT NONE"
+EXPIRED_WHERE = "documentStatus = 'claimed' AND leaseExpiresAt < time::now()"
+RETRY_DUE_WHERE = "documentStatus = 'retry' AND nextAttemptAt <= time::now()"
+_QUEUE_FIELDS = "id, filingId, documentUrl, filingDate, documentAttempts"
+
+# The queue is walked newest first in bounded filingDate windows (see
+# QueueWindows).  HKEx filings start in April 1999 (see run_phase1): anything
+# older comes in one last window, and undated rows after that.
+QUEUE_FIRST_DATE = datetime(1999, 4, 1)
+QUEUE_FIRST_WINDOW_DAYS = 2     # routine backlogs sit in the newest days
+QUEUE_MAX_WINDOW_DAYS = 366
+QUEUE_WINDOW_PAGES = 4          # size windows to hold about this many pages
+
+
+class QueueWindows:
+    """Walk the Phase 2 queue newest first in bounded ``filingDate`` windows.
+
+    Every page is a plain range on ``filingDate`` with no ``OR``, which
+    SurrealDB serves as a range scan on ``idx_ef_date``, so a page costs the
+    rows in its window rather than the whole backlog: a keyset predicate
+    with an ``id`` tie-break (or a ``<datetime>`` cast) makes the planner
+    scan the table, and no index serves ``ORDER BY filingDate DESC`` (check
+    with ``EXPLAIN``).  No tie-break is needed: claimed rows leave the
+    ``documentStatus IS NONE`` set, so asking again for the same window
+    returns the rows not taken yet.  A window that yields nothing is
+    followed by the next older one, sized from the rate seen in the last like
+    :func:`~hkex_scraper.api.fetch_chunk_adaptive` does for Phase 1.
+    """
+
+    def __init__(self, batch: int, today: datetime | None = None) -> None:
+        now = today or datetime.now()
+        today = datetime(now.year, now.month, now.day)
+        self.batch = max(1, batch)
+        self.lower: datetime | None = today - timedelta(days=QUEUE_FIRST_WINDOW_DAYS - 1)
+        self.upper: datetime | None = None  # exclusive top; None = open
+        self.days = QUEUE_FIRST_WINDOW_DAYS
+        self.found = 0  # rows claimed in the current window
+        self.done = False
+
+    def where(self) -> str:
+        """WHERE clause for the unclaimed filings of the current window."""
+        if self.lower is None:
+            return f"{QUEUE_WHERE} AND filingDate IS NONE"
+        where = f"{QUEUE_WHERE} AND filingDate >= d'{self.lower.strftime('%Y-%m-%d')}'"
+        if self.upper is not None:
+            where += f" AND filingDate < d'{self.upper.strftime('%Y-%m-%d')}'"
+        return where
+
+    def advance(self, rows: list) -> None:
+        """Move on after claiming *rows* from the current window."""
+        if rows:
+            self.found += len(rows)
+            return
+        if self.lower is None:
+            self.done = True
+            return
+        if self.lower <= QUEUE_FIRST_DATE:
+            self.lower, self.upper = None, None
+            return
+        rate = self.found / self.days
+        days = 2 * self.days
+        if rate > 0:
+            days = min(days, max(1, int(QUEUE_WINDOW_PAGES * self.batch / rate)))
+        days = min(days, QUEUE_MAX_WINDOW_DAYS)
+        self.upper = self.lower
+        self.lower -= timedelta(days=days)
+        if self.lower <= QUEUE_FIRST_DATE:
+            self.lower = datetime(1900, 1, 1)
+        self.days, self.found = days, 0
+
+
+def _queue_left_sql() -> str:
+    """Check whether any unclaimed filing is left (no sort, stops at the first)."""
+    return f"SELECT id FROM exchange_filing WHERE {QUEUE_WHERE} LIMIT 1;"
+
+
+def _lease_set(worker_id: str, lease_seconds: int) -> str:
+    return (
+        f"documentStatus = 'claimed', claimedBy = '{escape_sql(worker_id)}', "
+        f"leaseExpiresAt = time::now() + {int(lease_seconds)}s"
+    )
+
+
+def _claim_page_sql(
+    batch: int, window: QueueWindows, worker_id: str, lease_seconds: int
+) -> str:
+    """Atomically claim the newest unclaimed filings of the current queue window.
+
+    The outer ``WHERE`` is evaluated per record inside the UPDATE, so rows
+    another node claimed between the inner SELECT and the write are skipped.
+    SurrealDB only orders by selected fields, so the page is selected with
+    its ``filingDate`` and reduced to ids around it.
+    """
+    return (
+        f"UPDATE (SELECT VALUE id FROM (SELECT id, filingDate FROM exchange_filing "
+        f"WHERE {window.where()} "
+        f"ORDER BY filingDate DESC, id DESC LIMIT {int(batch)})) "
+        f"SET {_lease_set(worker_id, lease_seconds)} "
+        f"WHERE documentStatus IS NONE "
+        f"RETURN {_QUEUE_FIELDS};"
+    )
+
+
+def _take_over_sql(where: str, batch: int, worker_id: str, lease_seconds: int) -> str:
+    return (
+        f"UPDATE (SELECT VALUE id FROM exchange_filing "
+        f"WHERE {where} LIMIT {int(batch)}) "
+        f"SET {_lease_set(worker_id, lease_seconds)} "
+        f"WHERE {where} "
+        f"RETURN {_QUEUE_FIELDS};"
+    )
+
+
+def _reclaim_expired_sql(batch: int, worker_id: str, lease_seconds: int) -> str:
+    """Atomically take over filings whose lease has expired (crashed node)."""
+    return _take_over_sql(EXPIRED_WHERE, batch, worker_id, lease_seconds)
+
+
+def _claim_due_retries_sql(batch: int, worker_id: str, lease_seconds: int) -> str:
+    """Atomically claim filings whose retry backoff has passed."""
+    return _take_over_sql(RETRY_DUE_WHERE, batch, worker_id, lease_seconds)
+
+
+def _renew_leases(worker_id: str, lease_seconds: int) -> bool:
+    """Extend the lease on every filing this worker still holds."""
+    result = surreal_query(
+        f"UPDATE exchange_filing SET leaseExpiresAt = time::now() + {int(lease_seconds)}s "
+        f"WHERE documentStatus = 'claimed' AND claimedBy = '{escape_sql(worker_id)}' "
+        f"RETURN NONE;",
+        timeout=60,
+    )
+    if isinstance(result, dict) and result.get("error"):
+        log(f"  WARNING: lease renewal failed: {result['error'][:200]}")
+        return False
+    return True
+
+
+def _release_claims(worker_id: str) -> bool:
+    """Return this worker's unfinished claims to the queue."""
+    result = surreal_query(
+        f"UPDATE exchange_filing SET documentStatus = NONE, claimedBy = NONE, "
+        f"leaseExpiresAt = NONE "
+        f"WHERE documentStatus = 'claimed' AND claimedBy = '{escape_sql(worker_id)}' "
+        f"RETURN NONE;",
+        timeout=60,
+    )
+    if isinstance(result, dict) and result.get("error"):
+        log(f"  WARNING: could not release claims: {result['error'][:200]}")
+        return False
+    return True
+
+
+def _queue_sort_key(row: dict) -> tuple:
+    """Sort key matching ``ORDER BY filingDate, id`` (ints before strings)."""
+    fid = _parse_queue_row(row)[0]
+    id_key = (0, int(fid), "") if fid.isdigit() else (1, 0, fid)
+    return (str(row.get("filingDate") or ""), id_key)
+
+
+def _count_backlog() -> int | None:
+    """Return the number of filings waiting for Phase 2 (full scan; optional)."""
+    result = surreal_query(
+        f"SELECT count() AS cnt FROM exchange_filing "
+        f"WHERE ({QUEUE_WHERE}) OR ({RETRY_DUE_WHERE}) GROUP ALL;",
+        timeout=120,
+    )
+    if isinstance(result, dict) and result.get("error"):
+        log(f"  Could not count backlog: {result['error'][:200]}")
+        return None
+    if isinstance(result, list) and len(result) > 0:
+        r = result[0].get("result", [])
+        if r and isinstance(r, list) and len(r) > 0:
+            return r[0].get("cnt", 0)
+    return 0
+
+
+def _parse_queue_row(row: dict) -> Tuple[str, str]:
+    """Return ``(fid, documentUrl)`` for a row from the Phase 2 queue query."""
+    record_id = str(row.get("id", ""))
+    fid = record_id.split(":")[-1] if ":" in record_id else row.get("filingId", "")
+    return fid, row.get("documentUrl", "") or ""
+
+
+# ---------------------------------------------------------------------------
+# Phase 2 retries
+# ---------------------------------------------------------------------------
+#
+# A transient failure (timeout, connection error, HTTP 408/429/5xx, failed
+# save) does not end a filing's processing: it is parked as
+# ``documentStatus = 'retry'`` with ``documentAttempts`` and an exponential
+# backoff in ``nextAttemptAt``, and the feeder claims it again once it is
+# due.  After PHASE2_MAX_ATTEMPTS attempts the failure is recorded with its
+# usual final status.  Everything else (``unsupported_type``, ``too_large``,
+# HTTP 404, extraction limits, ...) is final straight away.
+
+# documentStatusReason prefixes of failures worth retrying
+TRANSIENT_REASONS = ("http_408", "http_429", "http_5", "error:", "download_failed", "save_error")
+
+
+def _is_transient(reason: str) -> bool:
+    return reason.startswith(TRANSIENT_REASONS)
+
+
+def _retry_delay(attempt: int) -> int:
+    """Seconds to wait before retrying after failed attempt number *attempt*."""
+    return min(PHASE2_RETRY_BASE_SECONDS * 2 ** max(attempt - 1, 0), PHASE2_RETRY_MAX_SECONDS)
+
+
+def _filing_retry_sql(fid: str, reason: str, attempt: int) -> str:
+    """Park a filing for another attempt after *attempt* transient failures."""
+    return (
+        "UPDATE exchange_filing:{fid} SET\n"
+        "  documentStatus = 'retry',\n"
+        "  documentStatusReason = '{reason}',\n"
+        "  documentAttempts = {attempt},\n"
+        "  nextAttemptAt = time::now() + {delay}s,\n"
+        "  updatedAt = time::now()\n"
+        "RETURN NONE;\n"
+    ).format(
+        fid=fid, reason=escape_sql(reason[:200]), attempt=int(attempt),
+        delay=_retry_delay(attempt),
+    )
+
+
+def _spool_document(raw_bytes: bytes, doc_url: str, directory: str = EXTRACT_TMP_DIR) -> str:
+    """Write a document to a temp file under *directory* and return its path."""
+    suffix = os.path.splitext(doc_url.lower().split("?")[0].split("#")[0])[1]
+    fd, path = tempfile.mkstemp(prefix="hkex_", suffix=suffix, dir=directory or None)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(raw_bytes)
+    return path
+
+
+def _remove_file(path: str) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _extract_in_pool(pool, path: str, doc_url: str) -> Tuple[str, list]:
+    """Extract the document at *path* on a worker process."""
+    return pool.submit(extract_file_with_tables, path, doc_url).result()
+
+
+def _extract_sandboxed(
+    fid: str, path: str, doc_url: str, timeout: float
+) -> Tuple[str, list, str, str]:
+    """Extract the document at *path* in a supervised child process.
+
+    A PDF killed for exceeding a limit is retried once in text-only mode
+    when ``EXTRACT_DEGRADED_RETRY`` is on.
+
+    Returns ``(text, tables, failure, status_reason)``: *failure* is the
+    sandbox reason when no content could be extracted, *status_reason*
+    marks a degraded success (``text_only_after_extract_timeout``).
+    """
+    text, tables, failure = run_sandboxed_extraction(path, doc_url, timeout=timeout)
+    if not failure:
+        return text, tables, "", ""
+    log(f"  Extraction of {fid} stopped: {failure}")
+    is_pdf = doc_url.lower().split("?")[0].split("#")[0].endswith(".pdf")
+    if failure in LIMIT_REASONS and EXTRACT_DEGRADED_RETRY and is_pdf:
+        text, tables, retry_failure = run_sandboxed_extraction(
+            path, doc_url, text_only=True, timeout=timeout
+        )
+        if not retry_failure:
+            log(f"  Extracted {fid} in text-only mode ({len(text)} chars)")
+            return text, tables, "", f"text_only_after_{failure}"
+        log(f"  Text-only retry of {fid} stopped: {retry_failure}")
+    return "", [], failure, ""
+
+
+def _extraction_desc(extract_workers: int, extract_timeout: float) -> str:
+    """Describe the Phase 2 extraction mode the two settings select."""
+    if extract_timeout > 0:
+        return (
+            f"{max(1, extract_workers)} sandboxed at a time, "
+            f"{extract_timeout:.0f}s per document"
+        )
+    if extract_workers > 0:
+        return f"process pool of {extract_workers}"
+    return "in-process"
+
+
 def run_phase2(
     batch_size: int = 50,
     max_workers: int = MAX_DOWNLOAD_WORKERS,
     limit: int = 0,
+    extract_workers: int = MAX_EXTRACT_WORKERS,
+    extract_timeout: float = EXTRACT_TIMEOUT_SECONDS,
+    count_backlog: bool = False,
+    worker_id: str = PHASE2_WORKER_ID,
+    lease_seconds: int = PHASE2_LEASE_SECONDS,
+    async_downloads: int = 0,
 ) -> dict:
-    """Download and process documents for filings that have metadata but no document content."""
+    """Download and process documents for filings that have metadata but no document content.
+
+    Runs as a streaming pipeline of threads joined by bounded queues::
+
+        feeder -> download (max_workers) -> extract -> DB writer
+
+    With *extract_timeout* > 0 every document is extracted in its own
+    supervised child process (see :mod:`hkex_scraper.sandbox`), so a
+    pathological PDF is killed at the deadline, RSS cap or CPU limit and
+    recorded as ``failed`` with reason ``extract_timeout``/``extract_oom``/
+    ``extract_cpu_limit`` instead of stalling the backfill; *extract_workers*
+    then sets how many documents are extracted at once.  With the sandbox
+    disabled, *extract_workers* > 0 runs extraction on a process pool and 0
+    extracts on a single in-process thread.
+    With *async_downloads* > 0 the download stage is one asyncio event loop
+    (:mod:`hkex_scraper.aiodownloader`) keeping up to that many transfers in
+    flight, instead of *max_workers* blocking threads.  The shared HKEx
+    limiter's ceiling is raised to that many for the run; its window still
+    starts at ``HKEX_INITIAL_CONCURRENCY`` and opens as responses stay healthy.
+    The feeder keeps the download queue topped up from the database instead
+    of working in fixed batches, so network, CPU and database work overlap
+    and no stage waits for the slowest download of a batch.  It walks the
+    backlog newest first in bounded ``filingDate`` windows (see
+    :class:`QueueWindows`), so a page costs the rows in its window rather
+    than the whole backlog.  Filings queued after the run starts with a
+    newer date than the current window are picked up when the walk starts
+    over at the end, or by the next run.
+
+    The download stage writes each document once to a file in
+    ``EXTRACT_TMP_DIR`` (RAM-backed, ``/dev/shm`` by default), and every
+    extraction mode reads that file: PyMuPDF and camelot open the same path.
+    Downloads and these files share a ``PHASE2_MEMORY_BUDGET_MB`` budget: a
+    download waits for room before it takes a limiter slot and a
+    connection, then is charged its ``Content-Length`` (or the body as it
+    arrives), and documents over ``PHASE2_SPILL_MB`` go to
+    ``PHASE2_SPILL_DIR`` on disk instead.  In-flight bytes and process RSS
+    are logged with every stage report.
+
+    Filings are claimed under *worker_id* with a lease of *lease_seconds*
+    (renewed every third of the lease while the run lasts and released on
+    exit), so several nodes can run Phase 2 against the same database
+    without duplicating work; rows held by a node that died are reclaimed
+    once its lease expires.
+
+    The startup ``count()`` scans the whole backlog, so it only runs with
+    *count_backlog*; progress is then also reported as a percentage.
+    Per-stage queue depth and throughput are logged every
+    ``PHASE2_REPORT_SECONDS``.
+    """
     stats = {
         "total_missing": 0,
         "total_processed": 0,
@@ -601,154 +1422,493 @@ def run_phase2(
         "texts_extracted": 0,
         "tables_total": 0,
         "skipped": 0,
+        "retries_scheduled": 0,
         "errors": 0,
     }
 
     log("=" * 60)
     log("PHASE 2: DOCUMENT BACKFILL")
     log("=" * 60)
-    log(f"Workers: {max_workers}, Batch size: {batch_size}, Limit: {limit or 'unlimited'}")
-    log("")
-
-    count_result = surreal_query(
-        "SELECT count() AS cnt FROM exchange_filing "
-        "WHERE documentStatus IS NONE "
-        "AND documentUrl IS NOT NONE "
-        "GROUP ALL;",
-        timeout=120,
+    downloads_desc = f"async x{async_downloads}" if async_downloads > 0 else max_workers
+    log(
+        f"Workers: {downloads_desc}, "
+        f"Extraction: {_extraction_desc(extract_workers, extract_timeout)}, "
+        f"Batch size: {batch_size}, Limit: {limit or 'unlimited'}"
     )
-    total_missing = 0
-    if isinstance(count_result, list) and len(count_result) > 0:
-        r = count_result[0].get("result", [])
-        if r and isinstance(r, list) and len(r) > 0:
-            total_missing = r[0].get("cnt", 0)
-    stats["total_missing"] = total_missing
-    log(f"Filings needing processing: {total_missing}")
+    log(f"Worker ID: {worker_id}, Lease: {lease_seconds}s")
+    log("")
 
-    if total_missing == 0:
-        log("All filings already processed. Nothing to backfill.")
-        return stats
+    total_missing = _count_backlog() if count_backlog else None
+    if total_missing is not None:
+        stats["total_missing"] = total_missing
+        log(f"Filings needing processing: {total_missing}")
+        if total_missing == 0:
+            log("All filings already processed. Nothing to backfill.")
+            return stats
 
-    effective_limit = limit if limit > 0 else total_missing
-    batch_num = 0
-    consecutive_stalls = 0
+    effective_limit = limit if limit > 0 else float("inf")
     MAX_STALLS = 3
 
-    while stats["total_processed"] < effective_limit:
-        batch_num += 1
-        remaining = effective_limit - stats["total_processed"]
-        this_batch = min(batch_size, remaining)
-
-        fetch_sql = (
-            f"SELECT id, filingId, documentUrl, filingDate FROM exchange_filing "
-            f"WHERE documentStatus IS NONE "
-            f"AND documentUrl IS NOT NONE "
-            f"ORDER BY filingDate DESC "
-            f"LIMIT {this_batch};"
+    # One consumer per download thread, or a single asyncio download loop
+    n_downloaders = 1 if async_downloads > 0 else max_workers
+    download_q: queue.Queue = queue.Queue(maxsize=max(max_workers, async_downloads) * 2)
+    extract_q: queue.Queue = queue.Queue(maxsize=max(2, max_workers, extract_workers))
+    write_q: queue.Queue = queue.Queue(maxsize=max(2, max_workers * 2))
+    stop = threading.Event()
+    state_lock = threading.Lock()
+
+    feed_meter = StageStats("feed")
+    download_meter = StageStats("download", download_q)
+    extract_meter = StageStats("extract", extract_q)
+    write_meter = StageStats("write", write_q)
+    # documentAttempts of every filing in flight, set by the feeder
+    attempts: dict = {}
+    budget = ByteBudget(PHASE2_MEMORY_BUDGET_MB * 1024 * 1024)
+    spill_bytes = PHASE2_SPILL_MB * 1024 * 1024
+
+    def _feeder() -> None:
+        dispatched = 0
+        stalls = 0
+        lost_races = 0
+        windows = QueueWindows(batch_size)
+
+        def _claim(sql: str) -> Tuple[list, str]:
+            result = surreal_query(sql, timeout=120)
+            if isinstance(result, dict) and result.get("error"):
+                return [], result["error"]
+            if isinstance(result, list) and len(result) > 0:
+                if result[0].get("status") == "ERR":
+                    return [], str(result[0].get("result", ""))
+                return result[0].get("result", []) or [], ""
+            return [], ""
+
+        try:
+            while not stop.is_set() and dispatched < effective_limit:
+                this_batch = int(min(batch_size, effective_limit - dispatched))
+                # Leases left behind by a crashed node take priority, then
+                # retries whose backoff has passed, then the queue itself
+                rows, error = _claim(_reclaim_expired_sql(this_batch, worker_id, lease_seconds))
+                taken_over = "filings with expired leases" if rows else ""
+                if not error and not rows:
+                    rows, error = _claim(
+                        _claim_due_retries_sql(this_batch, worker_id, lease_seconds)
+                    )
+                    taken_over = "filings due for a retry" if rows else ""
+                if not error and not rows:
+                    rows, error = _claim(
+                        _claim_page_sql(this_batch, windows, worker_id, lease_seconds)
+                    )
+                    if not error:
+                        windows.advance(rows)
+                if error:
+                    stalls += 1
+                    log(
+                        f"  WARNING: queue claim failed ({stalls}/{MAX_STALLS}): "
+                        f"{error[:200]}"
+                    )
+                    if stalls >= MAX_STALLS:
+                        log(f"  BREAKING: {MAX_STALLS} consecutive failed queue claims.")
+                        break
+                    time.sleep(2 ** stalls)
+                    continue
+                stalls = 0
+                if not rows and not windows.done:
+                    continue  # on to the next, older window
+                if not rows:
+                    # Either the queue is empty or rows were skipped (another
+                    # node won them, or released them since): walk it again
+                    probe = surreal_query(_queue_left_sql(), timeout=120)
+                    if (
+                        isinstance(probe, list) and probe and probe[0].get("result")
+                        and lost_races < MAX_STALLS
+                    ):
+                        lost_races += 1
+                        windows = QueueWindows(batch_size)
+                        continue
+                    if dispatched == 0:
+                        log("All filings already processed. Nothing to backfill.")
+                    else:
+                        log(f"No more filings to queue ({dispatched} queued).")
+                    break
+                lost_races = 0
+                rows.sort(key=_queue_sort_key, reverse=True)
+                if taken_over:
+                    log(f"  Claimed {len(rows)} {taken_over}")
+
+                for row in rows:
+                    fid, doc_url = _parse_queue_row(row)
+                    if not fid:
+                        continue
+                    attempts[fid] = int(row.get("documentAttempts") or 0)
+                    if doc_url:
+                        queued = put_until(download_q, (fid, doc_url), stop)
+                    else:
+                        queued = put_until(
+                            write_q, ("status", fid, "skipped", "no_document_url"), stop
+                        )
+                    if not queued:
+                        break
+                    dispatched += 1
+                    feed_meter.record()
+        finally:
+            for _ in range(n_downloaders):
+                put_until(download_q, DONE, stop)
+
+    downloaders_left = [n_downloaders]
+    n_extractors = max(1, extract_workers)
+    async_fetchers: list = []
+
+    def _route_download(
+        fid: str, doc_url: str, raw_bytes: bytes, size_bytes: int, doc_hash: str,
+        skip_reason: str, seconds: float, hold: BudgetHold,
+    ) -> None:
+        # The body was charged to the budget (hold) from before it was read
+        download_meter.record(seconds=seconds)
+        if not raw_bytes:
+            hold.release()
+            put_until(
+                write_q, ("status", fid, "skipped", skip_reason or "download_failed"), stop
+            )
+            return
+        # Written once here; every extraction mode reads this file
+        spilled = len(raw_bytes) > spill_bytes
+        if spilled:
+            budget.record_spill()
+        try:
+            path = _spool_document(
+                raw_bytes, doc_url, PHASE2_SPILL_DIR if spilled else EXTRACT_TMP_DIR
+            )
+        except OSError as e:
+            hold.release()
+            log(f"  Could not write {fid} for extraction: {e}")
+            put_until(write_q, ("status", fid, "skipped", f"error:{type(e).__name__}"), stop)
+            return
+        # A spilled document stops counting once it is on disk; a small one
+        # stays charged (in RAM-backed EXTRACT_TMP_DIR) until it is extracted
+        hold.grow(len(raw_bytes))
+        if spilled:
+            hold.release()
+        charge = hold.take()
+        if not put_until(extract_q, (fid, doc_url, path, charge, size_bytes, doc_hash), stop):
+            budget.release(charge)
+            _remove_file(path)
+
+    def _downloader_done() -> None:
+        with state_lock:
+            downloaders_left[0] -= 1
+            last = downloaders_left[0] == 0
+        if last:
+            for _ in range(n_extractors):
+                put_until(extract_q, DONE, stop)
+
+    def _downloader() -> None:
+        try:
+            while True:
+                task = get_until(download_q, stop)
+                if task is DONE:
+                    break
+                started = time.monotonic()
+                hold = BudgetHold(budget, stop)
+                try:
+                    result = _download_worker(task, hold)
+                except Exception as e:
+                    hold.release()
+                    put_until(write_q, ("error", task[0], f"Download error: {e}"), stop)
+                    continue
+                _route_download(*result, time.monotonic() - started, hold)
+        finally:
+            _downloader_done()
+
+    async def _fetch_async(fetcher: AsyncDocumentFetcher, task: Tuple[str, str]) -> None:
+        fid, doc_url = task
+        started = time.monotonic()
+        raw_bytes, doc_hash, skip_reason = b"", "", _download_skip_reason(doc_url)
+        hold = BudgetHold(budget, stop)
+        if not skip_reason:
+            try:
+                # Wait for memory before taking a limiter slot and a connection
+                if not await hold.wait_for_room_async():
+                    raise DownloadAborted(doc_url)
+                async with HKEX_LIMITER.async_slot() as slot:
+                    try:
+                        raw_bytes, doc_hash, skip_reason, timings = await fetcher.fetch(
+                            doc_url, hold
+                        )
+                    except HttpError as e:
+                        _observe_http_error(slot, e)
+                        raise
+                    slot.observe(200, timings["ttfb"])
+            except Exception as e:
+                skip_reason = _download_error_reason(fid, e)
+        # Queue puts block when extraction is behind; keep them off the loop
+        await asyncio.to_thread(
+            _route_download, fid, doc_url, raw_bytes, len(raw_bytes), doc_hash,
+            skip_reason, time.monotonic() - started, hold,
         )
-        result = surreal_query(fetch_sql, timeout=120)
-        filings: list = []
-        if isinstance(result, list) and len(result) > 0:
-            filings = result[0].get("result", [])
-        if not filings:
-            log(f"No more filings to process (batch {batch_num}).")
-            break
 
-        log(f"Batch {batch_num}: Processing {len(filings)} filings...")
-
-        download_tasks: list = []
-        for f in filings:
-            record_id = str(f.get("id", ""))
-            fid = record_id.split(":")[-1] if ":" in record_id else f.get("filingId", "")
-            doc_url = f.get("documentUrl", "")
-            if fid and doc_url:
-                download_tasks.append((fid, doc_url))
-            elif fid:
-                _mark_filing_status(fid, "skipped", "no_document_url")
-                stats["skipped"] += 1
-
-        if not download_tasks:
-            stats["total_processed"] += len(filings)
-            continue
+    async def _async_download_loop() -> None:
+        # get_until and _route_download block on the stage queues in
+        # to_thread(); give them threads of their own, one per transfer plus
+        # the queue reader, instead of the small shared default executor
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(
+                max_workers=async_downloads + 1, thread_name_prefix="hkex-download"
+            )
+        )
+        fetcher = AsyncDocumentFetcher(concurrency=async_downloads)
+        async_fetchers.append(fetcher)
+        slots = asyncio.Semaphore(async_downloads)
+        running: set = set()
+
+        async def _run(task: Tuple[str, str]) -> None:
+            try:
+                await _fetch_async(fetcher, task)
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                task = await asyncio.to_thread(get_until, download_q, stop)
+                if task is DONE:
+                    break
+                job = asyncio.ensure_future(_run(task))
+                running.add(job)
+                job.add_done_callback(running.discard)
+            await asyncio.gather(*running)
+        finally:
+            await fetcher.aclose()
+
+    def _async_downloader() -> None:
+        try:
+            asyncio.run(_async_download_loop())
+        finally:
+            _downloader_done()
+
+    extractors_left = [n_extractors]
+    pool = None
+    sandboxed = extract_timeout > 0
+    if extract_workers > 0 and not sandboxed:
+        pool = ProcessPoolExecutor(
+            max_workers=extract_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=silence_stderr,
+        )
 
-        # Download in parallel
-        downloaded_docs: list = []
-        batch_skipped = 0
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(_download_worker, t): t for t in download_tasks}
-            for future in as_completed(futures):
+    def _extract(fid: str, path: str, doc_url: str) -> Tuple[str, list]:
+        if pool is not None:
+            try:
+                return _extract_in_pool(pool, path, doc_url)
+            except BrokenProcessPool as e:
+                log(f"  Extraction pool failed for {fid} ({e}); extracting in-process")
+        return extract_file_with_tables(path, doc_url)
+
+    def _extractor() -> None:
+        try:
+            while True:
+                item = get_until(extract_q, stop)
+                if item is DONE:
+                    break
+                fid, doc_url, path, charge, size_bytes, doc_hash = item
+                started = time.monotonic()
+                extracted_text = ""
+                tables_json: list = []
+                failure = status_reason = ""
                 try:
-                    fid, doc_url, raw_bytes, size_bytes, skip_reason = future.result()
-                    if raw_bytes:
-                        downloaded_docs.append((fid, doc_url, raw_bytes, size_bytes))
+                    if sandboxed:
+                        extracted_text, tables_json, failure, status_reason = (
+                            _extract_sandboxed(fid, path, doc_url, extract_timeout)
+                        )
                     else:
-                        _mark_filing_status(fid, "skipped", skip_reason or "download_failed")
-                        batch_skipped += 1
+                        extracted_text, tables_json = _extract(fid, path, doc_url)
                 except Exception as e:
-                    stats["errors"] += 1
-                    log(f"  Download error: {e}")
-
-        stats["skipped"] += batch_skipped
-        log(f"  Downloaded: {len(downloaded_docs)}, Skipped: {batch_skipped}")
-
-        # Extract text/tables sequentially
-        batch_downloaded = 0
-        batch_texts = 0
-        batch_tables = 0
-        for fid, doc_url, raw_bytes, size_bytes in downloaded_docs:
-            extracted_text = ""
-            tables_json: list = []
-            try:
-                old_stderr = sys.stderr
-                sys.stderr = io.StringIO()
-                try:
-                    extracted_text, tables_json = extract_content_with_tables(
-                        raw_bytes, doc_url
-                    )
+                    log(f"  Text extraction error for {fid}: {e}")
                 finally:
-                    sys.stderr = old_stderr
-            except Exception as e:
-                log(f"  Text extraction error for {fid}: {e}")
+                    _remove_file(path)
+                    budget.release(charge)
+                extract_meter.record(seconds=time.monotonic() - started)
+                if failure:
+                    put_until(write_q, ("status", fid, "failed", failure), stop)
+                    continue
+                # The hash was taken while downloading, so the raw bytes are
+                # not passed on to the writer
+                put_until(
+                    write_q,
+                    ("doc", fid, doc_url, size_bytes, doc_hash,
+                     extracted_text, tables_json, status_reason),
+                    stop,
+                )
+        finally:
+            with state_lock:
+                extractors_left[0] -= 1
+                last = extractors_left[0] == 0
+            if last:
+                put_until(write_q, DONE, stop)
+
+    # Status updates and document saves are buffered and sent as
+    # multi-statement requests; see hkex_scraper.dbwriter.
+    db_writer = CoalescingWriter()
+
+    def _finish(kind: str, status: str = "") -> None:
+        if kind == "retry":
+            stats["retries_scheduled"] += 1
+        elif kind == "error" or status == "failed":
+            stats["errors"] += 1
+        elif kind == "status":
+            stats["skipped"] += 1
+        stats["total_processed"] += 1
+
+    def _queue_status(fid: str, status: str, reason: str, kind: str = "status") -> None:
+        attempt = attempts.pop(fid, 0) + 1
+        if _is_transient(reason) and attempt < PHASE2_MAX_ATTEMPTS:
+            sql = _filing_retry_sql(fid, reason, attempt)
+            kind = "retry"
+        else:
+            sql = _filing_status_sql(fid, status, reason)
+
+        def _done(result: Tuple[bool, str]) -> None:
+            if not result[0]:
+                log(f"  Status update failed for {fid}")
+            _finish(kind, status)
+
+        def _mark_alone() -> Tuple[bool, str]:
+            result = surreal_query(sql, timeout=30)
+            ok = not (isinstance(result, dict) and result.get("error"))
+            return ok, "" if ok else "status_update_failed"
+
+        db_writer.add(fid, sql, None, _mark_alone, _done)
+
+    def _queue_document(item: tuple) -> None:
+        (_, fid, doc_url, size_bytes, doc_hash,
+         extracted_text, tables_json, status_reason) = item
+        prefix = f"f{fid}_"
+        vars_dict = _prepare_document_save(
+            fid, b"", size_bytes, doc_url, extracted_text, tables_json, status_reason,
+            doc_hash,
+        )
 
-            success, error_code = _save_document_to_filing(
-                fid, raw_bytes, size_bytes, doc_url, extracted_text, tables_json
+        def _save_alone() -> Tuple[bool, str]:
+            return _save_document_to_filing(
+                fid, b"", size_bytes, doc_url, extracted_text, tables_json,
+                status_reason=status_reason, doc_hash=doc_hash,
             )
+
+        def _done(result: Tuple[bool, str]) -> None:
+            success, error_code = result
             if success:
-                batch_downloaded += 1
+                attempts.pop(fid, None)
+                stats["docs_downloaded"] += 1
                 if extracted_text:
-                    batch_texts += 1
+                    stats["texts_extracted"] += 1
                 if tables_json:
-                    batch_tables += len(tables_json)
+                    stats["tables_total"] += len(tables_json)
+                _finish("doc")
             else:
-                _mark_filing_status(fid, "failed", error_code or "save_error")
-                stats["errors"] += 1
-
-        stats["docs_downloaded"] += batch_downloaded
-        stats["texts_extracted"] += batch_texts
-        stats["tables_total"] += batch_tables
-        stats["total_processed"] += len(filings)
+                _queue_status(fid, "failed", error_code or "save_error", kind="error")
+
+        db_writer.add(
+            fid,
+            _document_update_sql(fid, prefix),
+            {prefix + k: v for k, v in vars_dict.items()},
+            _save_alone,
+            _done,
+        )
 
-        log(
-            f"  Batch {batch_num}: {batch_downloaded} docs saved, "
-            f"{batch_texts} with text, {batch_tables} tables"
+    def _writer() -> None:
+        try:
+            _write_loop()
+        finally:
+            db_writer.flush()
+
+    def _write_loop() -> None:
+        while not stop.is_set():
+            wait = db_writer.seconds_until_due()
+            if wait == 0:
+                db_writer.flush()
+                continue
+            try:
+                item = write_q.get(timeout=0.5 if wait is None else min(wait, 0.5))
+            except queue.Empty:
+                continue
+            if item is DONE:
+                break
+            started = time.monotonic()
+            kind, fid = item[0], item[1]
+            if kind == "doc":
+                _queue_document(item)
+            elif kind == "status":
+                _, _, status, reason = item
+                _queue_status(fid, status, reason)
+            else:
+                log(f"  {item[2]}")
+                attempts.pop(fid, None)
+                _finish("error")
+            write_meter.record(seconds=time.monotonic() - started)
+
+    threads = [threading.Thread(target=_feeder, name="phase2-feed", daemon=True)]
+    if async_downloads > 0:
+        threads.append(
+            threading.Thread(target=_async_downloader, name="phase2-download-async", daemon=True)
         )
+    else:
+        threads += [
+            threading.Thread(target=_downloader, name=f"phase2-download-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+    threads += [
+        threading.Thread(target=_extractor, name=f"phase2-extract-{i}", daemon=True)
+        for i in range(n_extractors)
+    ]
+    writer = threading.Thread(target=_writer, name="phase2-write", daemon=True)
+    threads.append(writer)
 
-        # Stall detection
-        batch_status_updates = batch_downloaded + batch_skipped
-        if batch_status_updates == 0:
-            consecutive_stalls += 1
+    def _lease_renewer() -> None:
+        while not stop.wait(max(lease_seconds / 3, 1)):
+            _renew_leases(worker_id, lease_seconds)
+
+    threads.append(threading.Thread(target=_lease_renewer, name="phase2-lease", daemon=True))
+    # The shared limiter would cap --async-downloads at HKEX_MAX_CONCURRENCY;
+    # let its window grow to N for this run (it still starts small)
+    limiter_max = HKEX_LIMITER.maximum
+    if async_downloads > limiter_max:
+        HKEX_LIMITER.set_maximum(async_downloads)
+    log(f"HKEx limiter: {HKEX_LIMITER.format_stats()}")
+
+    for t in threads:
+        t.start()
+
+    meters = [feed_meter, download_meter, extract_meter, write_meter]
+    try:
+        while writer.is_alive():
+            writer.join(timeout=PHASE2_REPORT_SECONDS)
+            log(f"  Stages: {format_stage_report(meters)}")
+            log(f"  Memory: {format_memory_report(budget, read_rss_bytes(os.getpid()))}")
+            if total_missing:
+                pct = min(100, (stats["total_processed"] / total_missing) * 100)
+                progress = f"{stats['total_processed']}/{total_missing} ({pct:.1f}%)"
+            else:
+                progress = f"{stats['total_processed']}"
             log(
-                f"  WARNING: No filings updated in this batch "
-                f"(stall {consecutive_stalls}/{MAX_STALLS})"
+                f"  Progress: {progress}, "
+                f"{stats['docs_downloaded']} docs saved, {stats['skipped']} skipped, "
+                f"{stats['retries_scheduled']} to retry, {stats['errors']} errors"
             )
-            if consecutive_stalls >= MAX_STALLS:
-                log(f"  BREAKING: {MAX_STALLS} consecutive stalls detected. Stopping.")
-                break
-        else:
-            consecutive_stalls = 0
-
-        pct = min(100, (stats["total_processed"] / total_missing) * 100)
-        log(f"  Progress: {stats['total_processed']}/{total_missing} ({pct:.1f}%)")
+            log(f"  HKEx limiter: {HKEX_LIMITER.format_stats()}")
+    except KeyboardInterrupt:
+        log("Interrupted: stopping Phase 2 pipeline...")
+        stop.set()
+        raise
+    finally:
+        stop.set()
+        budget.wake_all()
+        for t in threads:
+            t.join(timeout=5)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        HKEX_LIMITER.set_maximum(limiter_max)
+        # Filings claimed but not finished (interrupt, --limit, error) go back
+        # to the queue now rather than waiting for the lease to expire.
+        _release_claims(worker_id)
 
     log("")
     log("=" * 60)
@@ -759,5 +1919,13 @@ def run_phase2(
     log(f"Texts extracted:  {stats['texts_extracted']}")
     log(f"Tables extracted: {stats['tables_total']}")
     log(f"Skipped:          {stats['skipped']}")
+    log(f"Retries queued:   {stats['retries_scheduled']}")
     log(f"Errors:           {stats['errors']}")
+    fetcher = async_fetchers[0] if async_fetchers else _get_downloader()
+    log(f"Downloads:        {format_download_stats(fetcher.stats())}")
+    log(f"HKEx limiter:     {HKEX_LIMITER.format_stats()}")
+    log(
+        f"Memory:           peak {budget.peak / 1_048_576:.0f} MB of documents in flight, "
+        f"{budget.spilled} spilled, peak RSS {peak_rss_bytes() / 1_048_576:.0f} MB"
+    )
     return stats
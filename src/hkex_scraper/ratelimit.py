@@ -0,0 +1,271 @@
+"""AIMD concurrency limiter shared by every request to hkexnews.hk.
+
+A fixed worker count either under-uses the link or keeps hammering the
+server once it starts throttling, which turns into thousands of filings
+skipped with ``http_503``.  :class:`AimdLimiter` instead holds a
+concurrency *window*, the number of requests allowed in flight:
+
+* every healthy response grows the window by ``1 / window``, so it opens
+  by about one slot per window's worth of responses (additive increase);
+* a 429/5xx response, a connection error or timeout, or a time to first
+  byte above ``slow_after`` (or the slot's own threshold, e.g. for search
+  pages that are slow by design) multiplies it by ``decrease``
+  (multiplicative decrease), at most once per cooldown so a burst of
+  failures from one congestion event only counts once;
+* ``Retry-After`` on a 429/503 pauses new requests until it has passed.
+
+The window only grows while it is actually the limit (requests were
+waiting for a slot), and every change is logged so the bounds can be tuned.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Iterator, Tuple
+
+from .config import (
+    HKEX_INITIAL_CONCURRENCY,
+    HKEX_MAX_CONCURRENCY,
+    HKEX_MIN_CONCURRENCY,
+    HKEX_SLOW_SECONDS,
+)
+from .utils import log
+
+# Statuses that mean the server is overloaded or throttling us
+THROTTLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class LimiterSlot:
+    """One acquired request slot; report the response with :meth:`observe`."""
+
+    __slots__ = ("epoch", "latency", "retry_after", "slow_after", "status")
+
+    def __init__(self, epoch: int) -> None:
+        self.status = 0
+        self.latency: float | None = None
+        self.retry_after = 0.0
+        self.slow_after: float | None = None
+        self.epoch = epoch
+
+    def observe(
+        self,
+        status: int,
+        latency: float | None = None,
+        retry_after: float = 0.0,
+        slow_after: float | None = None,
+    ) -> None:
+        """Record the HTTP status, time to first byte and any ``Retry-After``.
+
+        *slow_after* replaces the limiter's slow-response threshold for this
+        request.
+        """
+        self.status = status
+        self.latency = latency
+        self.retry_after = retry_after
+        self.slow_after = slow_after
+
+
+class AimdLimiter:
+    """Thread-safe additive-increase / multiplicative-decrease concurrency limiter."""
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = HKEX_INITIAL_CONCURRENCY,
+        minimum: int = HKEX_MIN_CONCURRENCY,
+        maximum: int = HKEX_MAX_CONCURRENCY,
+        slow_after: float = HKEX_SLOW_SECONDS,
+        decrease: float = 0.5,
+        cooldown: float = 2.0,
+        log_every: float = 60.0,
+    ) -> None:
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.window = float(min(max(initial, self.minimum), self.maximum))
+        self.slow_after = slow_after
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.log_every = log_every
+        self._in_flight = 0
+        # Bumped whenever a request finds the window full; a slot whose
+        # request overlapped a bump was limited by the window
+        self._full_epoch = 0
+        self._resume_at = 0.0
+        self._last_decrease = 0.0
+        self._last_log = time.monotonic()
+        self._cond = threading.Condition()
+        # Coroutines waiting in acquire_async as [loop, event, woken];
+        # release() wakes them in order, one per free slot
+        self._async_waiters: deque = deque()
+        self.counters = {"requests": 0, "throttled": 0, "failed": 0, "slow": 0, "decreases": 0}
+
+    # --- acquiring ---------------------------------------------------------
+
+    def _try_acquire(self) -> Tuple[LimiterSlot | None, float]:
+        """Take a slot if one is free; return ``(slot or None, seconds_to_wait)``."""
+        now = time.monotonic()
+        if now < self._resume_at:
+            return None, self._resume_at - now
+        if self._in_flight >= int(self.window):
+            self._full_epoch += 1
+            return None, 0.5
+        slot = LimiterSlot(self._full_epoch)
+        self._in_flight += 1
+        if self._in_flight >= int(self.window):
+            self._full_epoch += 1
+        return slot, 0.0
+
+    def acquire(self) -> LimiterSlot:
+        """Block until a slot is free and return it."""
+        with self._cond:
+            while True:
+                slot, wait = self._try_acquire()
+                if slot is not None:
+                    return slot
+                self._cond.wait(wait)
+
+    async def acquire_async(self) -> LimiterSlot:
+        """:meth:`acquire` for coroutines: waits without blocking the event loop.
+
+        A coroutine that finds the window full queues up and sleeps until
+        :meth:`release` wakes it, so hundreds of waiters cost no polling.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                slot, wait = self._try_acquire()
+                if slot is not None:
+                    return slot
+                # Paused by Retry-After: nothing wakes us, so wake up on time
+                timeout = wait if self._resume_at > time.monotonic() else None
+                waiter = [loop, asyncio.Event(), False]
+                self._async_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                with self._cond:
+                    if waiter[2]:
+                        self._wake_async(1)  # pass the wake-up on
+                    else:
+                        self._async_waiters.remove(waiter)
+                raise
+            with self._cond:
+                if not waiter[2]:
+                    self._async_waiters.remove(waiter)
+
+    def _wake_async(self, n: int) -> None:
+        """Wake up to *n* queued coroutines; the caller holds the lock."""
+        while n > 0 and self._async_waiters:
+            waiter = self._async_waiters.popleft()
+            waiter[2] = True
+            waiter[0].call_soon_threadsafe(waiter[1].set)
+            n -= 1
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[LimiterSlot]:
+        """Hold a slot for one request; an exception without a status counts as a failure."""
+        slot = self.acquire()
+        failed = True
+        try:
+            yield slot
+            failed = False
+        finally:
+            self.release(slot, failed=failed and not slot.status)
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[LimiterSlot]:
+        """:meth:`slot` for coroutines."""
+        slot = await self.acquire_async()
+        failed = True
+        try:
+            yield slot
+            failed = False
+        finally:
+            self.release(slot, failed=failed and not slot.status)
+
+    # --- feedback ----------------------------------------------------------
+
+    def release(self, slot: LimiterSlot, failed: bool = False) -> None:
+        """Return *slot* and adjust the window from its outcome."""
+        with self._cond:
+            self._in_flight -= 1
+            self.counters["requests"] += 1
+            now = time.monotonic()
+            slow_after = self.slow_after if slot.slow_after is None else slot.slow_after
+            reason = ""
+            if failed:
+                self.counters["failed"] += 1
+                reason = "request failed"
+            elif slot.status in THROTTLE_STATUSES:
+                self.counters["throttled"] += 1
+                reason = f"HTTP {slot.status}"
+                if slot.retry_after > 0:
+                    self._resume_at = max(self._resume_at, now + slot.retry_after)
+            elif slow_after > 0 and (slot.latency or 0.0) > slow_after:
+                self.counters["slow"] += 1
+                reason = f"slow response ({slot.latency:.1f}s)"
+
+            if reason:
+                if now - self._last_decrease >= self.cooldown:
+                    old = self.window
+                    self.window = max(float(self.minimum), self.window * self.decrease)
+                    self._last_decrease = now
+                    self.counters["decreases"] += 1
+                    self._last_log = now
+                    log(f"  {self.name} limiter: {reason}, window {old:.1f} -> {self.window:.1f}")
+            elif slot.epoch != self._full_epoch and self.window < self.maximum:
+                self.window = min(float(self.maximum), self.window + 1.0 / self.window)
+
+            if now - self._last_log >= self.log_every:
+                self._last_log = now
+                log(f"  {self.name} limiter: {self.format_stats()}")
+            self._cond.notify_all()
+            self._wake_async(int(self.window) - self._in_flight)
+
+    def set_maximum(self, maximum: int) -> int:
+        """Change the window ceiling; returns the previous one."""
+        with self._cond:
+            previous, self.maximum = self.maximum, max(self.minimum, maximum)
+            self.window = min(self.window, float(self.maximum))
+            self._cond.notify_all()
+        if self.maximum != previous:
+            log(f"  {self.name} limiter: ceiling {previous} -> {self.maximum}")
+        return previous
+
+    # --- reporting ---------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._cond:
+            snap = dict(self.counters)
+            snap["window"] = self.window
+            snap["maximum"] = self.maximum
+            snap["in_flight"] = self._in_flight
+        return snap
+
+    def format_stats(self) -> str:
+        c = self.counters
+        return (
+            f"window {self.window:.1f} of {self.maximum} ({self._in_flight} in flight), "
+            f"{c['requests']} requests, {c['throttled']} throttled, "
+            f"{c['failed']} failed, {c['slow']} slow"
+        )
+
+
+def parse_retry_after(value: str | None) -> float:
+    """Seconds from a ``Retry-After`` header given in seconds (dates are ignored)."""
+    try:
+        return max(0.0, float(value)) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+# One limiter for the whole process: Phase 1 search requests and Phase 2
+# document downloads all go to the same host.
+HKEX_LIMITER = AimdLimiter("hkexnews.hk")
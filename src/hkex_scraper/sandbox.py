@@ -0,0 +1,179 @@
+"""Supervised extraction: one child process per document with hard resource limits.
+
+Some HKEx PDFs (giant annual reports, malformed scans) make camelot or
+pymupdf4llm run for many minutes or exhaust memory.  Running each document
+in its own child process lets the supervisor enforce a wall-clock deadline,
+an RSS cap and a CPU-time limit, and kill the child without affecting the
+rest of the backfill.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import signal
+import time
+from typing import Tuple
+
+from .config import EXTRACT_CPU_SECONDS, EXTRACT_MAX_RSS_MB, EXTRACT_TIMEOUT_SECONDS
+from .utils import log
+
+try:
+    import resource  # type: ignore  # POSIX only
+    _RESOURCE_AVAILABLE = True
+except ImportError:
+    _RESOURCE_AVAILABLE = False
+
+# documentStatusReason values for documents the supervisor gave up on
+REASON_TIMEOUT = "extract_timeout"
+REASON_OOM = "extract_oom"
+REASON_CPU = "extract_cpu_limit"
+REASON_CRASH = "extract_crash"
+# Prefix for an exception raised by the extractor: extract_error:<Type>
+REASON_ERROR = "extract_error"
+
+LIMIT_REASONS = (REASON_TIMEOUT, REASON_OOM, REASON_CPU)
+
+_POLL_SECONDS = 0.25
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_context = None
+
+
+def _get_context():
+    """Return the multiprocessing context used for extraction children.
+
+    ``forkserver`` forks each child from a small single-threaded server that
+    has already imported the extraction libraries, so children start fast
+    and never inherit the pipeline's threads.  Falls back to ``spawn`` where
+    forkserver is unavailable.
+    """
+    global _context
+    if _context is None:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            _context = multiprocessing.get_context("forkserver")
+            _context.set_forkserver_preload(["hkex_scraper.extractor"])
+        else:
+            _context = multiprocessing.get_context("spawn")
+    return _context
+
+
+def read_rss_bytes(pid: int) -> int:
+    """Return the resident set size of *pid* in bytes (0 if unknown)."""
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _sandbox_child(
+    conn, path: str, doc_url: str, text_only: bool, max_rss_bytes: int, cpu_seconds: int
+) -> None:
+    """Child entry point: apply limits, extract, send ``(status, payload)``."""
+    if _RESOURCE_AVAILABLE:
+        try:
+            if cpu_seconds > 0:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+            if max_rss_bytes > 0:
+                # Address space is a coarse backstop; the supervisor polls RSS
+                # for the real cap.  Libraries map far more than they touch.
+                cap = max_rss_bytes * 2
+                resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+        except (ValueError, OSError):
+            pass
+
+    from .extractor import extract_file_with_tables, silence_stderr
+
+    silence_stderr()
+    try:
+        text, tables = extract_file_with_tables(path, doc_url, text_only=text_only)
+        conn.send(("ok", (text, tables)))
+    except MemoryError:
+        conn.send(("oom", None))
+    except Exception as e:
+        conn.send(("error", (type(e).__name__, str(e)[:500])))
+    finally:
+        conn.close()
+
+
+def run_sandboxed_extraction(
+    path: str,
+    doc_url: str,
+    text_only: bool = False,
+    timeout: float = EXTRACT_TIMEOUT_SECONDS,
+    max_rss_mb: int = EXTRACT_MAX_RSS_MB,
+    cpu_seconds: int = EXTRACT_CPU_SECONDS,
+) -> Tuple[str, list, str]:
+    """Extract the document at *path* in a supervised child process.
+
+    The child is killed when it passes the wall-clock *timeout*, its RSS
+    exceeds *max_rss_mb*, or the kernel stops it at *cpu_seconds* of CPU.
+
+    Returns ``(text, tables, failure_reason)``; *failure_reason* is empty on
+    success, otherwise one of ``extract_timeout``, ``extract_oom``,
+    ``extract_cpu_limit``, ``extract_crash`` or ``extract_error:<Type>`` for
+    an exception raised by the extractor (logged with its message).
+    """
+    ctx = _get_context()
+    max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb > 0 else 0
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(
+        target=_sandbox_child,
+        args=(child_conn, path, doc_url, text_only, max_rss_bytes, cpu_seconds),
+        daemon=True,
+    )
+    proc.start()
+    child_conn.close()
+
+    deadline = time.monotonic() + timeout if timeout > 0 else None
+    reason = ""
+    message = None
+    try:
+        while True:
+            if parent_conn.poll(_POLL_SECONDS):
+                try:
+                    message = parent_conn.recv()
+                except EOFError:
+                    message = None
+                break
+            if not proc.is_alive():
+                # Exited without sending: drain a final message if one raced in
+                if parent_conn.poll(0):
+                    try:
+                        message = parent_conn.recv()
+                    except EOFError:
+                        message = None
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                reason = REASON_TIMEOUT
+                break
+            if max_rss_bytes and read_rss_bytes(proc.pid) > max_rss_bytes:
+                reason = REASON_OOM
+                break
+    finally:
+        if proc.is_alive() and (reason or message is None):
+            proc.kill()
+        proc.join(timeout=5)
+        parent_conn.close()
+
+    if reason:
+        return "", [], reason
+    if message is None:
+        exitcode = proc.exitcode
+        sigxcpu = getattr(signal, "SIGXCPU", None)
+        if sigxcpu is not None and exitcode == -sigxcpu:
+            return "", [], REASON_CPU
+        if exitcode is not None and exitcode < 0:
+            # Killed by a signal: most often the kernel OOM killer or RLIMIT_AS
+            return "", [], REASON_OOM
+        return "", [], REASON_CRASH
+    status, payload = message
+    if status == "ok":
+        text, tables = payload
+        return text, tables, ""
+    if status == "oom":
+        return "", [], REASON_OOM
+    error_type, error = payload
+    log(f"  Sandboxed extraction of {doc_url} raised {error_type}: {error}")
+    return "", [], f"{REASON_ERROR}:{error_type}"
@@ -0,0 +1,295 @@
+"""Bounded-queue stage helpers for the streaming Phase 2 pipeline."""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import List
+
+try:
+    import resource  # type: ignore  # POSIX only
+    _RESOURCE_AVAILABLE = True
+except ImportError:
+    _RESOURCE_AVAILABLE = False
+
+# End-of-stream marker passed between stages
+DONE = object()
+
+
+class StageStats:
+    """Thread-safe throughput meter for one pipeline stage.
+
+    Tracks items completed and time spent working, plus the depth of the
+    stage's input queue, so a report shows where work is piling up.
+    """
+
+    def __init__(self, name: str, input_queue: queue.Queue | None = None) -> None:
+        self.name = name
+        self.input_queue = input_queue
+        self._lock = threading.Lock()
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = time.monotonic()
+        self._last_items = 0
+        self._last_time = self.started
+
+    def record(self, items: int = 1, seconds: float = 0.0) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def snapshot(self) -> dict:
+        """Return counters plus the rate since the previous snapshot."""
+        now = time.monotonic()
+        with self._lock:
+            interval = max(now - self._last_time, 1e-6)
+            rate = (self.items - self._last_items) / interval
+            self._last_items = self.items
+            self._last_time = now
+            return {
+                "items": self.items,
+                "rate": rate,
+                "avg_rate": self.items / max(now - self.started, 1e-6),
+                "busy_seconds": self.busy_seconds,
+                "queue_depth": self.input_queue.qsize() if self.input_queue else 0,
+            }
+
+
+class ByteBudget:
+    """Caps the bytes held by documents between the download and extract stages.
+
+    A download waits for room before it takes a request slot, and its body
+    is charged once its length is known (see :class:`BudgetHold`); the
+    bytes stay charged until the extractor is done with the document.
+    :meth:`acquire` blocks while the bytes already held plus the new
+    reservation would exceed *limit*, and a reservation of nothing blocks
+    while the budget is full.  A document larger than the whole budget is
+    admitted once nothing else is held, so it cannot stall the pipeline.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.waits = 0
+        self.spilled = 0
+        self._interval_peak = 0
+        self._cond = threading.Condition()
+        # Coroutines waiting in acquire_async as [loop, event, n, woken];
+        # release() wakes them in order while they fit
+        self._async_waiters: deque = deque()
+
+    def _fits(self, n: int) -> bool:
+        return not self.used or self.used + max(n, 1) <= self.limit
+
+    def _charge(self, n: int) -> None:
+        self.used += n
+        self.peak = max(self.peak, self.used)
+        self._interval_peak = max(self._interval_peak, self.used)
+
+    def acquire(self, n: int, stop: threading.Event, poll: float = 0.5) -> bool:
+        """Reserve *n* bytes; returns False if *stop* was set while waiting."""
+        with self._cond:
+            if not self._fits(n):
+                self.waits += 1
+                while not self._fits(n):
+                    if stop.is_set():
+                        return False
+                    self._cond.wait(poll)
+            self._charge(n)
+            return True
+
+    async def acquire_async(self, n: int, stop: threading.Event, poll: float = 5.0) -> bool:
+        """:meth:`acquire` for coroutines: waits without blocking the event loop.
+
+        Waiters are woken by :meth:`release` and :meth:`wake_all`; *poll* is
+        only a backstop for noticing *stop*.
+        """
+        loop = asyncio.get_running_loop()
+        counted = False
+        while True:
+            with self._cond:
+                if self._fits(n):
+                    self._charge(n)
+                    return True
+                if stop.is_set():
+                    return False
+                if not counted:
+                    self.waits += 1
+                    counted = True
+                waiter = [loop, asyncio.Event(), n, False]
+                self._async_waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter[1].wait(), poll)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    if not waiter[3]:
+                        self._async_waiters.remove(waiter)
+
+    def charge(self, n: int) -> None:
+        """Count *n* more bytes without waiting (a body already arriving)."""
+        with self._cond:
+            self._charge(n)
+
+    def release(self, n: int) -> None:
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+            free = self.limit - self.used
+            while self._async_waiters:
+                waiter = self._async_waiters[0]
+                if self.used and waiter[2] > free:
+                    break
+                self._wake(self._async_waiters.popleft())
+                free -= waiter[2]
+
+    def wake_all(self) -> None:
+        """Wake every waiting coroutine, e.g. so they notice that the run stopped."""
+        with self._cond:
+            while self._async_waiters:
+                self._wake(self._async_waiters.popleft())
+
+    @staticmethod
+    def _wake(waiter: list) -> None:
+        waiter[3] = True
+        waiter[0].call_soon_threadsafe(waiter[1].set)
+
+    def record_spill(self) -> None:
+        """Count a document that was spilled to disk instead of kept in memory."""
+        with self._cond:
+            self.spilled += 1
+
+    def snapshot(self) -> dict:
+        """Return counters plus the peak since the previous snapshot."""
+        with self._cond:
+            snap = {
+                "used": self.used,
+                "limit": self.limit,
+                "peak": self.peak,
+                "interval_peak": self._interval_peak,
+                "waits": self.waits,
+                "spilled": self.spilled,
+            }
+            self._interval_peak = self.used
+            return snap
+
+
+class BudgetHold:
+    """The bytes one document holds in a :class:`ByteBudget`.
+
+    A download calls :meth:`wait_for_room` (or :meth:`wait_for_room_async`)
+    before it takes an HKEx limiter slot and a connection, so nothing waits
+    for memory while holding those.  The body is then charged through
+    :meth:`grow` without waiting: its ``Content-Length`` as soon as the
+    headers are in, or the bytes as they arrive when the length is unknown.
+    The budget can therefore be exceeded by the bodies already in flight.
+    Whoever ends up with the document takes the held bytes over
+    (:meth:`take`) or releases them.
+    """
+
+    def __init__(self, budget: ByteBudget, stop: threading.Event) -> None:
+        self.budget = budget
+        self.stop = stop
+        self.held = 0
+        self.waited = 0.0  # seconds spent waiting for room
+
+    def reserve(self, n: int) -> bool:
+        """Wait for room for *n* bytes; False if the run stopped first."""
+        started = time.monotonic()
+        ok = self.budget.acquire(n, self.stop)
+        self.waited += time.monotonic() - started
+        if ok:
+            self.held += n
+        return ok
+
+    async def reserve_async(self, n: int) -> bool:
+        """:meth:`reserve` for coroutines."""
+        started = time.monotonic()
+        ok = await self.budget.acquire_async(n, self.stop)
+        self.waited += time.monotonic() - started
+        if ok:
+            self.held += n
+        return ok
+
+    def wait_for_room(self) -> bool:
+        """Wait until the budget is not full; False if the run stopped first."""
+        return self.reserve(0)
+
+    async def wait_for_room_async(self) -> bool:
+        """:meth:`wait_for_room` for coroutines."""
+        return await self.reserve_async(0)
+
+    def grow(self, size: int) -> None:
+        """The body has reached *size* bytes; charge whatever is not held yet."""
+        if size > self.held:
+            self.budget.charge(size - self.held)
+            self.held = size
+
+    def take(self) -> int:
+        """Hand the held bytes over; the caller releases them from the budget."""
+        held, self.held = self.held, 0
+        return held
+
+    def release(self) -> None:
+        held = self.take()
+        if held:
+            self.budget.release(held)
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far, in bytes (0 if unknown)."""
+    if not _RESOURCE_AVAILABLE:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_memory_report(budget: ByteBudget, rss_bytes: int) -> str:
+    """Format one line with in-flight document bytes and process RSS."""
+    snap = budget.snapshot()
+    mb = 1024 * 1024
+    return (
+        f"docs {snap['used'] / mb:.0f}/{snap['limit'] / mb:.0f} MB in flight "
+        f"(peak {snap['interval_peak'] / mb:.0f} MB since last report), "
+        f"{snap['spilled']} spilled, {snap['waits']} waits | "
+        f"RSS {rss_bytes / mb:.0f} MB (peak {peak_rss_bytes() / mb:.0f} MB)"
+    )
+
+
+def format_stage_report(stages: List[StageStats]) -> str:
+    """Format one line with queue depth and throughput for each stage."""
+    parts = []
+    for st in stages:
+        snap = st.snapshot()
+        parts.append(
+            f"{st.name}: q={snap['queue_depth']} "
+            f"{snap['rate']:.1f}/s (total {snap['items']})"
+        )
+    return " | ".join(parts)
+
+
+def put_until(q: queue.Queue, item, stop: threading.Event, poll: float = 0.5) -> bool:
+    """Blocking ``put`` that gives up once *stop* is set. Returns True if queued."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=poll)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def get_until(q: queue.Queue, stop: threading.Event, poll: float = 0.5):
+    """Blocking ``get`` that returns :data:`DONE` once *stop* is set."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=poll)
+        except queue.Empty:
+            continue
+    return DONE
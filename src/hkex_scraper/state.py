@@ -0,0 +1,140 @@
+"""Phase 1 checkpoints: completed scrape windows and the incremental watermark.
+
+Every date window Phase 1 fetches is recorded in the ``scrape_state`` table
+with its outcome and record counts.  Full-history runs skip windows that
+already completed, and routine runs resume from the newest completed window
+(the watermark) instead of re-scraping a fixed period.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Tuple
+
+from .db import surreal_query
+from .utils import escape_sql, log
+
+# Window outcomes stored in ``scrape_state.status``
+STATUS_COMPLETE = "complete"  # closed window, every record fetched and saved
+STATUS_PARTIAL = "partial"    # window still open (includes today) or cut short by --limit
+STATUS_FAILED = "failed"      # fetch or save error
+
+# The kind of run that recorded a window (``scrape_state.kind``).  Only
+# routine and full-history runs advance the watermark: an explicit
+# --from-date/--to-date range can lie anywhere in the past.
+KIND_ROUTINE = "routine"
+KIND_FULL_HISTORY = "full_history"
+KIND_RANGE = "range"
+WATERMARK_KINDS = (KIND_ROUTINE, KIND_FULL_HISTORY)
+
+Window = Tuple[datetime, datetime]
+
+
+def _window_key(window_from: datetime, window_to: datetime) -> str:
+    return f"w{window_from.strftime('%Y%m%d')}_{window_to.strftime('%Y%m%d')}"
+
+
+def _parse_db_date(value) -> datetime | None:
+    """Parse a SurrealDB datetime (``2024-01-31T00:00:00Z``) to a naive date."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _select_windows(where: str) -> List[Window]:
+    result = surreal_query(
+        f"SELECT windowFrom, windowTo FROM scrape_state WHERE {where} "
+        f"ORDER BY windowTo DESC;",
+        timeout=60,
+    )
+    if isinstance(result, dict) and result.get("error"):
+        log(f"  Could not load scrape checkpoints: {result['error'][:200]}")
+        return []
+    windows: List[Window] = []
+    if isinstance(result, list) and len(result) > 0:
+        for row in result[0].get("result", []) or []:
+            w_from = _parse_db_date(row.get("windowFrom"))
+            w_to = _parse_db_date(row.get("windowTo"))
+            if w_from and w_to:
+                windows.append((w_from, w_to))
+    return windows
+
+
+def load_completed_windows(kinds: Tuple[str, ...] = ()) -> List[Window]:
+    """Return ``(from, to)`` for every window recorded as complete (newest first).
+
+    With *kinds*, only windows recorded by those kinds of run are returned.
+    """
+    where = f"status = '{STATUS_COMPLETE}'"
+    if kinds:
+        where += " AND kind IN [" + ", ".join(f"'{escape_sql(k)}'" for k in kinds) + "]"
+    return _select_windows(where)
+
+
+def load_incomplete_windows() -> List[Window]:
+    """Return failed or partial windows that still need to be re-fetched."""
+    return _select_windows(f"status != '{STATUS_COMPLETE}'")
+
+
+def load_watermark(completed: List[Window] | None = None) -> datetime | None:
+    """Return the end date of the newest completed window, or None if there is none.
+
+    Without *completed*, only routine and full-history windows are considered.
+    """
+    if completed is None:
+        completed = load_completed_windows(WATERMARK_KINDS)
+    if not completed:
+        return None
+    return max(w_to for _, w_to in completed)
+
+
+def is_window_covered(window: Window, completed: List[Window]) -> bool:
+    """Return True if *window* lies entirely inside a completed window."""
+    w_from, w_to = window
+    return any(c_from <= w_from and w_to <= c_to for c_from, c_to in completed)
+
+
+def record_window(
+    window_from: datetime,
+    window_to: datetime,
+    status: str,
+    record_count: int = 0,
+    saved_count: int = 0,
+    error: str = "",
+    kind: str = KIND_ROUTINE,
+) -> bool:
+    """UPSERT the outcome of one scraped window into ``scrape_state``.
+
+    A completed window supersedes any failed or partial record that it
+    covers, so those are removed in the same request.
+    """
+    key = _window_key(window_from, window_to)
+    d_from = window_from.strftime("%Y-%m-%d")
+    d_to = window_to.strftime("%Y-%m-%d")
+    error_expr = f"'{escape_sql(error[:300])}'" if error else "NONE"
+    sql = (
+        f"UPSERT scrape_state:{key} SET\n"
+        f"  windowFrom  = d'{d_from}',\n"
+        f"  windowTo    = d'{d_to}',\n"
+        f"  status      = '{escape_sql(status)}',\n"
+        f"  kind        = '{escape_sql(kind)}',\n"
+        f"  recordCount = {int(record_count)},\n"
+        f"  savedCount  = {int(saved_count)},\n"
+        f"  error       = {error_expr},\n"
+        f"  updatedAt   = time::now()\n"
+        f"RETURN NONE;\n"
+    )
+    if status == STATUS_COMPLETE:
+        sql += (
+            f"DELETE scrape_state WHERE status != '{STATUS_COMPLETE}' "
+            f"AND windowFrom >= d'{d_from}' AND windowTo <= d'{d_to}' "
+            f"AND id != scrape_state:{key} RETURN NONE;\n"
+        )
+    result = surreal_query(sql, timeout=30)
+    if isinstance(result, dict) and result.get("error"):
+        log(f"  Could not record checkpoint {key}: {result['error'][:200]}")
+        return False
+    return True
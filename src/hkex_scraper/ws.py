@@ -0,0 +1,295 @@
+"""Multiplexed WebSocket client for the SurrealDB ``/rpc`` protocol (stdlib only).
+
+Over HTTP every query is a separate request/response on a pooled
+connection.  Over WebSocket each RPC message carries an ``id``, so many
+queries can be in flight on one socket at once: callers submit requests
+and get a :class:`~concurrent.futures.Future` that a reader thread resolves
+when the matching response arrives, in whatever order the server answers.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import itertools
+import json
+import os
+import socket
+import ssl
+import struct
+import threading
+import urllib.parse
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, Tuple
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class WebSocketClosed(ConnectionError):
+    """The socket closed (or failed) while requests were outstanding."""
+
+
+# ---------------------------------------------------------------------------
+# Framing (RFC 6455)
+# ---------------------------------------------------------------------------
+
+def _mask(payload: bytes, key: bytes) -> bytes:
+    n = len(payload)
+    if not n:
+        return payload
+    repeated = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(n, "big")
+
+
+def encode_frame(opcode: int, payload: bytes, masked: bool = True) -> bytes:
+    """Encode one final frame; clients must mask, servers must not."""
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if masked else 0
+    n = len(payload)
+    if n < 126:
+        header.append(mask_bit | n)
+    elif n < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", n)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", n)
+    if masked:
+        key = os.urandom(4)
+        return bytes(header) + key + _mask(payload, key)
+    return bytes(header) + payload
+
+
+def _read_exact(rfile, n: int) -> bytes:
+    data = rfile.read(n)
+    if data is None or len(data) < n:
+        raise WebSocketClosed("connection closed mid-frame")
+    return data
+
+
+def read_frame(rfile) -> Tuple[bool, int, bytes]:
+    """Read one frame from a buffered binary file; return ``(fin, opcode, payload)``."""
+    b1, b2 = _read_exact(rfile, 2)
+    n = b2 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", _read_exact(rfile, 2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", _read_exact(rfile, 8))[0]
+    key = _read_exact(rfile, 4) if b2 & 0x80 else b""
+    payload = _read_exact(rfile, n) if n else b""
+    if key:
+        payload = _mask(payload, key)
+    return bool(b1 & 0x80), b1 & 0x0F, payload
+
+
+def accept_key(key: str) -> str:
+    """``Sec-WebSocket-Accept`` value for a client ``Sec-WebSocket-Key``."""
+    return base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+
+
+# ---------------------------------------------------------------------------
+# RPC client
+# ---------------------------------------------------------------------------
+
+class WebSocketRpcClient:
+    """Thread-safe JSON-RPC client multiplexing requests over one WebSocket.
+
+    *setup* is called with the client after every (re)connect and before
+    other requests are sent, to authenticate and select the namespace; it
+    must use :meth:`call` only.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        setup: Callable[[WebSocketRpcClient], None] | None = None,
+        connect_timeout: float = 30,
+    ) -> None:
+        self.url = url
+        self.setup = setup
+        self.connect_timeout = connect_timeout
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Tuple[socket.socket, Future]] = {}
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._ready = False  # connected and set up
+        self._rfile = None
+        self._reader: threading.Thread | None = None
+        self._setting_up = threading.local()
+        self._counters = {"requests": 0, "errors": 0, "connects": 0, "max_in_flight": 0}
+
+    # --- connection --------------------------------------------------------
+
+    def _handshake(self) -> None:
+        parts = urllib.parse.urlsplit(self.url)
+        secure = parts.scheme in ("wss", "https")
+        host = parts.hostname or "localhost"
+        port = parts.port or (443 if secure else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        sock = socket.create_connection((host, port), timeout=self.connect_timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            f"Upgrade: websocket\r\n"
+            f"Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            f"Sec-WebSocket-Version: 13\r\n"
+            f"Sec-WebSocket-Protocol: json\r\n"
+            f"\r\n"
+        )
+        sock.sendall(request.encode())
+        rfile = sock.makefile("rb")
+        status = rfile.readline().decode("latin-1").strip()
+        headers = {}
+        while True:
+            line = rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if " 101 " not in f"{status} " or headers.get("sec-websocket-accept") != accept_key(key):
+            sock.close()
+            raise WebSocketClosed(f"WebSocket handshake failed: {status}")
+        sock.settimeout(None)
+        self._sock, self._rfile = sock, rfile
+        self._reader = threading.Thread(
+            target=self._read_loop, args=(sock, rfile), name="surreal-ws-reader", daemon=True
+        )
+        self._reader.start()
+        self._counters["connects"] += 1
+
+    def _ensure_connected(self) -> None:
+        if self._ready or getattr(self._setting_up, "active", False):
+            return
+        with self._connect_lock:
+            if self._ready:
+                return
+            self._handshake()
+            if self.setup is not None:
+                self._setting_up.active = True
+                try:
+                    self.setup(self)
+                except Exception:
+                    self._drop(self._sock, WebSocketClosed("connection setup failed"))
+                    raise
+                finally:
+                    self._setting_up.active = False
+            self._ready = True
+
+    def _drop(self, sock, error: Exception) -> None:
+        """Close *sock* and fail every request still waiting on it."""
+        if sock is self._sock:
+            self._ready = False
+            self._sock = None
+            self._rfile = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+        with self._pending_lock:
+            failed = [fut for s, fut in self._pending.values() if s is sock]
+            self._pending = {k: v for k, v in self._pending.items() if v[0] is not sock}
+        for fut in failed:
+            if not fut.done():
+                fut.set_exception(error)
+
+    def close(self) -> None:
+        sock = self._sock
+        if sock is None:
+            return
+        try:
+            with self._send_lock:
+                sock.sendall(encode_frame(OP_CLOSE, b""))
+        except OSError:
+            pass
+        self._drop(sock, WebSocketClosed("client closed"))
+
+    # --- reading -----------------------------------------------------------
+
+    def _read_loop(self, sock, rfile) -> None:
+        message = bytearray()
+        try:
+            while True:
+                fin, opcode, payload = read_frame(rfile)
+                if opcode == OP_PING:
+                    with self._send_lock:
+                        sock.sendall(encode_frame(OP_PONG, payload))
+                    continue
+                if opcode == OP_CLOSE:
+                    raise WebSocketClosed("server closed the connection")
+                if opcode in (OP_TEXT, OP_BINARY, OP_CONT):
+                    message += payload
+                    if fin:
+                        self._dispatch(bytes(message))
+                        message.clear()
+        except Exception as e:
+            error = e if isinstance(e, WebSocketClosed) else WebSocketClosed(str(e))
+            self._drop(sock, error)
+
+    def _dispatch(self, raw: bytes) -> None:
+        try:
+            body = json.loads(raw.decode("utf-8"))
+        except ValueError:
+            return
+        with self._pending_lock:
+            entry = self._pending.pop(body.get("id"), None)
+        if entry is not None and not entry[1].done():
+            entry[1].set_result(body)
+
+    # --- requests ----------------------------------------------------------
+
+    def call_async(self, method: str, params: list) -> Future:
+        """Send an RPC request; the future resolves to the raw response dict."""
+        self._ensure_connected()
+        sock = self._sock
+        fut: Future = Future()
+        if sock is None:
+            fut.set_exception(WebSocketClosed("not connected"))
+            return fut
+        req_id = next(self._ids)
+        frame = encode_frame(
+            OP_TEXT,
+            json.dumps({"id": req_id, "method": method, "params": params},
+                       ensure_ascii=False).encode("utf-8"),
+        )
+        with self._pending_lock:
+            self._pending[req_id] = (sock, fut)
+            self._counters["requests"] += 1
+            self._counters["max_in_flight"] = max(
+                self._counters["max_in_flight"], len(self._pending)
+            )
+        try:
+            with self._send_lock:
+                sock.sendall(frame)
+        except OSError as e:
+            self._drop(sock, WebSocketClosed(str(e)))
+        return fut
+
+    def call(self, method: str, params: list, timeout: float = 120) -> dict:
+        """Send an RPC request and wait for its response dict."""
+        fut = self.call_async(method, params)
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            with self._pending_lock:
+                for req_id, (_, pending) in list(self._pending.items()):
+                    if pending is fut:
+                        del self._pending[req_id]
+            self._counters["errors"] += 1
+            raise TimeoutError(f"RPC {method} timed out after {timeout}s")
+
+    def stats(self) -> dict:
+        with self._pending_lock:
+            snap = dict(self._counters)
+            snap["in_flight"] = len(self._pending)
+        return snap
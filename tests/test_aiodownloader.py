@@ -0,0 +1,134 @@
+"""Unit tests for hkex_scraper.aiodownloader against a local HTTP server."""
+
+import asyncio
+import gzip
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hkex_scraper.aiodownloader import AsyncDocumentFetcher
+from hkex_scraper.httppool import HttpError
+
+PDF = b"%PDF-1.7 " + bytes(range(256)) * 400
+HTML = b"<html><body>" + b"<p>announcement</p>" * 5000 + b"</body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.path == "/old.pdf":
+            self.send_response(301)
+            self.send_header("Location", "/doc.pdf")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path in ("/empty.pdf", "/cached.pdf"):
+            # Keep-alive with no Content-Length: only the status says there is no body
+            self.send_response(204 if self.path == "/empty.pdf" else 304)
+            self.end_headers()
+            return
+        if self.path == "/continue.pdf":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            self.path = "/doc.pdf"
+        if self.path == "/chunked.pdf":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(PDF), 10_000):
+                part = PDF[i:i + 10_000]
+                self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        status, body, encoding = 200, PDF, ""
+        if self.path == "/page.htm":
+            body, encoding = gzip.compress(HTML), "gzip"
+        elif self.path != "/doc.pdf":
+            status, body = 404, b"missing"
+        self.send_response(status)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.daemon_threads = True
+    srv.connections = set()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_fetches_share_connections(base_url):
+    async def main():
+        fetcher = AsyncDocumentFetcher(concurrency=8)
+        results = await asyncio.gather(*(fetcher.fetch(f"{base_url}/doc.pdf") for _ in range(40)))
+        await fetcher.aclose()
+        return fetcher.stats(), results
+
+    stats, results = _run(main())
+    assert all(r[0] == PDF and r[1] == hashlib.md5(PDF).hexdigest() for r in results)
+    assert stats["downloads"] == 40
+    assert stats["connections_opened"] <= 8
+    assert stats["connections_reused"] >= 32
+
+
+def test_chunked_gzip_and_redirect(base_url):
+    async def main():
+        fetcher = AsyncDocumentFetcher()
+        chunked = await fetcher.fetch(f"{base_url}/chunked.pdf")
+        html = await fetcher.fetch(f"{base_url}/page.htm")
+        moved = await fetcher.fetch(f"{base_url}/old.pdf")
+        return chunked, html, moved
+
+    chunked, html, moved = _run(main())
+    assert chunked[0] == PDF
+    assert html[0] == HTML and html[1] == hashlib.md5(HTML).hexdigest()
+    assert moved[0] == PDF
+
+
+def test_size_cap_and_http_error(base_url):
+    async def main():
+        fetcher = AsyncDocumentFetcher(max_size=1000)
+        too_large = await fetcher.fetch(f"{base_url}/chunked.pdf")
+        with pytest.raises(HttpError) as exc:
+            await fetcher.fetch(f"{base_url}/gone.pdf")
+        return too_large, exc.value.status
+
+    too_large, status = _run(main())
+    assert too_large[2] == "too_large"
+    assert status == 404
+
+
+def test_bodyless_statuses_keep_the_connection(base_url):
+    async def main():
+        fetcher = AsyncDocumentFetcher(timeout=5)
+        empty = await fetcher.fetch(f"{base_url}/empty.pdf")
+        with pytest.raises(HttpError) as exc:
+            await fetcher.fetch(f"{base_url}/cached.pdf")
+        after_interim = await fetcher.fetch(f"{base_url}/continue.pdf")
+        doc = await fetcher.fetch(f"{base_url}/doc.pdf")
+        await fetcher.aclose()
+        return fetcher.stats(), empty, exc.value.status, after_interim, doc
+
+    stats, empty, status, after_interim, doc = _run(main())
+    assert empty[0] == b"" and empty[2] == ""
+    assert status == 304
+    assert after_interim[0] == PDF and doc[0] == PDF
+    assert stats["connections_opened"] == 1
@@ -0,0 +1,190 @@
+"""Unit tests for hkex_scraper.api — uses a fake HKEx session, no network required."""
+
+import json
+from datetime import datetime, timedelta
+
+from hkex_scraper.api import (
+    PROBE_ROWS,
+    _iter_json_array,
+    fetch_chunk_adaptive,
+    fetch_chunk_via_api,
+    plan_next_row_range,
+)
+
+
+class _FakeResponse:
+    status_code = 200
+    elapsed = timedelta(milliseconds=5)
+
+    def __init__(self, text="", payload=None):
+        self.text = text
+        self._payload = payload
+        self.headers = {}
+        self.content = (json.dumps(payload) if payload is not None else text).encode()
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class FakeHkexSession:
+    """Serves ``total`` records, re-sending the whole prefix like the real servlet."""
+
+    def __init__(self, total, page_cap=0):
+        self.total = total
+        self.page_cap = page_cap
+        self.row_ranges = []
+        self._served = 0
+
+    def _record(self, i):
+        return {
+            "STOCK_CODE": f"{i % 9000 + 1:05d}",
+            "STOCK_NAME": "TEST CO",
+            "TITLE": f"Announcement {i}",
+            "DATE_TIME": "11/02/2026 19:10",
+            "FILE_LINK": f"/listedco/{i}.pdf",
+            "TOTAL_COUNT": str(self.total),
+        }
+
+    def get(self, url, params=None, **_kwargs):
+        if "rowRange" in (params or {}) and params.get("fromDate"):
+            row_range = int(params["rowRange"])
+            self.row_ranges.append(row_range)
+            n = min(row_range, self.total)
+            if self.page_cap:
+                n = min(n, self._served + self.page_cap)
+            self._served = n
+            records = [self._record(i) for i in range(n)]
+            return _FakeResponse(
+                payload={
+                    "result": json.dumps(records) if records else "null",
+                    "hasNextRow": n < self.total,
+                }
+            )
+        return _FakeResponse(text='<form action="/search/x"></form>')
+
+    def post(self, *_args, **_kwargs):
+        return _FakeResponse()
+
+
+class TestPlanNextRowRange:
+    def test_probe_first(self):
+        assert plan_next_row_range(0, None) == PROBE_ROWS
+
+    def test_probe_respects_max_records(self):
+        assert plan_next_row_range(0, None, max_records=10) == 10
+
+    def test_single_request_for_remainder(self):
+        assert plan_next_row_range(100, 15000) == 15000
+
+    def test_steps_by_page_cap(self):
+        assert plan_next_row_range(5000, 15000, page_cap=5000) == 10000
+
+
+class TestIterJsonArray:
+    def test_skips_prefix(self):
+        raw = json.dumps([{"a": i} for i in range(5)])
+        assert [i for i, _ in _iter_json_array(raw, skip=3)] == [3, 4]
+
+    def test_empty_array(self):
+        assert list(_iter_json_array("[]")) == []
+
+
+class TestFetchChunkViaApi:
+    def test_two_requests_for_large_chunk(self):
+        session = FakeHkexSession(total=15000)
+        stats = {}
+        records = fetch_chunk_via_api(session, "20260201", "20260228", stats=stats)
+        assert len(records) == 15000
+        assert session.row_ranges == [PROBE_ROWS, 15000]
+        assert stats["requests"] == 2
+        assert records[-1]["title"] == "Announcement 14999"
+
+    def test_small_chunk_single_request(self):
+        session = FakeHkexSession(total=40)
+        records = fetch_chunk_via_api(session, "20260201", "20260228")
+        assert len(records) == 40
+        assert session.row_ranges == [PROBE_ROWS]
+
+    def test_server_page_cap(self):
+        session = FakeHkexSession(total=12000, page_cap=5000)
+        records = fetch_chunk_via_api(session, "20260201", "20260228")
+        assert len(records) == 12000
+        assert len({r["title"] for r in records}) == 12000
+
+    def test_max_records(self):
+        session = FakeHkexSession(total=15000)
+        records = fetch_chunk_via_api(session, "20260201", "20260228", max_records=250)
+        assert len(records) == 250
+
+
+class DatedFakeSession(FakeHkexSession):
+    """Serves ``per_day[date]`` records for each day in the requested window."""
+
+    def __init__(self, per_day):
+        super().__init__(total=0)
+        self.per_day = per_day
+        self.windows = []
+
+    def get(self, url, params=None, **kwargs):
+        if "rowRange" in (params or {}) and params.get("fromDate"):
+            start = datetime.strptime(params["fromDate"], "%Y%m%d")
+            end = datetime.strptime(params["toDate"], "%Y%m%d")
+            days = []
+            day = end
+            while day >= start:
+                days.append(day)
+                day -= timedelta(days=1)
+            self.total = sum(self.per_day.get(d, 0) for d in days)
+            self._days = days
+            if (params["fromDate"], params["toDate"]) not in self.windows:
+                self.windows.append((params["fromDate"], params["toDate"]))
+        return super().get(url, params, **kwargs)
+
+    def _record(self, i):
+        for day in self._days:
+            n = self.per_day.get(day, 0)
+            if i < n:
+                rec = super()._record(i)
+                rec["DATE_TIME"] = day.strftime("%d/%m/%Y") + " 12:00"
+                rec["TITLE"] = f"Announcement {i}"
+                return rec
+            i -= n
+        raise IndexError(i)
+
+
+class TestFetchChunkAdaptive:
+    def _month(self, busy_days=(), busy=4000, quiet=50):
+        return {
+            datetime(2026, 3, d): (busy if d in busy_days else quiet)
+            for d in range(1, 32)
+        }
+
+    def test_quiet_month_single_window(self):
+        per_day = self._month()
+        session = DatedFakeSession(per_day)
+        stats = {}
+        records = fetch_chunk_adaptive(
+            session, datetime(2026, 3, 1), datetime(2026, 3, 31),
+            target_records=5000, stats=stats,
+        )
+        assert len(records) == sum(per_day.values())
+        assert stats["windows"] == 1
+
+    def test_busy_month_is_split_within_budget(self):
+        per_day = self._month(busy_days=range(25, 32))
+        session = DatedFakeSession(per_day)
+        stats = {}
+        records = fetch_chunk_adaptive(
+            session, datetime(2026, 3, 1), datetime(2026, 3, 31),
+            target_records=5000, stats=stats,
+        )
+        assert len(records) == sum(per_day.values())
+        assert stats["windows"] > 1
+        # Newest first across windows
+        dates = [datetime.strptime(r["date"], "%d/%m/%Y") for r in records]
+        assert dates == sorted(dates, reverse=True)
+        # Quiet days after the busy week are merged into one window
+        assert session.windows[-1] == ("20260301", "20260323")
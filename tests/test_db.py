@@ -0,0 +1,93 @@
+"""Unit tests for hkex_scraper.db auth handling against a local fake SurrealDB."""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hkex_scraper import db
+from hkex_scraper.httppool import HttpConnectionPool
+
+
+def _jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"eyJhbGciOiJIUzUxMiJ9.{payload}.sig"
+
+
+class _FakeSurreal(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        srv = self.server
+        if self.path == "/signin":
+            srv.signins += 1
+            if not srv.signin_enabled:
+                return self._reply(404, {"error": "not found"})
+            srv.token = _jwt(time.time() + srv.token_ttl) + str(srv.signins)
+            return self._reply(200, {"code": 200, "token": srv.token})
+        auth = self.headers.get("Authorization", "")
+        srv.auth_seen.append(auth.split(" ")[0])
+        if auth.startswith("Bearer ") and auth != f"Bearer {srv.token}":
+            return self._reply(401, {"error": "expired"})
+        return self._reply(200, [{"status": "OK", "result": 1}])
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def surreal(monkeypatch):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeSurreal)
+    srv.signins = 0
+    srv.signin_enabled = True
+    srv.token = ""
+    srv.token_ttl = 3600
+    srv.auth_seen = []
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(db, "_pool", HttpConnectionPool(f"http://127.0.0.1:{srv.server_address[1]}"))
+    db.set_auth_mode("token")
+    yield srv
+    db.set_auth_mode(db.SURREAL_AUTH)
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_token_is_cached(surreal):
+    for _ in range(3):
+        assert db.surreal_query("RETURN 1;")[0]["status"] == "OK"
+    assert surreal.signins == 1
+    assert surreal.auth_seen == ["Bearer"] * 3
+
+
+def test_token_refreshed_before_expiry(surreal):
+    surreal.token_ttl = 30  # inside TOKEN_REFRESH_MARGIN
+    db.surreal_query("RETURN 1;")
+    db.surreal_query("RETURN 1;")
+    assert surreal.signins == 2
+
+
+def test_rejected_token_signs_in_again(surreal):
+    db.surreal_query("RETURN 1;")
+    surreal.token = "revoked"
+    assert db.surreal_query("RETURN 1;")[0]["status"] == "OK"
+    assert surreal.signins == 2
+
+
+def test_falls_back_to_basic(surreal):
+    surreal.signin_enabled = False
+    assert db.surreal_query("RETURN 1;")[0]["status"] == "OK"
+    db.surreal_query("RETURN 1;")
+    assert surreal.signins == 2  # root and database-user attempts, once
+    assert surreal.auth_seen == ["Basic", "Basic"]
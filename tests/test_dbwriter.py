@@ -0,0 +1,101 @@
+"""Unit tests for hkex_scraper.dbwriter."""
+
+import pytest
+
+from hkex_scraper import dbwriter
+from hkex_scraper.dbwriter import CoalescingWriter
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """Record each multi-statement request; statements containing FAIL return ERR."""
+    sent = []
+
+    def fake(sql, vars, timeout=120):
+        sent.append((sql.split("\n"), dict(vars)))
+        ok, failed = {"status": "OK", "result": []}, {"status": "ERR", "result": "bad row"}
+        return [failed if "FAIL" in stmt else ok for stmt in sql.split("\n")]
+
+    monkeypatch.setattr(dbwriter, "surreal_query_statements", fake)
+    return sent
+
+
+def _add(writer, key, results, fallbacks, sql=None, vars=None):
+    def fallback():
+        fallbacks.append(key)
+        return True, "alone"
+
+    writer.add(key, sql or f"UPDATE {key};", vars, fallback, lambda r: results.append((key, r)))
+
+
+def test_rows_share_one_request(requests):
+    writer = CoalescingWriter()
+    results, fallbacks = [], []
+    for i in range(5):
+        _add(writer, f"r{i}", results, fallbacks, vars={f"r{i}_text": "x"})
+    writer.flush()
+    assert len(requests) == 1
+    assert requests[0][1] == {f"r{i}_text": "x" for i in range(5)}
+    assert results == [(f"r{i}", (True, "")) for i in range(5)]
+    assert fallbacks == []
+
+
+def test_failed_rows_fall_back_alone(requests):
+    writer = CoalescingWriter()
+    results, fallbacks = [], []
+    _add(writer, "a", results, fallbacks)
+    _add(writer, "b", results, fallbacks, sql="FAIL;")
+    _add(writer, "c", results, fallbacks)
+    writer.flush()
+    assert fallbacks == ["b"]
+    assert dict(results) == {"a": (True, ""), "b": (True, "alone"), "c": (True, "")}
+    assert writer.counters["row_failures"] == 1
+
+
+def test_failed_request_falls_back_for_every_row(monkeypatch):
+    monkeypatch.setattr(dbwriter, "surreal_query_statements", lambda *a, **k: {"error": "HTTP 413"})
+    writer = CoalescingWriter()
+    results, fallbacks = [], []
+    _add(writer, "a", results, fallbacks)
+    _add(writer, "b", results, fallbacks)
+    writer.flush()
+    assert fallbacks == ["a", "b"]
+    assert writer.counters["request_failures"] == 1
+
+
+def test_flushes_on_size_and_repeated_vars(requests):
+    writer = CoalescingWriter(max_bytes=400)
+    results, fallbacks = [], []
+    for i in range(4):
+        _add(writer, f"r{i}", results, fallbacks, vars={f"r{i}_text": "x" * 100})
+    _add(writer, "dup", results, fallbacks, vars={"r3_text": "y"})
+    writer.flush()
+    assert [len(stmts) for stmts, _ in requests] == [2, 2]
+    assert fallbacks == ["dup"]  # a lone row is written by its fallback
+    assert len(results) == 5
+
+
+def test_rows_added_by_callbacks_are_flushed(requests):
+    writer = CoalescingWriter()
+    results, fallbacks = [], []
+
+    def fallback():
+        return False, "save_error"
+
+    def on_done(result):
+        results.append(result)
+        if not result[0]:
+            _add(writer, "status", results, fallbacks)
+
+    writer.add("doc", "FAIL;", None, fallback, on_done)
+    _add(writer, "other", results, fallbacks)
+    writer.flush()
+    assert len(writer) == 0
+    assert fallbacks == ["status"]
+
+
+def test_due_after_max_delay():
+    writer = CoalescingWriter(max_delay=0)
+    assert writer.seconds_until_due() is None
+    writer.add("a", "UPDATE a;", None, lambda: (True, ""), lambda r: None)
+    assert writer.seconds_until_due() == 0
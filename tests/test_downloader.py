@@ -0,0 +1,138 @@
+"""Unit tests for hkex_scraper.downloader against a local keep-alive HTTP server."""
+
+import gzip
+import hashlib
+import http.client
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hkex_scraper.downloader import DocumentDownloader, read_capped
+from hkex_scraper.httppool import HttpError
+from hkex_scraper.stages import BudgetHold, ByteBudget
+
+
+class _Response(io.BytesIO):
+    def __init__(self, body: bytes, content_length: int | None = None) -> None:
+        super().__init__(body)
+        self.headers = {} if content_length is None else {"Content-Length": str(content_length)}
+
+
+class TestReadCapped:
+    BODY = bytes(range(256)) * 4000  # ~1 MB
+
+    def test_known_length_is_hashed(self):
+        content, digest, reason = read_capped(_Response(self.BODY, len(self.BODY)), 2_000_000)
+        assert content == self.BODY and reason == ""
+        assert isinstance(content, bytearray)  # the read buffer, not a copy
+        assert digest == hashlib.md5(self.BODY).hexdigest()
+
+    def test_unknown_length_is_hashed(self):
+        content, digest, _reason = read_capped(_Response(self.BODY), 2_000_000)
+        assert content == self.BODY
+        assert digest == hashlib.md5(self.BODY).hexdigest()
+
+    def test_declared_length_over_cap_reads_nothing(self):
+        resp = _Response(self.BODY, len(self.BODY))
+        assert read_capped(resp, 1000) == (b"", "", "too_large")
+        assert resp.tell() == 0
+
+    def test_unknown_length_aborts_at_cap(self):
+        resp = _Response(self.BODY * 10)
+        assert read_capped(resp, 300_000)[2] == "too_large"
+        assert resp.tell() < 600_000  # stopped long before the end
+
+    def test_known_length_is_charged_without_waiting(self):
+        budget = ByteBudget(1000)
+        stop = threading.Event()
+        assert budget.acquire(1000, stop)  # full: a wait here would never end
+        hold = BudgetHold(budget, stop)
+        read_capped(_Response(self.BODY, len(self.BODY)), 2_000_000, hold=hold)
+        assert hold.held == len(self.BODY) and budget.used == 1000 + len(self.BODY)
+
+    def test_short_body_raises(self):
+        with pytest.raises(http.client.IncompleteRead):
+            read_capped(_Response(b"abc", 10), 1000)
+
+
+HTML = b"<html><body>" + b"<p>announcement</p>" * 5000 + b"</body></html>"
+PDF = b"%PDF-1.7 " + bytes(range(256)) * 400
+
+
+class _DocHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.path == "/old.pdf":
+            self.send_response(302)
+            self.send_header("Location", "/doc.pdf")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        status, body, encoding = 200, PDF, ""
+        if self.path == "/page.htm":
+            body = HTML
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body, encoding = gzip.compress(HTML), "gzip"
+        elif self.path != "/doc.pdf":
+            status, body = 404, b"missing"
+        self.send_response(status)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def doc_server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _DocHandler)
+    srv.connections = set()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", srv
+    srv.shutdown()
+    srv.server_close()
+
+
+class TestDocumentDownloader:
+    def test_connection_is_kept_alive(self, doc_server):
+        base, srv = doc_server
+        dl = DocumentDownloader(per_host=2)
+        for _ in range(4):
+            content, digest, reason, timings = dl.fetch(f"{base}/doc.pdf")
+            assert content == PDF and reason == ""
+            assert digest == hashlib.md5(PDF).hexdigest()
+        stats = dl.stats()
+        assert stats["downloads"] == 4
+        assert stats["connections_opened"] == 1
+        assert len(srv.connections) == 1
+        assert set(timings) == {"connect", "ttfb", "transfer"}
+
+    def test_html_is_gzipped_and_decoded(self, doc_server):
+        base, _ = doc_server
+        dl = DocumentDownloader()
+        content, digest, _, _ = dl.fetch(f"{base}/page.htm")
+        assert content == HTML
+        assert digest == hashlib.md5(HTML).hexdigest()
+        assert dl.stats()["gzipped"] == 1
+
+    def test_gzip_is_capped_on_decoded_size(self, doc_server):
+        base, _ = doc_server
+        assert DocumentDownloader(max_size=10_000).fetch(f"{base}/page.htm")[2] == "too_large"
+
+    def test_redirect_is_followed(self, doc_server):
+        base, _ = doc_server
+        assert DocumentDownloader().fetch(f"{base}/old.pdf")[0] == PDF
+
+    def test_http_error(self, doc_server):
+        base, _ = doc_server
+        with pytest.raises(HttpError) as exc:
+            DocumentDownloader().fetch(f"{base}/gone.pdf")
+        assert exc.value.status == 404
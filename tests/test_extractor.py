@@ -0,0 +1,99 @@
+"""Unit tests for hkex_scraper.extractor helpers that need no PDF libraries."""
+
+import sys
+from types import SimpleNamespace
+
+from hkex_scraper import extractor
+from hkex_scraper.extractor import (
+    _count_rulings,
+    _ruled_table_pages,
+    _table_from_rows,
+    _table_quality_issue,
+)
+
+
+def _pt(x, y):
+    return SimpleNamespace(x=x, y=y)
+
+
+def _rect(w, h):
+    return SimpleNamespace(x0=0, y0=0, x1=w, y1=h, width=w, height=h)
+
+
+def _page(number, drawings):
+    return SimpleNamespace(number=number, get_drawings=lambda: drawings)
+
+
+GRID = [{"color": (0, 0, 0), "items": [
+    ("l", _pt(0, 0), _pt(200, 0)),
+    ("l", _pt(0, 50), _pt(200, 50)),
+    ("l", _pt(0, 0), _pt(0, 50)),
+    ("l", _pt(200, 0), _pt(200, 50)),
+]}]
+UNDERLINE = [{"color": (0, 0, 0), "items": [("l", _pt(0, 10), _pt(300, 10))]}]
+SHADING = [{"color": None, "fill": (0.9, 0.9, 0.9), "items": [("re", _rect(200, 40))]}]
+
+
+def test_count_rulings():
+    assert _count_rulings(GRID) == (2, 2)
+    assert _count_rulings(UNDERLINE) == (1, 0)
+    assert _count_rulings(SHADING) == (0, 0)
+    assert _count_rulings([{"color": (0, 0, 0), "items": [("re", _rect(80, 20))]}]) == (2, 2)
+
+
+def test_only_ruled_pages_are_candidates():
+    doc = [_page(0, UNDERLINE), _page(1, GRID), _page(2, SHADING), _page(3, GRID + UNDERLINE)]
+    assert _ruled_table_pages(doc) == [2, 4]
+
+
+def test_camelot_skipped_without_candidate_pages(monkeypatch):
+    monkeypatch.setattr(extractor, "CAMELOT_AVAILABLE", True)
+    assert extractor._extract_tables_with_camelot(b"", "unused.pdf", pages=[]) == []
+
+
+def test_camelot_reads_candidate_pages_in_one_call(monkeypatch):
+    calls = []
+    fake = SimpleNamespace(read_pdf=lambda path, pages, flavor: calls.append((path, pages)) or [])
+    monkeypatch.setattr(extractor, "CAMELOT_AVAILABLE", True)
+    monkeypatch.setattr(extractor, "camelot", fake, raising=False)
+    assert extractor._extract_tables_with_camelot(b"", "doc.pdf", pages=[3, 7]) == []
+    assert calls == [("doc.pdf", "3,7")]
+
+
+# Vertical rulings of a three-column table spanning x = 0..300, y = 0..100
+THREE_COLUMNS = [(x, 0, x, 100) for x in (0, 100, 200, 300)]
+
+
+def test_clean_pymupdf_table_passes_quality_check():
+    rows = [["Name", "Shares", "%"], ["A Ltd", "1,000", "5.0"], ["B Ltd", "2,000", "10.0"]]
+    assert _table_quality_issue(rows, (0, 0, 300, 100), THREE_COLUMNS) == ""
+
+
+def test_quality_check_flags_merged_cells_and_column_mismatch():
+    bbox = (0, 0, 300, 100)
+    merged_header = [["Holder", None, "%"], ["A Ltd", "1,000", "5.0"]]
+    assert _table_quality_issue(merged_header, bbox, THREE_COLUMNS) == "merged_cells"
+    two_columns = [["Name", "Shares"], ["A Ltd", "1,000"]]
+    assert _table_quality_issue(two_columns, bbox, THREE_COLUMNS) == "column_mismatch"
+    assert _table_quality_issue([["Name", "Shares"]], bbox, THREE_COLUMNS) == "too_small"
+
+
+def test_table_from_rows_records_engine_and_page():
+    table = _table_from_rows([["Name", ""], ["A  Ltd", None], ["", ""]], 4, "pymupdf")
+    assert table["engine"] == "pymupdf"
+    assert table["pageNumber"] == 4
+    assert table["headers"] == ["Name", "Col2"]
+    assert table["rowCount"] == 1
+
+
+def test_extract_file_leaves_stderr_alone(monkeypatch, tmp_path):
+    # Runs on the pipeline's extractor threads: sys.stderr is process-wide
+    seen = []
+    monkeypatch.setattr(
+        extractor, "extract_content_with_tables",
+        lambda raw, url, text_only=False, path="": seen.append(sys.stderr) or ("", []),
+    )
+    doc = tmp_path / "a.htm"
+    doc.write_bytes(b"<p>x</p>")
+    assert extractor.extract_file_with_tables(str(doc), "a.htm") == ("", [])
+    assert seen == [sys.stderr]
@@ -0,0 +1,96 @@
+"""Unit tests for hkex_scraper.httppool against a local keep-alive HTTP server."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hkex_scraper import db
+from hkex_scraper.httppool import HttpConnectionPool, HttpError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.connections.add(self.client_address)
+        if self.path.endswith("/fail"):
+            status, payload = 413, b"too large"
+        elif self.path.endswith("/sql"):
+            status = 200
+            payload = json.dumps([{"status": "OK", "result": [body.decode()]}]).encode()
+        else:
+            status, payload = 200, body
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        if self.path.endswith("/close"):
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(payload)
+        if self.path.endswith("/drop"):
+            # Close without telling the client, like an idle-timeout on the server
+            self.close_connection = True
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.connections = set()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _url(srv):
+    return f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def test_connections_are_reused(server):
+    pool = HttpConnectionPool(_url(server), size=2)
+    for i in range(5):
+        assert pool.request("POST", "/echo", body=str(i).encode()) == str(i).encode()
+    stats = pool.stats()
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 4
+    assert len(server.connections) == 1
+
+
+def test_http_error_keeps_status_and_body(server):
+    pool = HttpConnectionPool(_url(server))
+    with pytest.raises(HttpError) as exc:
+        pool.request("POST", "/fail", body=b"x")
+    assert exc.value.status == 413
+    assert exc.value.body == b"too large"
+    assert pool.stats()["errors"] == 1
+
+
+def test_server_close_is_not_reused(server):
+    pool = HttpConnectionPool(_url(server))
+    pool.request("POST", "/close", body=b"a")
+    pool.request("POST", "/echo", body=b"b")
+    assert pool.stats()["connections_opened"] == 2
+
+
+def test_stale_connection_is_retried(server):
+    pool = HttpConnectionPool(_url(server))
+    pool.request("POST", "/drop", body=b"a")
+    assert pool.request("POST", "/echo", body=b"b") == b"b"
+    stats = pool.stats()
+    assert stats["retries"] == 1
+    assert stats["connections_opened"] == 2
+
+
+def test_surreal_query_uses_pool(server, monkeypatch):
+    monkeypatch.setattr(db, "_pool", HttpConnectionPool(_url(server)))
+    monkeypatch.setattr(db, "_auth_mode", "basic")
+    assert db.surreal_query("SELECT 1;") == [{"status": "OK", "result": ["SELECT 1;"]}]
+    assert db.surreal_query("SELECT 2;")[0]["result"] == ["SELECT 2;"]
+    assert db.get_http_stats()["connections_opened"] == 1
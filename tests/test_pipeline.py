@@ -0,0 +1,688 @@
+"""Unit tests for hkex_scraper.pipeline helpers that need no database."""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from hkex_scraper import pipeline, state
+from hkex_scraper.pipeline import (
+    QueueWindows,
+    _batched_by_bytes,
+    _claim_due_retries_sql,
+    _claim_page_sql,
+    _download_document,
+    _filing_id,
+    _filing_retry_sql,
+    _filing_to_row,
+    _is_transient,
+    _iter_changed_filings,
+    _iter_fetched_chunks,
+    _load_known_filings,
+    _plan_phase1_windows,
+    _reclaim_expired_sql,
+    _remove_file,
+    _retry_delay,
+    _save_metadata_rows,
+    _spool_document,
+    _window_checkpoint,
+)
+from hkex_scraper.ratelimit import AimdLimiter
+from hkex_scraper.stages import BudgetHold, ByteBudget
+
+
+class TestQueueWindowSql:
+    TODAY = datetime(2026, 2, 11)
+
+    def test_window_is_a_plain_date_range(self):
+        windows = QueueWindows(50, today=self.TODAY)
+        assert windows.where().endswith("AND filingDate >= d'2026-02-10'")
+        windows.advance([])
+        where = windows.where()
+        assert where.startswith(pipeline.QUEUE_WHERE)
+        assert where.endswith("filingDate >= d'2026-02-06' AND filingDate < d'2026-02-10'")
+        # An OR or a <datetime> cast would turn the range scan into a table scan
+        assert " OR " not in where and "<datetime>" not in where
+
+    def test_full_page_keeps_the_window(self):
+        windows = QueueWindows(2, today=self.TODAY)
+        where = windows.where()
+        windows.advance([{"id": "a"}, {"id": "b"}])
+        assert windows.where() == where and windows.found == 2
+
+    def test_undated_rows_come_last(self):
+        windows = QueueWindows(50, today=self.TODAY)
+        windows.lower = pipeline.QUEUE_FIRST_DATE
+        windows.advance([])
+        assert windows.where().endswith("AND filingDate IS NONE")
+        windows.advance([])
+        assert windows.done
+
+
+class _FakeQueue:
+    """Unclaimed filings, claimed the way ``_claim_page_sql`` does for a window."""
+
+    def __init__(self, rows):
+        self.rows = {fid: date for fid, date in rows}
+
+    def claim(self, batch, windows):
+        def inside(date):
+            if windows.lower is None:
+                return date is None
+            if date is None or date < windows.lower:
+                return False
+            return windows.upper is None or date < windows.upper
+
+        page = sorted(
+            (fid for fid, date in self.rows.items() if inside(date)),
+            key=lambda fid: (self.rows[fid], fid),
+            reverse=True,
+        )[:batch]
+        for fid in page:
+            del self.rows[fid]
+        return [{"id": fid} for fid in page]
+
+
+class TestQueueWindows:
+    TODAY = datetime(2026, 2, 11)
+
+    def _walk(self, rows, batch):
+        queue = _FakeQueue(rows)
+        windows = QueueWindows(batch, today=self.TODAY)
+        claimed, pages = [], 0
+        while not windows.done:
+            page = queue.claim(batch, windows)
+            claimed += [r["id"] for r in page]
+            windows.advance(page)
+            pages += 1
+            assert pages < 1000, "walk does not terminate"
+        return claimed, pages
+
+    def test_walk_claims_every_row_once_newest_first(self):
+        rows = []
+        # 25 filings on one day, so same-date ties span several pages
+        rows += [(f"tie-{i:02d}", datetime(2026, 2, 9)) for i in range(25)]
+        rows += [(f"d-{i:04d}", self.TODAY - timedelta(days=i % 400)) for i in range(1200)]
+        # A sparse stretch of old years and some undated rows
+        rows += [(f"old-{y}", datetime(y, 6, 30)) for y in range(1999, 2010)]
+        rows += [(f"none-{i}", None) for i in range(7)]
+        claimed, pages = self._walk(rows, batch=10)
+        assert sorted(claimed) == sorted(fid for fid, _ in rows)
+        assert len(set(claimed)) == len(claimed)
+        dates = dict(rows)
+        dated = [dates[fid] for fid in claimed if dates[fid] is not None]
+        assert dated == sorted(dated, reverse=True)
+        assert [fid for fid in claimed if dates[fid] is None] == claimed[-7:]
+        assert pages < 400
+
+    def test_windows_grow_over_empty_stretches(self):
+        claimed, pages = self._walk([("old", datetime(2000, 1, 3))], batch=50)
+        assert claimed == ["old"]
+        assert pages < 40
+
+
+class TestClaimSql:
+    def test_claim_rechecks_status_per_record(self):
+        sql = _claim_page_sql(50, QueueWindows(50), "node-a", 900)
+        assert sql.startswith(
+            "UPDATE (SELECT VALUE id FROM (SELECT id, filingDate FROM exchange_filing"
+        )
+        assert "claimedBy = 'node-a'" in sql
+        assert "leaseExpiresAt = time::now() + 900s" in sql
+        assert ") SET " in sql and "WHERE documentStatus IS NONE RETURN" in sql
+
+    def test_claim_stays_inside_the_window(self):
+        windows = QueueWindows(50, today=datetime(2026, 2, 11))
+        windows.advance([])
+        sql = _claim_page_sql(50, windows, "node-a", 900)
+        assert "filingDate >= d'2026-02-06' AND filingDate < d'2026-02-10'" in sql
+
+    def test_reclaim_only_expired_leases(self):
+        sql = _reclaim_expired_sql(20, "node-b", 600)
+        assert sql.count("leaseExpiresAt < time::now()") == 2
+        assert "claimedBy = 'node-b'" in sql
+
+    def test_claim_due_retries(self):
+        sql = _claim_due_retries_sql(20, "node-b", 600)
+        assert sql.count("documentStatus = 'retry' AND nextAttemptAt <= time::now()") == 2
+        assert "documentAttempts" in sql
+
+
+class TestRetries:
+    def test_transient_reasons(self):
+        for reason in ("http_503", "http_429", "error:TimeoutError", "save_error:timeout"):
+            assert _is_transient(reason)
+        for reason in ("unsupported_type", "too_large", "http_404", "extract_timeout"):
+            assert not _is_transient(reason)
+
+    def test_backoff_doubles_up_to_cap(self, monkeypatch):
+        monkeypatch.setattr(pipeline, "PHASE2_RETRY_BASE_SECONDS", 60)
+        monkeypatch.setattr(pipeline, "PHASE2_RETRY_MAX_SECONDS", 300)
+        assert [_retry_delay(n) for n in range(1, 6)] == [60, 120, 240, 300, 300]
+
+    def test_retry_sql(self):
+        sql = _filing_retry_sql("123", "http_503", 2)
+        assert "documentStatus = 'retry'" in sql
+        assert "documentAttempts = 2" in sql
+        assert f"nextAttemptAt = time::now() + {_retry_delay(2)}s" in sql
+
+
+class _FakeDownloader:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.in_flight = []  # limiter slots in use when each fetch started
+
+    def fetch(self, url, hold):
+        self.in_flight.append(self.limiter.stats()["in_flight"])
+        hold.grow(10)
+        return b"x" * 10, "md5", "", {"ttfb": 0.1}
+
+
+class TestDownloadDocument:
+    URL = "https://www1.hkexnews.hk/listedco/doc.pdf"
+
+    def _setup(self, monkeypatch):
+        limiter = AimdLimiter("test", initial=2, minimum=1, maximum=2)
+        downloader = _FakeDownloader(limiter)
+        monkeypatch.setattr(pipeline, "HKEX_LIMITER", limiter)
+        monkeypatch.setattr(pipeline, "_get_downloader", lambda: downloader)
+        return limiter, downloader
+
+    def test_waits_for_memory_before_taking_a_slot(self, monkeypatch):
+        limiter, downloader = self._setup(monkeypatch)
+        budget, stop = ByteBudget(100), threading.Event()
+        assert budget.acquire(100, stop)
+        hold = BudgetHold(budget, stop)
+        result = []
+        worker = threading.Thread(
+            target=lambda: result.append(_download_document(self.URL, "1", hold))
+        )
+        worker.start()
+        time.sleep(0.2)
+        assert not result and limiter.stats()["in_flight"] == 0
+        budget.release(100)
+        worker.join(2)
+        assert result[0][1:] == (10, "md5", "")
+        assert downloader.in_flight == [1] and hold.held == 10
+
+    def test_stop_while_waiting_is_not_a_limiter_failure(self, monkeypatch):
+        limiter, downloader = self._setup(monkeypatch)
+        budget, stop = ByteBudget(100), threading.Event()
+        assert budget.acquire(100, stop)
+        stop.set()
+        result = _download_document(self.URL, "1", BudgetHold(budget, stop))
+        assert result[3] == "error:DownloadAborted"
+        assert not downloader.in_flight
+        assert limiter.stats()["requests"] == 0 and limiter.stats()["failed"] == 0
+
+
+class TestPhase1Windows:
+    TODAY = datetime(2024, 3, 15)
+    JAN = (datetime(2024, 1, 1), datetime(2024, 1, 31))
+    FEB = (datetime(2024, 2, 1), datetime(2024, 2, 29))
+
+    def _checkpoints(self, monkeypatch, completed, incomplete=(), ranges=()):
+        """Completed windows from routine runs, plus *ranges* from --from/--to runs."""
+        recorded = [(w, state.KIND_ROUTINE) for w in completed]
+        recorded += [(w, state.KIND_RANGE) for w in ranges]
+
+        def load_completed(kinds=()):
+            return [w for w, kind in recorded if not kinds or kind in kinds]
+
+        monkeypatch.setattr(pipeline, "load_completed_windows", load_completed)
+        monkeypatch.setattr(state, "load_completed_windows", load_completed)
+        monkeypatch.setattr(pipeline, "load_incomplete_windows", lambda: list(incomplete))
+
+    def test_routine_run_resumes_from_watermark(self, monkeypatch):
+        old_failure = (datetime(2023, 11, 1), datetime(2023, 11, 30))
+        newer_partial = (datetime(2024, 2, 29), datetime(2024, 3, 1))
+        self._checkpoints(monkeypatch, [self.FEB, self.JAN], [old_failure, newer_partial])
+        dt_from, dt_to, chunks, skipped, watermark, retries = _plan_phase1_windows(self.TODAY)
+        assert watermark == dt_from == datetime(2024, 2, 29)
+        assert dt_to == self.TODAY
+        # Only incomplete windows older than the watermark are re-fetched
+        assert retries == [old_failure]
+        # 29 Feb is inside the completed February window
+        assert chunks == [(datetime(2024, 3, 1), self.TODAY), old_failure]
+        assert skipped == 1
+
+    def test_first_run_covers_previous_month(self, monkeypatch):
+        self._checkpoints(monkeypatch, [])
+        dt_from, _, chunks, _, watermark, _ = _plan_phase1_windows(datetime(2024, 1, 10))
+        assert watermark is None
+        assert dt_from == datetime(2023, 12, 1)
+        assert len(chunks) == 2
+
+    def test_range_run_does_not_move_watermark(self, monkeypatch):
+        old_range = (datetime(2005, 1, 1), datetime(2005, 1, 31))
+        self._checkpoints(monkeypatch, [], ranges=[old_range])
+        dt_from, _, chunks, _, watermark, _ = _plan_phase1_windows(self.TODAY)
+        assert watermark is None
+        assert dt_from == datetime(2024, 2, 1) and len(chunks) == 2
+        # A routine window still wins over a newer-looking range
+        recent_range = (datetime(2024, 3, 1), datetime(2024, 3, 14))
+        self._checkpoints(monkeypatch, [self.JAN], ranges=[old_range, recent_range])
+        _, _, chunks, _, watermark, _ = _plan_phase1_windows(self.TODAY)
+        assert watermark == self.JAN[1]
+        assert (datetime(2024, 3, 1), self.TODAY) in chunks  # only part of March is covered
+
+    def test_ignore_checkpoints(self, monkeypatch):
+        def fail(*args):
+            raise AssertionError("checkpoints loaded")
+
+        monkeypatch.setattr(pipeline, "load_completed_windows", fail)
+        monkeypatch.setattr(pipeline, "load_incomplete_windows", fail)
+        dt_from, _, chunks, skipped, watermark, _ = _plan_phase1_windows(
+            self.TODAY, resume=False
+        )
+        assert (dt_from, skipped, watermark) == (datetime(2024, 2, 1), 0, None)
+        _, _, chunks, skipped, _, _ = _plan_phase1_windows(
+            self.TODAY, full_history=True, resume=False
+        )
+        assert chunks[-1][0] == datetime(1999, 4, 1) and skipped == 0
+
+    def test_full_history_skips_completed_chunks(self, monkeypatch):
+        self._checkpoints(monkeypatch, [self.FEB, self.JAN])
+        _, _, chunks, skipped, watermark, _ = _plan_phase1_windows(
+            self.TODAY, full_history=True
+        )
+        assert skipped == 2 and watermark is None
+        assert self.JAN not in chunks and self.FEB not in chunks
+
+    def test_explicit_dates(self, monkeypatch):
+        self._checkpoints(monkeypatch, [self.JAN])
+        dt_from, dt_to, chunks, skipped, _, _ = _plan_phase1_windows(
+            self.TODAY, "01/01/2024", "29/02/2024", resume=False
+        )
+        assert (dt_from, dt_to, skipped) == (self.JAN[0], self.FEB[1], 0)
+        assert chunks == [self.FEB, self.JAN]
+
+    def test_window_ending_today_is_complete_up_to_yesterday(self):
+        status, window_to = _window_checkpoint(
+            datetime(2024, 3, 1), self.TODAY, self.TODAY, False, False
+        )
+        assert (status, window_to) == (pipeline.STATUS_COMPLETE, datetime(2024, 3, 14))
+
+    def test_window_of_only_today_is_partial(self):
+        status, window_to = _window_checkpoint(self.TODAY, self.TODAY, self.TODAY, False, False)
+        assert (status, window_to) == (pipeline.STATUS_PARTIAL, self.TODAY)
+
+    def test_limit_and_save_errors(self):
+        assert _window_checkpoint(*self.JAN, self.TODAY, True, False) == (
+            pipeline.STATUS_PARTIAL, self.JAN[1]
+        )
+        assert _window_checkpoint(*self.JAN, self.TODAY, True, True)[0] == pipeline.STATUS_FAILED
+        assert _window_checkpoint(*self.JAN, self.TODAY, False, False)[0] == (
+            pipeline.STATUS_COMPLETE
+        )
+
+
+_FILING = {
+    "stockCode": "00005",
+    "stockName": "HSBC  HOLDINGS",
+    "date": "11/02/2026",
+    "title": "ANNUAL RESULTS  ANNOUNCEMENT",
+    "link": "https://www1.hkexnews.hk/listedco/listconews/sehk/2026/0211/a.pdf",
+}
+
+
+def _row_bytes(row):
+    return len(json.dumps(row, ensure_ascii=False).encode("utf-8")) + 1
+
+
+class TestMetadataSave:
+    def test_row_shape(self):
+        row = _filing_to_row(_FILING)
+        assert row["companyTicker"] == "0005.HK"
+        assert row["stockCode"] == "00005"
+        assert row["stockName"] == "HSBC HOLDINGS"
+        assert row["filingDate"] == "2026-02-11T00:00:00Z"
+        assert row["documentUrl"] == _FILING["link"]
+        fid = row["filingId"]
+        assert row["rid"] == (int(fid) if fid.isdigit() else fid)
+        # Every value is plain JSON for $rows; no SQL escaping
+        assert json.loads(json.dumps(row)) == row
+
+    def test_row_without_date_has_no_filing_date(self):
+        row = _filing_to_row(dict(_FILING, date=""))
+        assert "filingDate" not in row  # reads as NONE, not null
+
+    def test_row_exactly_at_budget_fits(self):
+        row = {"a": "x" * 50}
+        budget = 2 + 2 * _row_bytes(row)
+        assert [len(b) for b in _batched_by_bytes([row, row, row], budget)] == [2, 1]
+        assert [len(b) for b in _batched_by_bytes([row, row], budget - 1)] == [1, 1]
+
+    def test_oversized_row_goes_alone(self):
+        small, big = {"a": "x"}, {"a": "x" * 500}
+        batches = list(_batched_by_bytes([small, big, small], 100))
+        assert batches == [[small], [big], [small]]
+
+    def test_failed_rpc_rows_fall_back_to_sql(self, monkeypatch):
+        rows = [_filing_to_row(dict(_FILING, title=f"T{i}")) for i in range(3)]
+        monkeypatch.setattr(
+            pipeline, "rpc_rows_with_retry", lambda sql, batch: (2, [batch[1]])
+        )
+        sent = []
+        monkeypatch.setattr(
+            pipeline, "upsert_batch_with_retry", lambda stmts: sent.extend(stmts) or len(stmts)
+        )
+        assert _save_metadata_rows(rows) == 3
+        assert len(sent) == 1
+        assert sent[0].startswith(f"UPSERT exchange_filing:{rows[1]['filingId']} SET")
+        assert "filingDate     = d'2026-02-11'" in sent[0]
+
+
+_OLD = {"stockCode": "00700", "date": "01/02/2026", "title": "A", "link": "https://x/a.pdf"}
+_NEW = {"stockCode": "00700", "date": "01/02/2026", "title": "B", "link": "https://x/b.pdf"}
+
+
+class TestChangedFilings:
+    def _known(self, monkeypatch, *filings):
+        rows = [{"filingId": _filing_id(f), "documentUrl": f["link"]} for f in filings]
+        monkeypatch.setattr(
+            pipeline, "surreal_query", lambda sql, timeout=60: [{"result": rows}]
+        )
+        return _load_known_filings(datetime(2026, 2, 1), datetime(2026, 2, 28))
+
+    def test_known_signature_is_crc_of_url(self, monkeypatch):
+        known = self._known(monkeypatch, _OLD)
+        assert known == {_filing_id(_OLD): pipeline._url_signature("https://x/a.pdf")}
+        assert isinstance(known[_filing_id(_OLD)], int)
+
+    def test_only_new_or_moved_filings_are_yielded(self, monkeypatch):
+        known = self._known(monkeypatch, _OLD, _NEW)
+        moved = dict(_NEW, link="https://x/b-revised.pdf")
+        counts = {"unique": 0, "unchanged": 0}
+        assert list(_iter_changed_filings([_OLD, moved], known, counts)) == [moved]
+        assert counts == {"unique": 2, "unchanged": 1}
+
+    def test_failed_lookup_saves_everything(self, monkeypatch):
+        monkeypatch.setattr(pipeline, "surreal_query", lambda sql, timeout=60: {"error": "down"})
+        known = _load_known_filings(datetime(2026, 2, 1), datetime(2026, 2, 28))
+        assert known is None
+        counts = {"unique": 0, "unchanged": 0}
+        assert len(list(_iter_changed_filings([_OLD, _NEW], known, counts))) == 2
+
+
+def test_spool_document_keeps_extension(tmp_path):
+    path = _spool_document(b"%PDF-1.4", "https://x/Doc.PDF?v=2#page=3", str(tmp_path))
+    assert path.startswith(str(tmp_path)) and path.endswith(".pdf")
+    with open(path, "rb") as fh:
+        assert fh.read() == b"%PDF-1.4"
+    _remove_file(path)
+    assert not list(tmp_path.iterdir())
+    _remove_file(path)  # already gone: ignored
+
+
+def test_phase1_streams_batches_and_dedups_across_chunks(monkeypatch):
+    def filing(n, day):
+        return {
+            "stockCode": "00700", "date": f"{day:02d}/02/2026", "title": f"T{n}",
+            "link": f"https://x/{n}.pdf",
+        }
+
+    feb = (datetime(2026, 2, 15), datetime(2026, 2, 28))
+    retry = (datetime(2026, 2, 10), datetime(2026, 2, 16))  # overlaps feb on 15-16
+    chunks = [
+        (1, *feb, [filing(i, 15 + i % 2) for i in range(6)], "", {}),
+        (2, *retry, [filing(0, 15), filing(1, 16), filing(9, 10)], "", {}),
+    ]
+    monkeypatch.setattr(pipeline, "REQUESTS_AVAILABLE", True)
+    monkeypatch.setattr(pipeline, "_iter_fetched_chunks", lambda *a, **k: iter(chunks))
+    monkeypatch.setattr(pipeline, "_load_known_filings", lambda *a: {})
+    monkeypatch.setattr(pipeline, "MAX_RPC_BODY_SIZE", pipeline._METADATA_RPC_OVERHEAD + 1200)
+    batches, checkpoints = [], []
+    monkeypatch.setattr(
+        pipeline, "_save_metadata_rows", lambda rows, dry_run: batches.append(rows) or len(rows)
+    )
+    monkeypatch.setattr(
+        pipeline, "record_window", lambda *a, **k: checkpoints.append((a[:3], k["kind"]))
+    )
+
+    saved, tickers = pipeline.run_phase1(date_from="10/02/2026", date_to="28/02/2026")
+
+    saved_ids = [row["filingId"] for batch in batches for row in batch]
+    assert saved == len(saved_ids) == 7
+    assert len(set(saved_ids)) == 7  # the retry window's overlap is not written twice
+    assert len(batches) > 2  # rows went out in several /rpc-sized batches
+    assert tickers == {"0700.HK"}
+    assert [c[0][2] for c in checkpoints] == [pipeline.STATUS_COMPLETE] * 2
+    assert {c[1] for c in checkpoints} == {state.KIND_RANGE}
+
+
+class TestFetchedChunks:
+    CHUNKS = [(datetime(2026, 1, d), datetime(2026, 1, d)) for d in range(6, 0, -1)]
+
+    def _worker(self, monkeypatch, delays):
+        """Fake chunk fetch that sleeps per chunk and records concurrency."""
+        lock = threading.Lock()
+        calls = {"started": [], "running": 0, "peak": 0}
+
+        def fetch(args):
+            chunk_from = args[0]
+            with lock:
+                calls["started"].append(chunk_from)
+                calls["running"] += 1
+                calls["peak"] = max(calls["peak"], calls["running"])
+            time.sleep(delays.get(chunk_from.day, 0.01))
+            with lock:
+                calls["running"] -= 1
+            return [chunk_from.day], "", {}
+
+        monkeypatch.setattr(pipeline, "_fetch_chunk_worker", fetch)
+        return calls
+
+    def test_results_in_chunk_order_while_fetching_concurrently(self, monkeypatch):
+        # The newest chunk is the slowest, so later ones finish first
+        calls = self._worker(monkeypatch, {6: 0.2})
+        results = []
+        for idx, _, _, filings, _, _ in _iter_fetched_chunks(self.CHUNKS, 3):
+            # Never more than the window submitted ahead of the consumer
+            assert len(calls["started"]) <= len(results) + 3
+            results.append((idx, filings))
+        assert results == [(i + 1, [6 - i]) for i in range(6)]
+        assert calls["peak"] == 3
+
+    def test_stopping_early_cancels_pending_chunks(self, monkeypatch):
+        calls = self._worker(monkeypatch, {6: 0.05, 5: 0.3})
+        chunks = _iter_fetched_chunks(self.CHUNKS, 2)
+        assert next(chunks)[3] == [6]
+        chunks.close()  # e.g. --limit reached
+        # Chunk 5 was already in the window; nothing after it ever started
+        assert {d.day for d in calls["started"]} <= {5, 6}
+
+
+def _extract_in_child(path, doc_url):
+    """Stand-in for extract_file_with_tables that pool workers can import."""
+    return f"pid {os.getpid()}", []
+
+
+class _Phase2DB:
+    """Answers the feeder's claims from *rows* and records everything else."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def __call__(self, sql, timeout=60):
+        with self.lock:
+            self.sent.append(sql)
+            if sql.startswith("UPDATE (SELECT VALUE id FROM (SELECT id, filingDate"):
+                batch = int(sql.split(" LIMIT ")[1].split(")")[0])
+                page, self.rows = self.rows[:batch], self.rows[batch:]
+                return [{"status": "OK", "result": page}]
+            return [{"status": "OK", "result": []}]
+
+    def released(self, worker_id):
+        return [s for s in self.sent if s.startswith(
+            "UPDATE exchange_filing SET documentStatus = NONE, claimedBy = NONE"
+        ) and f"claimedBy = '{worker_id}'" in s]
+
+
+class _Phase2Writer:
+    """CoalescingWriter that only sends rows when flushed."""
+
+    instances = []
+
+    def __init__(self):
+        self.pending, self.written = [], []
+        _Phase2Writer.instances.append(self)
+
+    def add(self, key, sql, vars, fallback, on_done):
+        self.pending.append((key, sql, vars or {}, on_done))
+
+    def seconds_until_due(self):
+        return None  # only the final flush sends anything
+
+    def flush(self):
+        while self.pending:
+            key, sql, vars, on_done = self.pending.pop(0)
+            self.written.append((key, sql, vars))
+            on_done((True, ""))
+
+
+class TestRunPhase2:
+    WORKER = "node-test"
+
+    def _run(self, monkeypatch, n=6, extract=None, **kwargs):
+        today = datetime.now().strftime("%Y-%m-%dT00:00:00Z")
+        db = _Phase2DB(
+            {"id": f"exchange_filing:{i}", "documentUrl": f"https://x/{i}.pdf",
+             "filingDate": today, "documentAttempts": 0}
+            for i in range(1, n + 1)
+        )
+        _Phase2Writer.instances.clear()
+        monkeypatch.setattr(pipeline, "surreal_query", db)
+        monkeypatch.setattr(pipeline, "CoalescingWriter", _Phase2Writer)
+        monkeypatch.setattr(pipeline, "PHASE2_REPORT_SECONDS", 0.2)
+        monkeypatch.setattr(
+            pipeline, "_download_document",
+            lambda url, fid, hold=None: (b"%PDF-1.7 " + fid.encode(), 10, "md5", ""),
+        )
+        if extract is not None:
+            monkeypatch.setattr(pipeline, "extract_file_with_tables", extract)
+        kwargs.setdefault("max_workers", 2)
+        kwargs.setdefault("extract_workers", 0)
+        kwargs.setdefault("extract_timeout", 0)
+        stats = pipeline.run_phase2(
+            batch_size=4, worker_id=self.WORKER, lease_seconds=60, **kwargs
+        )
+        return stats, db, _Phase2Writer.instances[0]
+
+    def test_sandbox_runs_up_to_extract_workers_at_once(self, monkeypatch):
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def sandboxed(fid, path, doc_url, timeout):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.1)
+            with lock:
+                running[0] -= 1
+            return f"text {fid}", [], "", ""
+
+        monkeypatch.setattr(pipeline, "_extract_sandboxed", sandboxed)
+        stats, _db, _writer = self._run(
+            monkeypatch, n=8, max_workers=4, extract_workers=3, extract_timeout=30
+        )
+        assert stats["texts_extracted"] == 8
+        assert peak[0] == 3
+
+    def test_process_pool_mode(self, monkeypatch):
+        def in_parent(path, doc_url):
+            raise AssertionError("extracted in-process instead of on the pool")
+
+        monkeypatch.setattr(
+            pipeline, "_extract_in_pool",
+            lambda pool, path, doc_url: pool.submit(_extract_in_child, path, doc_url).result(),
+        )
+        stats, _db, writer = self._run(monkeypatch, n=4, extract=in_parent, extract_workers=2)
+        assert stats["texts_extracted"] == 4
+        pids = {
+            int(v.split()[1]) for _key, _sql, vars in writer.written
+            for v in vars.values() if isinstance(v, str) and v.startswith("pid ")
+        }
+        assert pids and os.getpid() not in pids
+        assert pipeline._extraction_desc(2, 0) == "process pool of 2"
+        assert pipeline._extraction_desc(2, 300) == "2 sandboxed at a time, 300s per document"
+        assert pipeline._extraction_desc(0, 0) == "in-process"
+
+    def _phase2_threads(self):
+        return [
+            t.name for t in threading.enumerate()
+            if t.name.startswith(("phase2-", "hkex-download")) and t.is_alive()
+        ]
+
+    def test_done_reaches_every_stage(self, monkeypatch):
+        started = time.monotonic()
+        stats, db, writer = self._run(
+            monkeypatch, n=10, extract=lambda path, doc_url: ("text", [{"n": 1}])
+        )
+        # The writer only ends on DONE before the run stops, so every stage
+        # passed it on; nothing was left to the 5 s join timeouts
+        assert time.monotonic() - started < 5
+        assert stats["total_processed"] == 10 and stats["texts_extracted"] == 10
+        assert stats["tables_total"] == 10 and stats["errors"] == 0
+        # Rows are only sent by the writer's final flush
+        assert not writer.pending and len(writer.written) == 10
+        assert len(db.released(self.WORKER)) == 1
+        assert not self._phase2_threads()
+
+    def test_async_downloads_route_on_their_own_executor(self, monkeypatch):
+        routed = []
+        spool = pipeline._spool_document
+
+        def spool_and_record(raw_bytes, doc_url, directory):
+            routed.append(threading.current_thread().name)
+            return spool(raw_bytes, doc_url, directory)
+
+        class _Fetcher:
+            def __init__(self, concurrency):
+                self.concurrency = concurrency
+
+            async def fetch(self, url, hold):
+                await asyncio.sleep(0.01)
+                hold.grow(10)
+                return b"%PDF-1.7 " + url.encode(), "md5", "", {"ttfb": 0.01}
+
+            async def aclose(self):
+                pass
+
+            def stats(self):
+                return {"downloads": 0}
+
+        monkeypatch.setattr(pipeline, "AsyncDocumentFetcher", _Fetcher)
+        monkeypatch.setattr(pipeline, "_spool_document", spool_and_record)
+        stats, db, writer = self._run(
+            monkeypatch, n=8, extract=lambda path, doc_url: ("text", []), async_downloads=4
+        )
+        assert stats["texts_extracted"] == 8 and len(writer.written) == 8
+        assert len(routed) == 8 and all(n.startswith("hkex-download") for n in routed)
+        assert len(db.released(self.WORKER)) == 1
+        assert not self._phase2_threads()
+
+    def test_interrupt_stops_every_stage_and_releases_claims(self, monkeypatch):
+        def slow_extract(path, doc_url):
+            time.sleep(0.1)
+            return "text", []
+
+        def interrupt(meters):
+            if not _Phase2Writer.instances[0].pending:
+                return ""
+            raise KeyboardInterrupt  # with rows waiting for the final flush
+
+        monkeypatch.setattr(pipeline, "PHASE2_REPORT_SECONDS", 0.05)
+        monkeypatch.setattr(pipeline, "format_stage_report", interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            self._run(monkeypatch, n=40, extract=slow_extract)
+        writer = _Phase2Writer.instances[0]
+        assert 0 < len(writer.written) < 40  # what was done was flushed
+        assert not writer.pending
+        assert len(pipeline.surreal_query.released(self.WORKER)) == 1
+        assert not self._phase2_threads()
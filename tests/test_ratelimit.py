@@ -0,0 +1,153 @@
+"""Unit tests for hkex_scraper.ratelimit."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from hkex_scraper.ratelimit import AimdLimiter, parse_retry_after
+
+
+def _limiter(**kwargs):
+    opts = {"initial": 4, "minimum": 1, "maximum": 16, "slow_after": 1.0, "cooldown": 0}
+    opts.update(kwargs)
+    return AimdLimiter("test", **opts)
+
+
+def _saturate(lim, status=200, latency=0.01, rounds=1):
+    """Fill the window, then answer every request with *status*."""
+    for _ in range(rounds):
+        slots = [lim.acquire() for _ in range(int(lim.window))]
+        for slot in slots:
+            slot.observe(status, latency)
+            lim.release(slot)
+
+
+def test_window_grows_additively_while_full():
+    lim = _limiter()
+    _saturate(lim, rounds=4)
+    assert 7 <= lim.window <= 8  # about +1 per window of responses
+
+
+def test_window_does_not_grow_when_not_the_limit():
+    lim = _limiter()
+    for _ in range(50):
+        with lim.slot() as slot:
+            slot.observe(200, 0.01)
+    assert lim.window == 4
+
+
+def test_throttle_halves_window():
+    lim = _limiter(initial=8)
+    with lim.slot() as slot:
+        slot.observe(503)
+    assert lim.window == 4
+    assert lim.stats()["throttled"] == 1
+
+
+def test_burst_of_failures_counts_once_per_cooldown():
+    lim = _limiter(initial=8, cooldown=60)
+    _saturate(lim, status=503)
+    assert lim.window == 4
+    assert lim.counters["decreases"] == 1
+
+
+def test_exception_and_slow_response_decrease():
+    lim = _limiter(initial=8)
+    with pytest.raises(ConnectionError), lim.slot():
+        raise ConnectionError("reset")
+    with lim.slot() as slot:
+        slot.observe(200, latency=5.0)
+    assert lim.window == 2
+    assert lim.counters["failed"] == 1 and lim.counters["slow"] == 1
+
+
+def test_slot_threshold_overrides_slow_after():
+    lim = _limiter(initial=8)
+    with lim.slot() as slot:
+        slot.observe(200, latency=5.0, slow_after=30.0)
+    assert lim.window == 8 and lim.counters["slow"] == 0
+
+
+def test_window_never_below_minimum():
+    lim = _limiter(initial=2, minimum=2)
+    _saturate(lim, status=429, rounds=3)
+    assert lim.window == 2
+
+
+def test_set_maximum_raises_and_restores_ceiling():
+    lim = _limiter(initial=8, maximum=8)
+    assert lim.set_maximum(200) == 8
+    _saturate(lim, rounds=4)
+    assert lim.window > 8
+    lim.set_maximum(8)
+    assert lim.window == 8 and lim.stats()["maximum"] == 8
+
+
+def test_acquire_blocks_at_window():
+    lim = _limiter(initial=1)
+    first = lim.acquire()
+    got = threading.Event()
+    threading.Thread(target=lambda: (lim.acquire(), got.set()), daemon=True).start()
+    assert not got.wait(0.2)
+    first.observe(200)
+    lim.release(first)
+    assert got.wait(2)
+
+
+def test_async_waiters_are_woken_without_polling():
+    lim = _limiter(initial=2, maximum=2)
+    attempts = 0
+    try_acquire = lim._try_acquire
+
+    def counting():
+        nonlocal attempts
+        attempts += 1
+        return try_acquire()
+
+    lim._try_acquire = counting
+
+    async def request():
+        async with lim.async_slot() as slot:
+            await asyncio.sleep(0.02)
+            slot.observe(200, 0.01)
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(40)))
+
+    asyncio.run(run())
+    assert lim.stats()["in_flight"] == 0 and lim.counters["requests"] == 40
+    assert attempts < 40 * 3  # polling every 50 ms would take several hundred
+
+
+def test_cancelled_async_waiter_passes_on_its_wake_up():
+    lim = _limiter(initial=1, maximum=1)
+
+    async def run():
+        held = await lim.acquire_async()
+        waiters = [asyncio.ensure_future(lim.acquire_async()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        held.observe(200)
+        lim.release(held)
+        waiters[0].cancel()  # woken, but cancelled before it ran
+        slot = await asyncio.wait_for(waiters[1], 1)
+        lim.release(slot)
+
+    asyncio.run(run())
+    assert lim.stats()["in_flight"] == 0
+
+
+def test_retry_after_pauses_new_requests():
+    lim = _limiter(initial=4)
+    with lim.slot() as slot:
+        slot.observe(429, retry_after=0.3)
+    started = time.monotonic()
+    lim.release(lim.acquire())
+    assert time.monotonic() - started >= 0.25
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2026 07:28:00 GMT") == 0.0
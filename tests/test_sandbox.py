@@ -0,0 +1,75 @@
+"""Unit tests for hkex_scraper.sandbox — extraction is stubbed, children are forked."""
+
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from hkex_scraper import extractor, sandbox
+
+pytestmark = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="stubs are inherited by forked children only",
+)
+
+
+@pytest.fixture(autouse=True)
+def _fork_context(monkeypatch):
+    monkeypatch.setattr(sandbox, "_context", multiprocessing.get_context("fork"))
+
+
+def _stub(monkeypatch, fn):
+    monkeypatch.setattr(extractor, "extract_file_with_tables", fn)
+
+
+def test_returns_extracted_content(monkeypatch):
+    _stub(monkeypatch, lambda path, url, text_only=False: (f"text of {url}", [{"n": 1}]))
+    assert sandbox.run_sandboxed_extraction("/x", "a.pdf") == ("text of a.pdf", [{"n": 1}], "")
+
+
+def test_extractor_exception_is_reported_by_type(monkeypatch):
+    def broken(path, url, text_only=False):
+        raise ValueError("bad xref table")
+
+    _stub(monkeypatch, broken)
+    assert sandbox.run_sandboxed_extraction("/x", "a.pdf") == ("", [], "extract_error:ValueError")
+
+
+def test_timeout_kills_child(monkeypatch):
+    _stub(monkeypatch, lambda path, url, text_only=False: time.sleep(30))
+    started = time.monotonic()
+    result = sandbox.run_sandboxed_extraction("/x", "a.pdf", timeout=0.5)
+    assert result == ("", [], sandbox.REASON_TIMEOUT)
+    assert time.monotonic() - started < 5
+
+
+def test_rss_cap_kills_child(monkeypatch):
+    def hog(path, url, text_only=False):
+        block = bytearray(200 * 1024 * 1024)
+        time.sleep(30)
+        return block
+
+    _stub(monkeypatch, hog)
+    result = sandbox.run_sandboxed_extraction("/x", "a.pdf", timeout=10, max_rss_mb=64)
+    assert result[2] == sandbox.REASON_OOM
+
+
+def test_cpu_limit(monkeypatch):
+    def spin(path, url, text_only=False):
+        while True:
+            pass
+
+    _stub(monkeypatch, spin)
+    result = sandbox.run_sandboxed_extraction("/x", "a.pdf", timeout=10, cpu_seconds=1)
+    assert result[2] == sandbox.REASON_CPU
+
+
+def test_child_stderr_is_silenced(monkeypatch, capfd):
+    def noisy(path, url, text_only=False):
+        os.write(2, b"MuPDF error: bad xref\n")  # C libraries write to fd 2
+        return "text", []
+
+    _stub(monkeypatch, noisy)
+    assert sandbox.run_sandboxed_extraction("/x", "a.pdf") == ("text", [], "")
+    assert "bad xref" not in capfd.readouterr().err
@@ -0,0 +1,100 @@
+"""Unit tests for hkex_scraper.stages."""
+
+import asyncio
+import threading
+
+from hkex_scraper.stages import BudgetHold, ByteBudget, format_memory_report
+
+
+def test_budget_blocks_until_released():
+    budget = ByteBudget(100)
+    stop = threading.Event()
+    assert budget.acquire(60, stop)
+    admitted = threading.Event()
+    threading.Thread(
+        target=lambda: budget.acquire(60, stop) and admitted.set(), daemon=True
+    ).start()
+    assert not admitted.wait(0.2)
+    budget.release(60)
+    assert admitted.wait(2)
+    assert budget.peak == 60 and budget.waits == 1
+
+
+def test_oversized_document_admitted_alone():
+    budget = ByteBudget(100)
+    stop = threading.Event()
+    assert budget.acquire(500, stop)
+    assert budget.used == 500
+    stop.set()
+    assert not budget.acquire(1, stop)  # still waiting when the run stops
+
+
+def test_hold_grows_to_actual_size_and_hands_over():
+    budget = ByteBudget(100)
+    hold = BudgetHold(budget, threading.Event())
+    assert hold.reserve(40)
+    hold.grow(30)  # smaller than reserved: nothing more to charge
+    hold.grow(70)
+    assert budget.used == 70
+    assert hold.take() == 70 and hold.held == 0
+    hold.release()  # nothing left to release
+    assert budget.used == 70
+
+
+def test_async_reserve_waits_for_release():
+    budget = ByteBudget(100)
+    stop = threading.Event()
+    assert budget.acquire(80, stop)
+
+    async def run():
+        hold = BudgetHold(budget, stop)
+        waiter = asyncio.ensure_future(hold.reserve_async(50))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        budget.release(80)
+        assert await asyncio.wait_for(waiter, 2)
+        hold.release()
+
+    asyncio.run(run())
+    assert budget.used == 0 and budget.waits == 1
+
+
+def test_async_reserve_gives_up_when_stopped():
+    budget = ByteBudget(100)
+    stop = threading.Event()
+    assert budget.acquire(100, stop)
+
+    async def run():
+        hold = BudgetHold(budget, stop)
+        waiter = asyncio.ensure_future(hold.reserve_async(50))
+        await asyncio.sleep(0.05)
+        stop.set()
+        budget.wake_all()
+        assert not await asyncio.wait_for(waiter, 2)
+        assert hold.held == 0
+
+    asyncio.run(run())
+
+
+def test_wait_for_room_blocks_while_full():
+    budget = ByteBudget(100)
+    stop = threading.Event()
+    assert budget.acquire(100, stop)
+    hold = BudgetHold(budget, stop)
+    admitted = threading.Event()
+    threading.Thread(
+        target=lambda: hold.wait_for_room() and admitted.set(), daemon=True
+    ).start()
+    assert not admitted.wait(0.2)
+    budget.release(1)
+    assert admitted.wait(2)
+    assert hold.held == 0 and budget.used == 99
+
+
+def test_memory_report_resets_interval_peak():
+    budget = ByteBudget(100 * 1024 * 1024)
+    stop = threading.Event()
+    budget.acquire(50 * 1024 * 1024, stop)
+    budget.release(50 * 1024 * 1024)
+    assert "peak 50 MB since last report" in format_memory_report(budget, 0)
+    assert "peak 0 MB since last report" in format_memory_report(budget, 0)
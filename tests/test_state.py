@@ -0,0 +1,93 @@
+"""Unit tests for hkex_scraper.state against a fake ``surreal_query``."""
+
+from datetime import datetime
+
+import pytest
+
+from hkex_scraper import state
+
+
+class _FakeQuery:
+    """Records the SQL sent to SurrealDB and answers each call with ``reply``."""
+
+    def __init__(self):
+        self.sent = []
+        self.reply = [{"status": "OK", "result": []}]
+
+    def __call__(self, sql, timeout=60):
+        self.sent.append(sql)
+        return self.reply
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    fake = _FakeQuery()
+    monkeypatch.setattr(state, "surreal_query", fake)
+    return fake
+
+
+def test_complete_window_deletes_covered_incomplete_windows(queries):
+    assert state.record_window(
+        datetime(2024, 1, 1), datetime(2024, 1, 31), state.STATUS_COMPLETE, 120, 118
+    )
+    sql = queries.sent[0]
+    assert sql.startswith("UPSERT scrape_state:w20240101_20240131 SET")
+    assert "windowFrom  = d'2024-01-01'" in sql and "windowTo    = d'2024-01-31'" in sql
+    assert "recordCount = 120" in sql and "savedCount  = 118" in sql
+    assert "error       = NONE" in sql
+    assert "kind        = 'routine'" in sql
+    assert (
+        "DELETE scrape_state WHERE status != 'complete' "
+        "AND windowFrom >= d'2024-01-01' AND windowTo <= d'2024-01-31' "
+        "AND id != scrape_state:w20240101_20240131"
+    ) in sql
+
+
+def test_incomplete_window_keeps_others(queries):
+    state.record_window(
+        datetime(2024, 2, 1), datetime(2024, 2, 29), state.STATUS_FAILED, error="it's down"
+    )
+    assert "DELETE" not in queries.sent[0]
+    assert "status      = 'failed'" in queries.sent[0]
+    assert "error       = 'it\\'s down'" in queries.sent[0]
+
+
+def test_record_window_reports_errors(queries):
+    queries.reply = {"error": "HTTP 500"}
+    assert not state.record_window(datetime(2024, 1, 1), datetime(2024, 1, 31), "complete")
+
+
+def test_load_windows_parses_dates_and_skips_bad_rows(queries):
+    queries.reply = [{"status": "OK", "result": [
+        {"windowFrom": "2024-02-01T00:00:00Z", "windowTo": "2024-02-29T00:00:00Z"},
+        {"windowFrom": "2024-01-01T00:00:00Z", "windowTo": None},
+    ]}]
+    assert state.load_incomplete_windows() == [(datetime(2024, 2, 1), datetime(2024, 2, 29))]
+    assert "WHERE status != 'complete' ORDER BY windowTo DESC" in queries.sent[0]
+    queries.reply = {"error": "HTTP 500"}
+    assert state.load_completed_windows() == []
+
+
+def test_watermark_ignores_explicit_range_runs(queries):
+    state.record_window(
+        datetime(2005, 1, 1), datetime(2005, 1, 31), state.STATUS_COMPLETE,
+        kind=state.KIND_RANGE,
+    )
+    assert "kind        = 'range'" in queries.sent[0]
+    assert state.load_watermark() is None
+    assert (
+        "WHERE status = 'complete' AND kind IN ['routine', 'full_history'] "
+        "ORDER BY windowTo DESC"
+    ) in queries.sent[1]
+
+
+def test_watermark_and_coverage():
+    completed = [
+        (datetime(2024, 2, 1), datetime(2024, 2, 29)),
+        (datetime(2024, 1, 1), datetime(2024, 1, 31)),
+    ]
+    assert state.load_watermark(completed) == datetime(2024, 2, 29)
+    assert state.load_watermark([]) is None
+    assert state.is_window_covered((datetime(2024, 1, 5), datetime(2024, 1, 20)), completed)
+    # Spans two completed windows but lies inside neither
+    assert not state.is_window_covered((datetime(2024, 1, 20), datetime(2024, 2, 5)), completed)
@@ -0,0 +1,154 @@
+"""Unit tests for hkex_scraper.ws against a local fake SurrealDB WebSocket RPC server."""
+
+import json
+import socketserver
+import threading
+import time
+
+import pytest
+
+from hkex_scraper import db
+from hkex_scraper.ws import (
+    OP_CLOSE,
+    OP_TEXT,
+    WebSocketClosed,
+    WebSocketRpcClient,
+    accept_key,
+    encode_frame,
+    read_frame,
+)
+
+
+class _FakeRpcHandler(socketserver.StreamRequestHandler):
+    """Answers ``query`` with the SQL echoed back; replies to a batch in reverse order."""
+
+    def handle(self):
+        srv = self.server
+        srv.connections += 1
+        headers = {}
+        self.rfile.readline()
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        self.wfile.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept_key(headers['sec-websocket-key'])}\r\n\r\n"
+            ).encode()
+        )
+        held = []
+        while True:
+            try:
+                _fin, opcode, payload = read_frame(self.rfile)
+            except WebSocketClosed:
+                return
+            if opcode == OP_CLOSE:
+                return
+            req = json.loads(payload)
+            srv.methods.append(req["method"])
+            if req["method"] == "query" and req["params"][0] == "DROP":
+                return  # close the socket without replying
+            held.append(req)
+            if len(held) >= srv.hold:
+                for r in reversed(held):
+                    self.wfile.write(encode_frame(OP_TEXT, self._reply(r), masked=False))
+                held = []
+
+    def _reply(self, req):
+        method, params = req["method"], req["params"]
+        if method == "signin":
+            body = {"result": "token"} if "ns" not in params[0] else {"error": "no"}
+        elif method == "use":
+            body = {"result": None}
+        elif params[0].startswith("THROW"):
+            body = {"result": [{"status": "ERR", "result": "boom"}]}
+        else:
+            body = {"result": [{"status": "OK", "result": params[0]}]}
+        body["id"] = req["id"]
+        return json.dumps(body).encode()
+
+
+@pytest.fixture
+def rpc_server():
+    srv = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _FakeRpcHandler)
+    srv.daemon_threads = True
+    srv.connections = 0
+    srv.methods = []
+    srv.hold = 1
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _client(srv, setup=None):
+    return WebSocketRpcClient(f"ws://127.0.0.1:{srv.server_address[1]}/rpc", setup=setup)
+
+
+def test_round_trip(rpc_server):
+    client = _client(rpc_server)
+    body = client.call("query", ["RETURN 1;"], timeout=5)
+    assert body["result"][0]["result"] == "RETURN 1;"
+    client.close()
+
+
+def test_many_requests_in_flight_on_one_socket(rpc_server):
+    rpc_server.hold = 50  # answer only once 50 requests are outstanding, newest first
+    client = _client(rpc_server)
+    futures = [client.call_async("query", [f"Q{i}"]) for i in range(200)]
+    results = [f.result(timeout=5)["result"][0]["result"] for f in futures]
+    assert results == [f"Q{i}" for i in range(200)]
+    assert rpc_server.connections == 1
+    assert client.stats()["max_in_flight"] >= 50
+
+
+def test_setup_runs_before_requests_and_after_reconnect(rpc_server):
+    calls = []
+
+    def setup(client):
+        calls.append(client.call("use", ["ns", "db"], timeout=5))
+
+    client = _client(rpc_server, setup)
+    client.call("query", ["A"], timeout=5)
+    with pytest.raises(WebSocketClosed):
+        client.call_async("query", ["DROP"]).result(timeout=5)
+    time.sleep(0.1)
+    assert client.call("query", ["B"], timeout=5)["result"][0]["result"] == "B"
+    assert len(calls) == 2
+    assert rpc_server.connections == 2
+    assert rpc_server.methods[:2] == ["use", "query"]
+
+
+def test_large_message(rpc_server):
+    client = _client(rpc_server)
+    sql = "x" * 200_000
+    assert client.call("query", [sql], timeout=5)["result"][0]["result"] == sql
+
+
+class TestDbTransport:
+    @pytest.fixture(autouse=True)
+    def _ws_transport(self, rpc_server, monkeypatch):
+        monkeypatch.setattr(db, "_ws", WebSocketRpcClient(
+            f"ws://127.0.0.1:{rpc_server.server_address[1]}/rpc", setup=db._ws_setup
+        ))
+        monkeypatch.setattr(db, "_transport", "ws")
+
+    def test_surreal_rpc_over_ws(self, rpc_server):
+        body = db.surreal_rpc("query", ["RETURN 1;"])
+        assert body["result"][0]["result"] == "RETURN 1;"
+        # signin as root succeeded on the first attempt, then use
+        assert rpc_server.methods[:2] == ["signin", "use"]
+
+    def test_query_error_is_normalised(self):
+        assert db.surreal_rpc("query", ["THROW 1;"]) == {"error": "boom"}
+
+    def test_query_many_keeps_order(self, rpc_server):
+        db.surreal_rpc("query", ["RETURN 1;"])  # connect and sign in first
+        rpc_server.hold = 10
+        results = list(db.surreal_query_many([f"S{i}" for i in range(40)], window=20))
+        assert [r[0]["result"] for r in results] == [f"S{i}" for i in range(40)]